@@ -1,5 +1,6 @@
 import os
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
@@ -9,12 +10,49 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from database.db import User, get_db
+from services.principal_cache import principal_cache
+from services.token_versions import bump_global_token_version, bump_user_token_version, get_token_versions
 
 load_dotenv()
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 bearer_scheme = HTTPBearer(auto_error=False)
 
+# Opt-in access token format that also carries role, premium expiry and token
+# versions so get_current_principal can authorize without touching Postgres.
+ACCESS_TOKEN_CLAIMS = os.getenv("ACCESS_TOKEN_CLAIMS", "false").strip().lower() in {"1", "true", "yes", "on"}
+CLAIMS_TOKEN_FORMAT = 2
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str | None
+    username: str | None
+    role: str
+    premium_until: datetime | None
+
+    @property
+    def premium_duration(self) -> datetime | None:
+        # Same attribute name as User, so handlers can take either.
+        return self.premium_until
+
+    @property
+    def is_premium(self) -> bool:
+        if self.premium_until is None:
+            return False
+        return self.premium_until.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            role=user.role or "user",
+            premium_until=user.premium_duration,
+        )
+
 
 def _require_env(name: str) -> str:
     value = os.getenv(name)
@@ -38,6 +76,40 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, _require_env("SECRET_KEY"), algorithm="HS256")
 
 
+def build_access_payload(user: User) -> dict:
+    payload = {"id": user.id, "email": user.email}
+    if not ACCESS_TOKEN_CLAIMS:
+        return payload
+
+    versions = get_token_versions(user.id)
+    if versions is None:
+        # Without Redis we cannot version the token, so issue the plain format.
+        return payload
+    payload.update(
+        {
+            "fmt": CLAIMS_TOKEN_FORMAT,
+            "username": user.username,
+            "role": user.role or "user",
+            "premium_until": int(user.premium_duration.replace(tzinfo=timezone.utc).timestamp())
+            if user.premium_duration
+            else None,
+            "ver": versions[0],
+            "gver": versions[1],
+        }
+    )
+    return payload
+
+
+def invalidate_user_auth(user_id: int | None = None) -> None:
+    """Drop cached principals and revoke claim tokens for one user, or everyone."""
+    if user_id is None:
+        principal_cache.clear()
+        bump_global_token_version()
+        return
+    principal_cache.invalidate(user_id)
+    bump_user_token_version(user_id)
+
+
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7")))
@@ -62,16 +134,9 @@ def verify_refresh_token(token: str):
 
 
 def verify_role(roles: list):
-    def role_checker(
-        payload: dict = Depends(get_current_user),
-        db: Session = Depends(get_db)
-    ):
-        user_id = payload.id
-        user = db.query(User).filter(User.id == user_id).first()
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
+    def role_checker(user: User = Depends(get_current_user)):
+        # get_current_user is resolved once per request by FastAPI's dependency
+        # cache, so the role check reuses that user instead of querying again.
         if user.role not in roles:
             raise HTTPException(status_code=403, detail="Access forbidden")
 
@@ -95,8 +160,58 @@ def get_current_user(
             detail="Invalid or expired token"
         )
 
-    user = db.query(User).filter(User.id == payload["id"]).first()
+    user = principal_cache.get_user(db, payload["id"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     return user
+
+
+def _principal_from_claims(payload: dict) -> Principal | None:
+    if payload.get("fmt") != CLAIMS_TOKEN_FORMAT:
+        return None
+
+    versions = get_token_versions(payload["id"])
+    if versions is None:
+        return None
+    if versions != (payload.get("ver"), payload.get("gver")):
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    premium_until = payload.get("premium_until")
+    return Principal(
+        id=payload["id"],
+        email=payload.get("email"),
+        username=payload.get("username"),
+        role=payload.get("role") or "user",
+        premium_until=datetime.utcfromtimestamp(premium_until) if premium_until else None,
+    )
+
+
+def get_current_principal(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    db: Session = Depends(get_db),
+) -> Principal:
+    """
+    Authorize from token claims alone when the token carries them; the session
+    is only used for legacy tokens or when Redis is unavailable. Sessions
+    connect lazily, so the fast path never opens a database connection.
+    """
+    token = credentials.credentials if credentials else None
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+
+    payload = verify_access_token(token)
+    if payload is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token"
+        )
+
+    principal = _principal_from_claims(payload)
+    if principal is not None:
+        return principal
+
+    user = principal_cache.get_user(db, payload["id"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return Principal.from_user(user)
@@ -1,7 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from .auth import hash_password, create_access_token, create_refresh_token, verify_password, verify_access_token, verify_refresh_token
+from .auth import (
+    build_access_payload,
+    create_access_token,
+    create_refresh_token,
+    hash_password,
+    invalidate_user_auth,
+    verify_access_token,
+    verify_password,
+    verify_refresh_token,
+)
 from .schema import (
     RegisterUser,
     LoginUser,
@@ -12,8 +21,10 @@ from .schema import (
 )
 from database.db import get_db, User, Notification, PasswordResetCode
 from database.session_model import Session as SessionDB
+from services.principal_cache import principal_cache
 from services.session_service import SessionService
 from services.email_service import send_password_reset_code_email
+from services.startup_report import startup_report
 from datetime import datetime, timedelta
 from fastapi import Request
 from starlette.responses import RedirectResponse
@@ -121,13 +132,14 @@ def _generate_password_reset_code() -> str:
 
 oauth = OAuth()
 
-oauth.register(
-    name="google",
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"},
-)
+with startup_report.measure("client.google_oauth"):
+    oauth.register(
+        name="google",
+        client_id=os.getenv("GOOGLE_CLIENT_ID"),
+        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        client_kwargs={"scope": "openid email profile"},
+    )
 
 def generate_unique_username(name: str, db: Session) -> str:
     """
@@ -194,7 +206,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
     
     payload = {"id": user.id, "email": user.email}
 
-    access = create_access_token(payload)
+    access = create_access_token(build_access_payload(user))
     refresh = create_refresh_token(payload)
 
     redirect_base = request.session.pop("mobile_redirect", None) or f"{os.getenv('FRONTEND_URL')}/auth"
@@ -222,7 +234,7 @@ def register_user(data: RegisterUser, request: Request, db: Session = Depends(ge
         # Session yaratish
         session = create_session_for_user(db=db, user_id=new_user.id, request=request)
         
-        access_token = create_access_token({"id":new_user.id,"email":new_user.email})
+        access_token = create_access_token(build_access_payload(new_user))
         refresh_token = create_refresh_token({"id":new_user.id,"email":new_user.email})
         welcome_notification = Notification(title=f"Xush kelibsiz, {new_user.username}! 👋",body=f"Bizning platformamizga qo'shilganingiz uchun tashakkur. Ingliz tili o'rganishni boshlang va o'z darajangizni oshiring!", user_id=new_user.id)
         db.add(welcome_notification)
@@ -253,7 +265,7 @@ def login_user(data:LoginUser, request: Request, db: Session = Depends(get_db)):
     
     payload ={"id":user.id,"email":user.email}
     
-    access = create_access_token(payload)
+    access = create_access_token(build_access_payload(user))
     refresh = create_refresh_token(payload)
 
     return {
@@ -265,13 +277,17 @@ def login_user(data:LoginUser, request: Request, db: Session = Depends(get_db)):
     }
 
 @router.post("/verify")
-def refresh_token(data:TokenRefreshSchema):
+def refresh_token(data:TokenRefreshSchema, db: Session = Depends(get_db)):
     payload = verify_refresh_token(data.refresh_token)
     
     if payload is None:
         raise HTTPException(401, "Invalid refresh token")
 
-    new_access = create_access_token({"id": payload["id"], "email": payload["email"]})
+    user = principal_cache.get_user(db, payload["id"])
+    if not user:
+        raise HTTPException(401, "Invalid refresh token")
+
+    new_access = create_access_token(build_access_payload(user))
 
     return {"access_token": new_access, "token_type": "Bearer"}
 
@@ -411,6 +427,7 @@ def reset_forgot_password(data: ResetPasswordRequest, db: Session = Depends(get_
         user.password = hash_password(data.new_password)
         reset_row.used_at = now
         db.commit()
+        invalidate_user_auth(user.id)
         return {"message": "Password updated successfully."}
     except Exception as e:
         db.rollback()
@@ -0,0 +1,86 @@
+"""
+Render time and allocations per submission for the Telegram archive documents.
+
+    python -m benchmarks.archive_render_bench --renders 2000
+
+Each document is rendered from synthetic data shaped like a real submission
+(38 reading cards, 35 listening cards, three writing tasks with ~250-word
+answers). Timing runs without tracing; peak allocation is then measured
+for a single render with tracemalloc.
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from services.archive_render import QaCard, WritingTask, render_qa_archive, render_writing_archive
+
+META = [
+    ("Mock ID", 12),
+    ("Submitted", "2025-01-01 12:00:00 UTC"),
+    ("Total", "27/38"),
+    ("User ID", 4821),
+    ("Username", "student<4821>"),
+    ("Email", "student4821@example.com"),
+]
+
+
+def _cards(count: int) -> list:
+    return [
+        QaCard(
+            number=i + 1,
+            section=f"Part {i // 7 + 1}",
+            prompt=f"Statement {i + 1}: the author suggests that \"local\" knowledge & experience matter most.",
+            user_answer="Not Given" if i % 3 else "True",
+            correct_answer="True",
+            is_correct=i % 3 == 0,
+        )
+        for i in range(count)
+    ]
+
+
+def _documents() -> dict:
+    reading_cards = _cards(38)
+    listening_cards = _cards(35)
+    chips = [f"Part{i}: {i}/6" for i in range(1, 8)]
+    answer = " ".join(["Some candidates argue that <online> learning & teaching work."] * 25)
+    tasks = [WritingTask("Task 1.1", "Write a letter.", answer), WritingTask("Task 1.2", "Reply.", answer), WritingTask("Task 2", "Essay.", answer)]
+    return {
+        "reading": lambda: render_qa_archive("CEFR Reading Submission", "CEFR Reading Archive", META, chips, reading_cards),
+        "listening": lambda: render_qa_archive("CEFR Listening Submission", "CEFR Listening Archive", META, chips, listening_cards),
+        "writing": lambda: render_writing_archive(META, tasks),
+    }
+
+
+def bench(name: str, render, renders: int) -> str:
+    size = len(render())
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (
+        f"{name:<10} {size / 1024:>6.1f} KiB  p50 {statistics.median(timings) * 1e6:>7.1f} us"
+        f"  p95 {timings[int(len(timings) * 0.95) - 1] * 1e6:>7.1f} us"
+        f"  peak allocated {peak / 1024:>6.1f} KiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=1000)
+    args = parser.parse_args()
+    for name, render in _documents().items():
+        print(bench(name, render, args.renders))
+
+
+if __name__ == "__main__":
+    main()
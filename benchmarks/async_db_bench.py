@@ -0,0 +1,112 @@
+"""
+Compare sync (threadpool + psycopg2) and async (asyncpg) throughput for the
+queries behind the endpoints that moved to `get_async_db`.
+
+    python -m benchmarks.async_db_bench --requests 2000 --concurrency 100
+
+The sync side runs in a 40-thread pool, the same limit FastAPI's threadpool
+applies to sync endpoints, so the numbers track what the routes see.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import selectinload
+
+from database.async_db import AsyncSessionLocal, dispose_async_engine
+from database.db import Feedback, IeltsTest, MockAttempt, SessionLocal, User, WritingResult, news
+
+FASTAPI_THREADPOOL_SIZE = 40
+
+
+def _statements(user_id: int) -> dict:
+    return {
+        "news": lambda: select(news),
+        "ielts_tests": lambda: (
+            select(IeltsTest)
+            .options(selectinload(IeltsTest.sections))
+            .filter(IeltsTest.is_published.is_(True))
+            .order_by(IeltsTest.id.desc())
+        ),
+        "feedback_public": lambda: (
+            select(Feedback, User.username)
+            .join(User, User.id == Feedback.user_id)
+            .filter(Feedback.text.isnot(None))
+            .order_by(desc(Feedback.id))
+            .limit(12)
+        ),
+        "dashboard_home": lambda: (
+            select(MockAttempt)
+            .filter(MockAttempt.user_id == user_id)
+            .order_by(MockAttempt.created_at.desc(), MockAttempt.id.desc())
+            .limit(30)
+        ),
+        "dashboard_counts": lambda: (
+            select(func.count())
+            .select_from(WritingResult)
+            .filter(WritingResult.user_id == user_id, WritingResult.result.is_(None))
+        ),
+    }
+
+
+def _summary(mode: str, name: str, latencies: list[float], elapsed: float) -> str:
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return (
+        f"{mode:<5} {name:<18} {len(latencies) / elapsed:>9.1f} req/s"
+        f"  p50 {statistics.median(latencies) * 1000:>7.2f} ms  p95 {p95 * 1000:>7.2f} ms"
+    )
+
+
+def run_sync(name: str, build, requests: int) -> str:
+    def one() -> float:
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            db.execute(build()).all()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=FASTAPI_THREADPOOL_SIZE) as pool:
+        latencies = list(pool.map(lambda _: one(), range(requests)))
+    return _summary("sync", name, latencies, time.perf_counter() - started)
+
+
+async def run_async(name: str, build, requests: int, concurrency: int) -> str:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with semaphore:
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                (await db.execute(build())).all()
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = list(await asyncio.gather(*(one() for _ in range(requests))))
+    return _summary("async", name, latencies, time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--only", choices=sorted(_statements(0)), default=None)
+    args = parser.parse_args()
+
+    try:
+        for name, build in _statements(args.user_id).items():
+            if args.only and name != args.only:
+                continue
+            print(await asyncio.to_thread(run_sync, name, build, args.requests))
+            print(await run_async(name, build, args.requests, args.concurrency))
+    finally:
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import os
+from collections.abc import AsyncIterator
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.db import DATABASE_URL
+from database.pool import (
+    DB_APPLICATION_NAME,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+    InstrumentedAsyncQueuePool,
+    instrument_engine,
+)
+
+# Sized separately from the sync pool: both are open at once in one worker.
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", str(DB_POOL_SIZE)))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+
+def async_database_url(url: str) -> str:
+    """Rewrite the psycopg2 URL for asyncpg, which spells `sslmode` as `ssl`."""
+    parsed = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(parsed.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode and "ssl" not in query:
+        query["ssl"] = sslmode
+    return parsed.set(query=query).render_as_string(hide_password=False)
+
+
+def _server_settings() -> dict:
+    settings = {"application_name": DB_APPLICATION_NAME}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+    return settings
+
+
+async_engine = create_async_engine(
+    os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL),
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_use_lifo=True,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args={"server_settings": _server_settings()},
+)
+instrument_engine(async_engine.sync_engine, prefix="async_db_pool")
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    await async_engine.dispose()
@@ -2,20 +2,20 @@ import os
 from datetime import datetime
 
 from dotenv import load_dotenv
-from sqlalchemy import ARRAY, JSON, Boolean, Column, DateTime, ForeignKey, Integer, String, create_engine, func
+from sqlalchemy import ARRAY, JSON, Boolean, Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, create_engine, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
+from database.pool import engine_options, instrument_engine
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL must be set before importing database models")
 
-engine = create_engine(
-    url=DATABASE_URL,
-    pool_pre_ping=True,
-)
+engine = create_engine(url=DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine)
 Base = declarative_base()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
@@ -65,11 +65,18 @@ class SpeakingMock(Base):
 
 class SpeakingResult(Base):
     __tablename__ = "speaking_results"
+    __table_args__ = (
+        # Keyset pagination and per-mock stats; see database.schema.SCHEMA_UPGRADES.
+        Index("ix_speaking_results_mock_id_created_at", "mock_id", "created_at"),
+        Index("ix_speaking_results_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     mock_id = Column(Integer, ForeignKey("speaking_mocks.id"))
     recordings = Column(JSON)
+    # NULL until an admin checks the result.
+    evaluation = Column(JSON, nullable=True)
     total_duration = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -319,29 +326,72 @@ class MockProgress(Base):
 
 
 class RequestAuditLog(Base):
+    """
+    Partitioned by range on created_at (see services/audit_partitions.py), so
+    created_at is part of the primary key. Grouped reads go through
+    RequestAuditRollup, which is why only created_at is indexed here.
+    """
+
     __tablename__ = "request_audit_logs"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True)
-    method = Column(String(12), nullable=False, index=True)
-    path = Column(String(255), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    method = Column(String(12), nullable=False)
+    path = Column(String(255), nullable=False)
     query_string = Column(String, nullable=True)
     full_url = Column(String, nullable=True)
-    status_code = Column(Integer, nullable=False, index=True)
-    client_ip = Column(String(64), nullable=True, index=True)
+    status_code = Column(Integer, nullable=False)
+    client_ip = Column(String(64), nullable=True)
     forwarded_for = Column(String(255), nullable=True)
     host = Column(String(255), nullable=True)
-    origin = Column(String(255), nullable=True, index=True)
+    origin = Column(String(255), nullable=True)
     referer = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
     scheme = Column(String(16), nullable=True)
     request_headers = Column(JSON, nullable=False, default=dict)
     risk_flags = Column(JSON, nullable=False, default=list)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
+
+
+class RequestAuditRollup(Base):
+    __tablename__ = "request_audit_rollups"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "dimension", "value", name="uq_request_audit_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    dimension = Column(String(20), nullable=False)
+    value = Column(String(512), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
 
 
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    __table_args__ = (Index("ix_background_jobs_status_run_after", "status", "run_after"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    # Enqueueing twice with the same key is a no-op.
+    idempotency_key = Column(String(200), nullable=True, unique=True)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    # Free-form status a long-running handler reports via report_progress().
+    progress = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+# Schema checks run from the app lifespan (or `python -m database.schema`),
+# never at import time.
 AUTO_CREATE_DB = os.getenv("AUTO_CREATE_DB", "true").strip().lower() in {"1", "true", "yes", "on"}
-if AUTO_CREATE_DB:
-    Base.metadata.create_all(bind=engine)
+FAST_STARTUP = os.getenv("FAST_STARTUP", "false").strip().lower() in {"1", "true", "yes", "on"}
 
 
 def get_db():
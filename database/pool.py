@@ -0,0 +1,108 @@
+import os
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from services.metrics import metrics
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# 0 disables the server-side limit.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "mockstream-server")
+# Connections idle longer than this are pinged on checkout; busy ones are not.
+DB_PING_IDLE_SECONDS = float(os.getenv("DB_PING_IDLE_SECONDS", "30"))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    metric_prefix = "db_pool"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.incr(f"{self.metric_prefix}.timeouts")
+            raise
+        finally:
+            metrics.observe(f"{self.metric_prefix}.checkout_wait_ms", (time.perf_counter() - started) * 1000)
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    metric_prefix = "async_db_pool"
+
+
+def engine_options(database_url: str) -> dict:
+    options = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_use_lifo=True,
+    )
+    if database_url.startswith("postgresql"):
+        connect_args = {"application_name": DB_APPLICATION_NAME}
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        options["connect_args"] = connect_args
+    return options
+
+
+def _ping(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine, prefix: str = "db_pool") -> None:
+    """Attach idle-aware pre-ping and checkout/checkin counters to the engine's pool."""
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.incr(f"{prefix}.checkouts")
+        last_checkin = connection_record.info.get("last_checkin")
+        if last_checkin is None or time.monotonic() - last_checkin < DB_PING_IDLE_SECONDS:
+            return
+        try:
+            _ping(dbapi_connection)
+        except Exception as e:
+            metrics.incr(f"{prefix}.stale_connections")
+            # The pool discards this connection and retries with a fresh one.
+            raise exc.DisconnectionError(f"Stale pooled connection: {e}") from e
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        if connection_record is not None:
+            connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.incr(f"{prefix}.connects")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.incr(f"{prefix}.invalidations")
+
+
+def pool_stats(engine, prefix: str = "db_pool") -> dict:
+    pool = engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool._timeout,
+        "recycle_seconds": DB_POOL_RECYCLE,
+        "statement_timeout_ms": DB_STATEMENT_TIMEOUT_MS or None,
+    }
+    stats.update(metrics.snapshot(f"{prefix}."))
+    return stats
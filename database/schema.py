@@ -0,0 +1,124 @@
+"""
+Schema management, run once per deploy instead of on every import.
+
+    python -m database.schema          # create missing tables, apply upgrades, audit partitions
+    python -m database.schema check    # list missing tables and upgrades, exit 1 if any
+
+The app lifespan calls `ensure_schema()` when AUTO_CREATE_DB is on. That costs a
+few catalog queries when the schema is already in place; create_all only
+runs if a table is missing, under an advisory lock so concurrent workers do
+not race each other.
+
+create_all never touches existing tables, so columns and indexes added to a
+model later are listed in SCHEMA_UPGRADES and applied the same way.
+"""
+
+import sys
+
+from sqlalchemy import inspect, text
+
+from database.db import Base, SessionLocal, engine
+
+# Arbitrary constant shared by every worker for pg_advisory_xact_lock.
+SCHEMA_LOCK_ID = 7420113
+
+# (table, column or index name) added to existing models. Column
+# definitions and index expressions come from the model metadata.
+SCHEMA_UPGRADES = (
+    ("speaking_results", "evaluation"),
+    ("speaking_results", "ix_speaking_results_mock_id_created_at"),
+    ("speaking_results", "ix_speaking_results_user_id_created_at"),
+    ("background_jobs", "progress"),
+)
+
+
+def missing_tables(connection) -> list[str]:
+    expected = [table.name for table in Base.metadata.sorted_tables]
+    if connection.dialect.name != "postgresql":
+        existing = set(inspect(connection).get_table_names())
+    else:
+        # relkind "p" is the partitioned request_audit_logs parent.
+        existing = set(
+            connection.execute(
+                text(
+                    "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p') AND c.relname = ANY(:names)"
+                ),
+                {"names": expected},
+            ).scalars()
+        )
+    return [name for name in expected if name not in existing]
+
+
+def pending_upgrades(connection, skip_tables: list[str] = ()) -> list[str]:
+    """SCHEMA_UPGRADES entries not yet applied, as "table.name"."""
+    inspector = inspect(connection)
+    pending = []
+    for table_name, name in SCHEMA_UPGRADES:
+        if table_name in skip_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        existing |= {index["name"] for index in inspector.get_indexes(table_name)}
+        if name not in existing:
+            pending.append(f"{table_name}.{name}")
+    return pending
+
+
+def _apply_upgrade(connection, qualified_name: str) -> None:
+    table_name, name = qualified_name.split(".", 1)
+    table = Base.metadata.tables[table_name]
+    if name in table.columns:
+        column = table.columns[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN "{name}" {column_type}'))
+    else:
+        next(index for index in table.indexes if index.name == name).create(bind=connection)
+
+
+def create_schema() -> list[str]:
+    """Create missing tables, apply pending upgrades and return what changed."""
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        missing = missing_tables(connection)
+        if missing:
+            Base.metadata.create_all(bind=connection, tables=[Base.metadata.tables[name] for name in missing])
+        # Fresh tables already have every column and index.
+        upgrades = pending_upgrades(connection, skip_tables=missing)
+        for qualified_name in upgrades:
+            _apply_upgrade(connection, qualified_name)
+    return missing + upgrades
+
+
+def ensure_schema() -> list[str]:
+    """Fast path for startup: catalog queries only, DDL only when needed."""
+    with engine.connect() as connection:
+        missing = missing_tables(connection)
+        if not missing and not pending_upgrades(connection):
+            return []
+    return create_schema()
+
+
+def _ensure_partitions() -> list[str]:
+    from services.audit_partitions import ensure_partitions
+
+    db = SessionLocal()
+    try:
+        return ensure_partitions(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "create"
+    if command == "create":
+        print({"applied": create_schema(), "created_partitions": _ensure_partitions()})
+    elif command == "check":
+        with engine.connect() as conn:
+            missing = missing_tables(conn)
+            upgrades = pending_upgrades(conn, skip_tables=missing)
+        print({"missing_tables": missing, "pending_upgrades": upgrades})
+        sys.exit(1 if missing or upgrades else 0)
+    else:
+        print("usage: python -m database.schema [create|check]")
+        sys.exit(2)
@@ -1,4 +1,6 @@
+import importlib
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from time import perf_counter
 
@@ -8,33 +10,104 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from sqlalchemy import desc, text
+from sqlalchemy import desc, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.middleware.sessions import SessionMiddleware
 
-from auth.auth import get_current_user
-from auth.router import router as auth_router
-from database.db import Feedback as FeedbackModel, SpeakingResult, User, WritingResult, get_db
-from routes.News import router as news_router
-from routes.ReadingMockQuestion import router as reading_routes
-from routes.WritingMock import router as writing_router
-from routes.dashboard_router import router as dashboard_router
-from routes.ielts_router import router as ielts_router
-from routes.listening_router import router as listening_router
-from routes.notification_router import router as notification_routes
-from routes.permissions_router import router as perm_router
-from routes.session_router import router as session_router
-from routes.speaking_router import router as speaking_router
-from routes.traffic_monitor_router import router as traffic_monitor_router
-from routes.tts_router import router as tts_router
-from routes.user import router as user_router
+from services.startup_report import startup_report
+
+with startup_report.measure("import database"):
+    from database.async_db import async_engine, dispose_async_engine, get_async_db
+    from database.db import (
+        AUTO_CREATE_DB,
+        FAST_STARTUP,
+        Feedback as FeedbackModel,
+        SpeakingResult,
+        User,
+        WritingResult,
+        engine,
+        get_db,
+    )
+    from database.pool import pool_stats
+    from database.schema import ensure_schema
+with startup_report.measure("import redis_client"):
+    from redis_client import redis_manager
+with startup_report.measure("import auth.auth"):
+    from auth.auth import get_current_user, verify_role
+from rate_limit import global_rate_limiter
+from services.audit_log_writer import audit_log_writer
+from services.audit_partitions import ensure_partitions_on_startup
+from services.archive_batcher import ARCHIVE_BATCH_WINDOW_SECONDS, archive_batcher
+from services.audio_storage import check_audio_storage, get_audio_storage
 from services.email_service import send_email
-from services.request_monitor import create_audit_log, extract_client_ip, should_skip_logging
-from database.db import SessionLocal
+from services.job_queue import JOB_WORKER_IN_PROCESS, job_worker
+from services.metrics import metrics
+from services.mock_content_cache import mock_content_cache
+from services.principal_cache import principal_cache
+from services.request_monitor import build_audit_log_row, extract_client_ip, should_skip_logging
+from services.tts_cache import tts_cache
+
+# Included in this order; each import is timed for the startup report.
+ROUTER_MODULES = (
+    "auth.router",
+    "routes.user",
+    "routes.ReadingMockQuestion",
+    "routes.WritingMock",
+    "routes.notification_router",
+    "routes.News",
+    "routes.speaking_router",
+    "routes.tts_router",
+    "routes.listening_router",
+    "routes.permissions_router",
+    "routes.session_router",
+    "routes.ielts_router",
+    "routes.dashboard_router",
+    "routes.traffic_monitor_router",
+    "routes.job_router",
+)
+
+
+def _import_router(module_name: str):
+    with startup_report.measure(f"import {module_name}"):
+        return importlib.import_module(module_name).router
+
+
+routers = [_import_router(module_name) for module_name in ROUTER_MODULES]
 
 load_dotenv()
 
-app = FastAPI(title="Server")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail the deploy rather than silently storing recordings on local disk.
+    check_audio_storage()
+    with startup_report.measure("lifespan redis pools"):
+        redis_manager.init()
+    # FAST_STARTUP assumes `python -m database.schema` ran in the deploy step.
+    if AUTO_CREATE_DB and not FAST_STARTUP:
+        with startup_report.measure("lifespan ensure_schema"):
+            ensure_schema()
+        with startup_report.measure("lifespan audit partitions"):
+            ensure_partitions_on_startup()
+    audit_log_writer.start()
+    if JOB_WORKER_IN_PROCESS:
+        job_worker.start()
+    if ARCHIVE_BATCH_WINDOW_SECONDS > 0:
+        archive_batcher.start()
+    startup_report.mark_ready()
+    startup_report.log()
+    try:
+        yield
+    finally:
+        job_worker.stop()
+        archive_batcher.stop()
+        audit_log_writer.stop()
+        await redis_manager.aclose()
+        await dispose_async_engine()
+
+
+app = FastAPI(title="Server", lifespan=lifespan)
 
 _session_secret = os.getenv("SESSION_SECRET_KEY")
 if not _session_secret:
@@ -53,6 +126,9 @@ allowed_origins = [
     if origin.strip()
 ]
 
+# Registered before CORS so CORS wraps it and 429 responses carry the CORS headers.
+app.middleware("http")(global_rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins or ["*"],
@@ -61,20 +137,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(auth_router)
-app.include_router(user_router)
-app.include_router(reading_routes)
-app.include_router(writing_router)
-app.include_router(notification_routes)
-app.include_router(news_router)
-app.include_router(speaking_router)
-app.include_router(tts_router)
-app.include_router(listening_router)
-app.include_router(perm_router)
-app.include_router(session_router)
-app.include_router(ielts_router)
-app.include_router(dashboard_router)
-app.include_router(traffic_monitor_router)
+for router in routers:
+    app.include_router(router)
 
 
 class mailModel(BaseModel):
@@ -108,11 +172,9 @@ async def request_audit_middleware(request, call_next):
         if not should_skip_logging(path):
             headers = {key.lower(): value for key, value in request.headers.items()}
             client_ip, forwarded_for = extract_client_ip(headers, request.client.host if request.client else None)
-            db = SessionLocal()
             try:
-                try:
-                    create_audit_log(
-                        db,
+                await audit_log_writer.asubmit(
+                    build_audit_log_row(
                         method=request.method,
                         path=path,
                         query_string=request.url.query,
@@ -138,10 +200,9 @@ async def request_audit_middleware(request, call_next):
                             "request_time_ms": elapsed_ms,
                         },
                     )
-                except Exception:
-                    db.rollback()
-            finally:
-                db.close()
+                )
+            except Exception as e:
+                print(f"Audit log enqueue error: {e}")
     return response
 
 
@@ -160,6 +221,7 @@ def readiness(db: Session = Depends(get_db)):
             "google_oauth": bool(os.getenv("GOOGLE_CLIENT_ID") and os.getenv("GOOGLE_CLIENT_SECRET")),
             "gemini": bool(os.getenv("GEMINI_API_KEY")),
             "supabase": bool(os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY")),
+            "speaking_storage": get_audio_storage().name,
             "mailjet": bool(
                 os.getenv("MAILJET_API_KEY")
                 and os.getenv("MAILJET_API_SECRET")
@@ -169,6 +231,57 @@ def readiness(db: Session = Depends(get_db)):
     }
 
 
+# Only /health and /health/ready are public; the rest expose internals and are admin-only.
+admin_only = Depends(verify_role(["admin"]))
+
+
+@app.get("/health/redis", dependencies=[admin_only])
+async def redis_health():
+    try:
+        await redis_manager.get_async().ping()
+        status = "ok"
+    except Exception as e:
+        # The exception text can carry the Redis host and port.
+        print(f"Redis health check error: {e}")
+        status = "error"
+    return {"status": status, "pools": redis_manager.stats()}
+
+
+@app.get("/health/pool", dependencies=[admin_only])
+def db_pool_health():
+    return {"sync": pool_stats(engine), "async": pool_stats(async_engine, prefix="async_db_pool")}
+
+
+@app.get("/health/metrics", dependencies=[admin_only])
+def metrics_health():
+    return metrics.snapshot()
+
+
+@app.get("/health/startup", dependencies=[admin_only])
+def startup_health():
+    return startup_report.snapshot()
+
+
+@app.get("/health/principal-cache", dependencies=[admin_only])
+def principal_cache_stats():
+    return principal_cache.stats()
+
+
+@app.get("/health/mock-content-cache", dependencies=[admin_only])
+def mock_content_cache_stats():
+    return mock_content_cache.stats()
+
+
+@app.get("/health/archive-batcher", dependencies=[admin_only])
+def archive_batcher_stats():
+    return archive_batcher.stats()
+
+
+@app.get("/health/tts-cache", dependencies=[admin_only])
+def tts_cache_stats():
+    return tts_cache.stats()
+
+
 @app.post("/contact")
 def contact(data: mailModel):
     msg = f"""
@@ -264,29 +377,29 @@ def get_my_feedback_status(
 
 
 @app.get("/feedback/public")
-def get_public_feedbacks(
+async def get_public_feedbacks(
     limit: int = 12,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     safe_limit = max(1, min(limit, 30))
-    rows = (
-        db.query(FeedbackModel, User)
+    result = await db.execute(
+        select(FeedbackModel, User.username)
         .join(User, User.id == FeedbackModel.user_id)
         .filter(FeedbackModel.text.isnot(None))
         .filter(FeedbackModel.text != "")
         .order_by(desc(FeedbackModel.id))
         .limit(safe_limit)
-        .all()
     )
+    rows = result.all()
 
     return {
         "feedbacks": [
             {
                 "id": feedback.id,
-                "username": user.username or "User",
+                "username": username or "User",
                 "rating": feedback.rating,
                 "text": feedback.text,
             }
-            for feedback, user in rows
+            for feedback, username in rows
         ]
     }
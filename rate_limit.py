@@ -1,25 +1,200 @@
-from fastapi import Request, HTTPException, status
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+
+from fastapi import Request
 from fastapi.responses import JSONResponse
-from redis_client import redis_client
+from auth.auth import verify_access_token
+from redis_client import get_async_redis
 
-MAX_REQUESTS = 40
-WINDOW_SECONDS = 60
+MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "40"))
+WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+# Off by default: behind a proxy it needs RATE_LIMIT_TRUSTED_PROXIES, or every
+# client shares the proxy's bucket.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
+REDIS_RETRY_AFTER_SECONDS = 5
+# Reverse proxies in front of the app that append to X-Forwarded-For. 0 means
+# the app is reached directly and the header is ignored.
+TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
 
-async def global_rate_limiter(request: Request, call_next):
-    ip = request.client.host
-    key = f"rate:{ip}"
-
-    current = redis_client.get(key)
-
-    if current is None:
-        redis_client.set(key, 1, ex=WINDOW_SECONDS)
-    else:
-        current = int(current)
-        if current >= MAX_REQUESTS:
-            return JSONResponse(
-                status_code=429,
-                content={"detail": f"Rate limit exceeded. Try after {WINDOW_SECONDS} seconds"}
+
+@dataclass(frozen=True)
+class RatePolicy:
+    name: str
+    limit: int
+    window_seconds: int
+    per_user: bool = False
+
+
+DEFAULT_POLICY = RatePolicy("default", MAX_REQUESTS, WINDOW_SECONDS)
+
+# Longest matching prefix wins. Authenticated routes are limited per user so
+# users behind one NAT do not share a budget.
+ROUTE_POLICIES = {
+    "/auth/login": RatePolicy("auth", 10, 60),
+    "/auth/register": RatePolicy("auth", 10, 60),
+    "/auth/forgot-password": RatePolicy("password_reset", 5, 300),
+    "/contact": RatePolicy("contact", 3, 300),
+    "/key": RatePolicy("key", 5, 60),
+    "/tts": RatePolicy("tts", 10, 60, per_user=True),
+    "/mock/speaking/submit": RatePolicy("speaking_submit", 6, 60, per_user=True),
+    # One request per chunk; a full exam is a few dozen PUTs.
+    "/mock/speaking/uploads": RatePolicy("speaking_upload", 300, 60, per_user=True),
+}
+EXEMPT_PATH_PREFIXES = ("/health", "/uploads", "/docs", "/openapi.json")
+
+# Sliding window log: drop entries older than the window, then admit the
+# request only if fewer than `limit` remain. One EVALSHA per request.
+SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count < limit then
+  redis.call('ZADD', key, now, ARGV[4])
+  redis.call('PEXPIRE', key, window)
+  return {1, limit - count - 1, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+local retry_after = window
+if oldest[2] then
+  retry_after = tonumber(oldest[2]) + window - now
+end
+return {0, 0, retry_after}
+"""
+_scripts: dict[int, object] = {}
+
+
+def _sliding_window_script():
+    # Scripts are bound to a client; re-register if the pool was recreated.
+    client = get_async_redis()
+    script = _scripts.get(id(client))
+    if script is None:
+        _scripts.clear()
+        script = _scripts[id(client)] = client.register_script(SLIDING_WINDOW_LUA)
+    return script
+
+
+class LocalSlidingWindow:
+    """In-process fallback used while Redis is unreachable."""
+
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._hits: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window_ms: int, now_ms: int) -> tuple[bool, int, int]:
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                if len(self._hits) >= self.max_keys:
+                    self._hits.clear()
+                hits = self._hits[key] = deque()
+            while hits and hits[0] <= now_ms - window_ms:
+                hits.popleft()
+            if len(hits) < limit:
+                hits.append(now_ms)
+                return True, limit - len(hits), 0
+            return False, 0, hits[0] + window_ms - now_ms
+
+
+local_limiter = LocalSlidingWindow()
+_redis_down_until = 0.0
+
+
+def resolve_policy(path: str) -> RatePolicy | None:
+    if path.startswith(EXEMPT_PATH_PREFIXES):
+        return None
+    best_prefix = ""
+    for prefix in ROUTE_POLICIES:
+        if path.startswith(prefix) and len(prefix) > len(best_prefix):
+            best_prefix = prefix
+    return ROUTE_POLICIES[best_prefix] if best_prefix else DEFAULT_POLICY
+
+
+def _user_id_from_request(request: Request) -> str | None:
+    auth_header = request.headers.get("authorization") or ""
+    if not auth_header.lower().startswith("bearer "):
+        return None
+    # An HMAC check, no round trip; unsigned claims would let a client pick its own bucket.
+    claims = verify_access_token(auth_header[7:].strip())
+    if not claims:
+        return None
+    user_id = claims.get("id")
+    return str(user_id) if user_id is not None else None
+
+
+_warned_forwarded_for = False
+
+
+def _client_ip(request: Request) -> str:
+    global _warned_forwarded_for
+    peer = request.client.host if request.client else "unknown"
+    forwarded_for = request.headers.get("x-forwarded-for") or ""
+    if TRUSTED_PROXY_HOPS <= 0:
+        if forwarded_for and not _warned_forwarded_for:
+            _warned_forwarded_for = True
+            print(
+                f"Rate limiter warning: requests carry X-Forwarded-For but RATE_LIMIT_TRUSTED_PROXIES is 0; "
+                f"every client behind the proxy ({peer}) shares one bucket"
             )
-        redis_client.incr(key)
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    if not hops:
+        return peer
+    # Entries left of the ones our proxies appended are whatever the client sent.
+    return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+
+
+async def check_rate_limit(request: Request, policy: RatePolicy) -> tuple[bool, int, int]:
+    identity = None
+    if policy.per_user:
+        user_id = _user_id_from_request(request)
+        identity = f"user:{user_id}" if user_id else None
+    identity = identity or f"ip:{_client_ip(request)}"
+    key = f"rate:{policy.name}:{identity}"
+
+    global _redis_down_until
+    now_ms = int(time.time() * 1000)
+    window_ms = policy.window_seconds * 1000
+    if time.monotonic() >= _redis_down_until:
+        try:
+            allowed, remaining, retry_after_ms = await _sliding_window_script()(
+                keys=[key],
+                args=[now_ms, window_ms, policy.limit, f"{now_ms}-{uuid.uuid4().hex[:8]}"],
+            )
+            return bool(allowed), int(remaining), int(retry_after_ms)
+        except Exception as e:
+            # Skip Redis for a few seconds instead of paying a failed call per request.
+            _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+            print(f"Rate limiter redis error, using local fallback: {e}")
+    return local_limiter.hit(key, policy.limit, window_ms, now_ms)
+
+
+async def global_rate_limiter(request: Request, call_next):
+    policy = resolve_policy(request.url.path) if RATE_LIMIT_ENABLED else None
+    if policy is None or request.method == "OPTIONS":
+        return await call_next(request)
+
+    allowed, remaining, retry_after_ms = await check_rate_limit(request, policy)
+    if not allowed:
+        retry_after = max(1, -(-retry_after_ms // 1000))
+        return JSONResponse(
+            status_code=429,
+            content={"detail": f"Rate limit exceeded. Try after {retry_after} seconds"},
+            headers={
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Limit": str(policy.limit),
+                "X-RateLimit-Remaining": "0",
+            },
+        )
 
-    return await call_next(request)
\ No newline at end of file
+    response = await call_next(request)
+    response.headers["X-RateLimit-Limit"] = str(policy.limit)
+    response.headers["X-RateLimit-Remaining"] = str(remaining)
+    return response
@@ -1,10 +1,124 @@
 import os
+import threading
+
 import redis
+import redis.asyncio as redis_asyncio
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", "2"))
+# How long a caller waits for a free connection once all REDIS_MAX_CONNECTIONS are in use.
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "0.5"))
+
+
+def _pool_options() -> dict:
+    """Shared settings for the sync and asyncio pools."""
+    return dict(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        decode_responses=True,
+        username=os.getenv("REDIS_USERNAME", "default"),
+        password=os.getenv("REDIS_PASSWORD", ""),
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+
+
+class RedisManager:
+    """
+    Owns one sync and one asyncio connection pool built from the same config.
+
+    Both are blocking pools: under a burst of more than REDIS_MAX_CONNECTIONS
+    concurrent callers the extra ones wait for a connection instead of getting
+    "Too many connections", which callers would treat as Redis being down.
+
+    `init()` runs in the FastAPI lifespan startup and `aclose()` on shutdown.
+    Scripts and workers that never start the app get pools lazily on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sync_pool: redis.BlockingConnectionPool | None = None
+        self.async_pool: redis_asyncio.BlockingConnectionPool | None = None
+        self.sync_client: redis.Redis | None = None
+        self.async_client: redis_asyncio.Redis | None = None
+
+    def init(self) -> None:
+        with self._lock:
+            # Retry settings are connection options, so they go on the pools.
+            if self.sync_client is None:
+                self.sync_pool = redis.BlockingConnectionPool(
+                    **_pool_options(),
+                    retry_on_timeout=True,
+                    retry=Retry(ExponentialBackoff(cap=0.5, base=0.05), REDIS_RETRIES),
+                )
+                self.sync_client = redis.Redis(connection_pool=self.sync_pool)
+            if self.async_client is None:
+                self.async_pool = redis_asyncio.BlockingConnectionPool(
+                    **_pool_options(),
+                    retry_on_timeout=True,
+                    retry=AsyncRetry(ExponentialBackoff(cap=0.5, base=0.05), REDIS_RETRIES),
+                )
+                self.async_client = redis_asyncio.Redis(connection_pool=self.async_pool)
+
+    def get_sync(self) -> redis.Redis:
+        if self.sync_client is None:
+            self.init()
+        return self.sync_client
+
+    def get_async(self) -> redis_asyncio.Redis:
+        if self.async_client is None:
+            self.init()
+        return self.async_client
+
+    async def aclose(self) -> None:
+        with self._lock:
+            sync_pool, async_pool = self.sync_pool, self.async_pool
+            self.sync_pool = self.async_pool = None
+            self.sync_client = self.async_client = None
+        if async_pool is not None:
+            await async_pool.disconnect()
+        if sync_pool is not None:
+            sync_pool.disconnect()
+
+    def stats(self) -> dict:
+        def pool_stats(pool):
+            if pool is None:
+                return None
+            if isinstance(pool, redis.BlockingConnectionPool):
+                # The sync pool keeps idle connections in a queue padded with None.
+                created = len(pool._connections)
+                idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+                in_use = created - idle
+            else:
+                in_use = len(pool._in_use_connections)
+                idle = len(pool._available_connections)
+                created = in_use + idle
+            return {
+                "max_connections": pool.max_connections,
+                "timeout": pool.timeout,
+                "created": created,
+                "in_use": in_use,
+                "idle": idle,
+            }
+
+        return {"sync": pool_stats(self.sync_pool), "async": pool_stats(self.async_pool)}
+
+
+redis_manager = RedisManager()
+
+
+def get_redis() -> redis.Redis:
+    return redis_manager.get_sync()
+
 
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", "6379")),
-    decode_responses=True,
-    username=os.getenv("REDIS_USERNAME", "default"),
-    password=os.getenv("REDIS_PASSWORD", ""),
-)
\ No newline at end of file
+def get_async_redis() -> redis_asyncio.Redis:
+    return redis_manager.get_async()
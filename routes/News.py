@@ -1,9 +1,12 @@
 import re
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from auth.auth import get_current_user, verify_role
+from database.async_db import get_async_db
 from database.db import get_db, news
 from schemas.news_schema import News, React
 
@@ -11,8 +14,9 @@ router = APIRouter(prefix="/news", tags=["News"])
 
 
 @router.get("/")
-def get_news(db: Session = Depends(get_db)):
-    return db.query(news).all()
+async def get_news(db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(news))
+    return result.scalars().all()
 
 
 @router.get("/{slug}")
@@ -3,11 +3,11 @@ from sqlalchemy.orm import Session
 from auth.auth import verify_role, get_current_user
 from database.db import get_db, WritingMock, WritingResult, User
 from schemas.WritingMockSchema import CreateMockData, MockResponse, Result
-from services.email_service import send_email
-from services.telegram_bot import send_document_to_telegram
+from services.archive_batcher import archive_document
+from services.archive_jobs import RESULT_EMAIL
+from services.archive_render import WritingTask, render_writing_archive
+from services.job_queue import enqueue
 from datetime import datetime
-from html import escape
-import io
 import os
 from routes.dashboard_router import AttemptPayload, create_attempt_row
 
@@ -62,8 +62,7 @@ def submit_mock(data: MockResponse,db:Session = Depends(get_db), user = Depends(
 
     result = WritingResult(user_id = user.id, task1= data.task1, task2=data.task2,mock_id=data.mock_id)
     db.add(result)
-    db.commit()
-    db.refresh(result)
+    db.flush()
 
     create_attempt_row(
         db=db,
@@ -78,6 +77,7 @@ def submit_mock(data: MockResponse,db:Session = Depends(get_db), user = Depends(
             attempt_meta={"result_id": result.id},
             clear_progress=True,
         ),
+        commit=False,
     )
 
     # Archive raw submission to Telegram as HTML document
@@ -92,146 +92,21 @@ def submit_mock(data: MockResponse,db:Session = Depends(get_db), user = Depends(
         task12_prompt = ((mock.task1 or {}).get("task12") or "").strip()
         task2_prompt = ((mock.task2 or {}).get("task2") or "").strip()
         created_at_label = created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
-        html_doc = f"""<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8" />
-  <title>CEFR Writing Submission</title>
-  <style>
-    :root {{
-      --bg: #f4f7fb;
-      --card: #ffffff;
-      --ink: #102238;
-      --muted: #5c6b80;
-      --line: #d7e0ec;
-      --primary: #0d6efd;
-      --primary-2: #4f46e5;
-      --ok-bg: #e8f7ef;
-    }}
-    * {{ box-sizing: border-box; }}
-    body {{
-      margin: 0;
-      padding: 28px;
-      background: linear-gradient(180deg, #eef3fa 0%, var(--bg) 100%);
-      color: var(--ink);
-      font-family: Segoe UI, Arial, sans-serif;
-      line-height: 1.45;
-    }}
-    .wrap {{
-      max-width: 980px;
-      margin: 0 auto;
-      background: var(--card);
-      border: 1px solid var(--line);
-      border-radius: 18px;
-      overflow: hidden;
-      box-shadow: 0 14px 34px rgba(16, 34, 56, 0.12);
-    }}
-    .hero {{
-      padding: 24px 28px;
-      background: linear-gradient(120deg, var(--primary), var(--primary-2));
-      color: #fff;
-    }}
-    .hero h1 {{ margin: 0 0 8px; font-size: 30px; }}
-    .meta {{
-      display: grid;
-      grid-template-columns: repeat(3, minmax(180px, 1fr));
-      gap: 8px 16px;
-      margin-top: 8px;
-      font-size: 14px;
-    }}
-    .meta b {{ opacity: .85; font-weight: 600; }}
-    .body {{ padding: 24px 28px 28px; }}
-    .task {{
-      border: 1px solid var(--line);
-      border-radius: 14px;
-      padding: 16px;
-      margin-bottom: 16px;
-      background: #fff;
-    }}
-    .task h2 {{ margin: 0 0 10px; font-size: 22px; }}
-    .label {{
-      font-size: 12px;
-      font-weight: 700;
-      color: #0b4db6;
-      background: #e8f0ff;
-      display: inline-block;
-      padding: 5px 9px;
-      border-radius: 999px;
-      margin-bottom: 10px;
-      text-transform: uppercase;
-      letter-spacing: .04em;
-    }}
-    .prompt {{
-      margin: 0 0 10px;
-      padding: 11px 12px;
-      border-radius: 10px;
-      border: 1px solid #dbe7ff;
-      background: #f4f8ff;
-      color: #1e3554;
-      white-space: pre-wrap;
-    }}
-    .answer {{
-      margin: 0;
-      padding: 12px;
-      border-radius: 10px;
-      background: #f7fafc;
-      border: 1px solid var(--line);
-      white-space: pre-wrap;
-      word-break: break-word;
-      font-size: 14px;
-    }}
-    .footer {{
-      margin-top: 8px;
-      font-size: 12px;
-      color: var(--muted);
-      text-align: right;
-    }}
-    @media (max-width: 820px) {{
-      body {{ padding: 14px; }}
-      .meta {{ grid-template-columns: 1fr 1fr; }}
-    }}
-  </style>
-</head>
-<body>
-  <div class="wrap">
-    <div class="hero">
-      <h1>CEFR Writing Archive</h1>
-      <div class="meta">
-        <div><b>Mock ID:</b> {data.mock_id}</div>
-        <div><b>Result ID:</b> {result.id}</div>
-        <div><b>Submitted:</b> {created_at_label}</div>
-        <div><b>User ID:</b> {user.id}</div>
-        <div><b>Username:</b> {escape(user.username or "-")}</div>
-        <div><b>Email:</b> {escape(user.email or "-")}</div>
-      </div>
-    </div>
-    <div class="body">
-      <section class="task">
-        <h2>Task 1.1</h2>
-        <div class="label">Question Prompt</div>
-        <p class="prompt">{escape(task11_prompt or "Task prompt not found")}</p>
-        <div class="label">User Answer</div>
-        <pre class="answer">{escape(task_11 or "")}</pre>
-      </section>
-      <section class="task">
-        <h2>Task 1.2</h2>
-        <div class="label">Question Prompt</div>
-        <p class="prompt">{escape(task12_prompt or "Task prompt not found")}</p>
-        <div class="label">User Answer</div>
-        <pre class="answer">{escape(task_12 or "")}</pre>
-      </section>
-      <section class="task">
-        <h2>Task 2</h2>
-        <div class="label">Question Prompt</div>
-        <p class="prompt">{escape(task2_prompt or "Task prompt not found")}</p>
-        <div class="label">User Answer</div>
-        <pre class="answer">{escape(data.task2 or "")}</pre>
-      </section>
-      <div class="footer">Generated by Mockstream Telegram Archive</div>
-    </div>
-  </div>
-</body>
-</html>"""
+        html_doc = render_writing_archive(
+            meta=[
+                ("Mock ID", data.mock_id),
+                ("Result ID", result.id),
+                ("Submitted", created_at_label),
+                ("User ID", user.id),
+                ("Username", user.username or "-"),
+                ("Email", user.email or "-"),
+            ],
+            tasks=[
+                WritingTask("Task 1.1", task11_prompt, task_11 or ""),
+                WritingTask("Task 1.2", task12_prompt, task_12 or ""),
+                WritingTask("Task 2", task2_prompt, data.task2 or ""),
+            ],
+        )
 
         caption = (
             f"📝 CEFR Writing Archive\n"
@@ -240,15 +115,20 @@ def submit_mock(data: MockResponse,db:Session = Depends(get_db), user = Depends(
             f"🧾 Result ID: {result.id}\n"
             f"⏰ Submitted: {created_at_label}"
         )
-        send_document_to_telegram(
-            file_buffer=io.BytesIO(html_doc.encode("utf-8")),
+    except Exception as e:
+        print(f"Writing telegram archive error: {e}")
+        html_doc = None
+    # Queued in the same transaction as the attempt, so neither commits without the other.
+    if html_doc is not None:
+        archive_document(
+            db,
+            chat_id=os.getenv("WRITING_ARCHIVE_CHANNEL"),
             filename=f"cefr_writing_user{user.id}_mock{data.mock_id}_result{result.id}.html",
+            content=html_doc,
             caption=caption,
-            mime_type="text/html",
-            chat_id=os.getenv("WRITING_ARCHIVE_CHANNEL"),
+            idempotency_key=f"writing-archive:{result.id}",
         )
-    except Exception as e:
-        print(f"Writing telegram archive error: {e}")
+    db.commit()
 
     return {"message":"Accepted successfully."}
 
@@ -445,7 +325,11 @@ def check_result(id:int,data:Result, db:Session = Depends(get_db), user = Depend
   </body>
 </html>
 """
-        send_email(user.email, f"Writing mock #{data.result['mock_id']} results", message)
+        enqueue(
+            db,
+            RESULT_EMAIL,
+            {"to": user.email, "subject": f"Writing mock #{data.result['mock_id']} results", "html": message},
+        )
     exists.result = result_data
     db.commit()
     db.refresh(exists)
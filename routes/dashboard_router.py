@@ -4,9 +4,12 @@ from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from auth.auth import get_current_user
+from auth.auth import Principal, get_current_principal, get_current_user
+from database.async_db import get_async_db
 from database.db import IeltsSubmission, MockAttempt, MockProgress, User, WritingResult, get_db
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
@@ -169,7 +172,7 @@ def upsert_progress_row(db: Session, user_id: int, payload: ProgressUpsertPayloa
     return row
 
 
-def complete_progress_rows(db: Session, user_id: int, exam_type: str, mock_id: Optional[str]) -> None:
+def complete_progress_rows(db: Session, user_id: int, exam_type: str, mock_id: Optional[str], commit: bool = True) -> None:
     rows = (
         db.query(MockProgress)
         .filter(
@@ -184,10 +187,12 @@ def complete_progress_rows(db: Session, user_id: int, exam_type: str, mock_id: O
         row.status = "completed"
         row.completed_at = datetime.utcnow()
         row.last_activity_at = datetime.utcnow()
-    db.commit()
+    if commit:
+        db.commit()
 
 
-def create_attempt_row(db: Session, user_id: int, payload: AttemptPayload) -> MockAttempt:
+def create_attempt_row(db: Session, user_id: int, payload: AttemptPayload, commit: bool = True) -> MockAttempt:
+    """With commit=False the row is only flushed, so the caller can add to the same transaction."""
     row = MockAttempt(
         user_id=user_id,
         exam_type=payload.exam_type,
@@ -204,10 +209,13 @@ def create_attempt_row(db: Session, user_id: int, payload: AttemptPayload) -> Mo
         attempt_meta=payload.attempt_meta,
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    if commit:
+        db.commit()
+        db.refresh(row)
+    else:
+        db.flush()
     if payload.clear_progress:
-        complete_progress_rows(db=db, user_id=user_id, exam_type=payload.exam_type, mock_id=payload.mock_id)
+        complete_progress_rows(db=db, user_id=user_id, exam_type=payload.exam_type, mock_id=payload.mock_id, commit=commit)
     return row
 
 
@@ -455,34 +463,37 @@ def resolve_latest_attempt(
 
 
 @router.get("/home")
-def get_dashboard_home(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def get_dashboard_home(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
-    active_progress = (
-        db.query(MockProgress)
+    active_progress = await db.scalar(
+        select(MockProgress)
         .filter(MockProgress.user_id == current_user.id, MockProgress.status == "active")
         .order_by(MockProgress.last_activity_at.desc(), MockProgress.id.desc())
-        .first()
+        .limit(1)
     )
     attempts = (
-        db.query(MockAttempt)
-        .filter(MockAttempt.user_id == current_user.id)
-        .order_by(MockAttempt.created_at.desc(), MockAttempt.id.desc())
-        .limit(30)
-        .all()
-    )
+        await db.scalars(
+            select(MockAttempt)
+            .filter(MockAttempt.user_id == current_user.id)
+            .order_by(MockAttempt.created_at.desc(), MockAttempt.id.desc())
+            .limit(30)
+        )
+    ).all()
 
     skill_scores = attempt_to_skill_values(attempts)
     streak = calculate_streak(attempts)
     cards = build_focus_cards(attempts, skill_scores)
 
-    pending_writing = (
-        db.query(WritingResult)
+    pending_writing = await db.scalar(
+        select(func.count())
+        .select_from(WritingResult)
         .filter(WritingResult.user_id == current_user.id, WritingResult.result.is_(None))
-        .count()
     )
-    ielts_count = db.query(IeltsSubmission).filter(IeltsSubmission.user_id == current_user.id).count()
+    ielts_count = await db.scalar(
+        select(func.count()).select_from(IeltsSubmission).filter(IeltsSubmission.user_id == current_user.id)
+    )
 
     random.seed(f"{current_user.id}-{date.today().isoformat()}")
     quote = random.choice(QUOTES)
@@ -2,53 +2,20 @@ from datetime import datetime
 from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
 
-from auth.auth import get_current_user, verify_role
+from auth.auth import Principal, get_current_principal, get_current_user, verify_role
+from database.async_db import get_async_db
 from database.db import IeltsSection, IeltsSubmission, IeltsTest, User, get_db
 from schemas.ielts_schema import IeltsModuleResult, IeltsOverview, IeltsSubmissionCreate, IeltsTestCreate, IeltsTestUpdate
 from routes.dashboard_router import AttemptPayload, create_attempt_row
+from services.scoring import compile_ielts_key, grade, score_to_band
 
 router = APIRouter(prefix="/ielts", tags=["IELTS"])
 
 
-def _normalize_answer(value: str) -> str:
-    if value is None:
-        return ""
-    return " ".join(str(value).strip().lower().split())
-
-
-def _score_to_band(module: str, score: int, total: int) -> Optional[str]:
-    if total <= 0:
-        return None
-
-    # IELTS listening/reading style approximation
-    ratio = score / total
-    if ratio >= 0.975:
-        return "9.0"
-    if ratio >= 0.925:
-        return "8.5"
-    if ratio >= 0.875:
-        return "8.0"
-    if ratio >= 0.825:
-        return "7.5"
-    if ratio >= 0.75:
-        return "7.0"
-    if ratio >= 0.675:
-        return "6.5"
-    if ratio >= 0.60:
-        return "6.0"
-    if ratio >= 0.525:
-        return "5.5"
-    if ratio >= 0.45:
-        return "5.0"
-    if ratio >= 0.375:
-        return "4.5"
-    if ratio >= 0.30:
-        return "4.0"
-    return "3.5"
-
-
 def _serialize_section(section: IeltsSection) -> Dict:
     return {
         "id": section.id,
@@ -116,14 +83,14 @@ def get_overview(
 
 
 @router.get("/tests")
-def list_tests(
+async def list_tests(
     module: Optional[str] = Query(default=None),
     exam_track: Optional[str] = Query(default=None),
     published_only: bool = Query(default=True),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
-    query = db.query(IeltsTest).options(selectinload(IeltsTest.sections))
+    query = select(IeltsTest).options(selectinload(IeltsTest.sections))
 
     if published_only and current_user.role != "admin":
         query = query.filter(IeltsTest.is_published.is_(True))
@@ -133,7 +100,8 @@ def list_tests(
     if exam_track:
         query = query.filter(IeltsTest.exam_track == exam_track)
 
-    tests = query.order_by(IeltsTest.id.desc()).all()
+    result = await db.execute(query.order_by(IeltsTest.id.desc()))
+    tests = result.scalars().all()
     if module:
         tests = [test for test in tests if any(section.module == module for section in test.sections)]
 
@@ -144,7 +112,7 @@ def list_tests(
 def get_test(
     test_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     test = (
         db.query(IeltsTest)
@@ -282,26 +250,11 @@ def submit_module(
 
     answer_key = section.answer_key or []
     if module in {"reading", "listening"} and answer_key:
-        normalized_user = [_normalize_answer(item) for item in data.answers]
-        normalized_key = [_normalize_answer(item) for item in answer_key]
-
-        max_score = len(normalized_key)
-        score = 0
-        mismatches = []
-        for idx, correct in enumerate(normalized_key):
-            user_ans = normalized_user[idx] if idx < len(normalized_user) else ""
-            if user_ans == correct:
-                score += 1
-            else:
-                mismatches.append(
-                    {
-                        "question": idx + 1,
-                        "expected": answer_key[idx],
-                        "received": data.answers[idx] if idx < len(data.answers) else "",
-                    }
-                )
-        band = _score_to_band(module, score, max_score)
-        feedback["mismatches"] = mismatches
+        graded = grade(compile_ielts_key(answer_key), {"answers": data.answers})
+        score = graded.score
+        max_score = graded.max_score
+        band = score_to_band(score, max_score)
+        feedback["mismatches"] = graded.mismatches()
         feedback["accuracy"] = round((score / max_score) * 100, 2) if max_score else 0
     else:
         feedback["status"] = "pending_manual_review"
@@ -340,7 +293,8 @@ def submit_module(
             band=submission.band,
             status="completed" if submission.score is not None else "pending_review",
             clear_progress=True,
-            attempt_meta=submission.feedback or {},
+            # submission_id lets a regrade update this row along with the submission.
+            attempt_meta={**(submission.feedback or {}), "submission_id": submission.id},
         ),
     )
 
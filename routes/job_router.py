@@ -0,0 +1,97 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from auth.auth import verify_role
+from database.db import BackgroundJob, User, get_db
+from services.archive_batcher import archive_batcher, spool_stats
+from services.job_queue import JOB_STATUSES, job_worker, queue_stats, retry_job
+from services.regrade import enqueue_regrade
+
+router = APIRouter(prefix="/dashboard/admin/jobs", tags=["background-jobs"])
+
+
+def serialize_job(job: BackgroundJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "idempotency_key": job.idempotency_key,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "last_error": job.last_error,
+        "progress": job.progress,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+@router.get("")
+def list_jobs(
+    status: str = Query(default="dead"),
+    kind: Optional[str] = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_role(["admin"])),
+):
+    if status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(JOB_STATUSES)}")
+    query = db.query(BackgroundJob).filter(BackgroundJob.status == status)
+    if kind:
+        query = query.filter(BackgroundJob.kind == kind)
+    jobs = query.order_by(BackgroundJob.id.desc()).limit(limit).all()
+    return {"jobs": [serialize_job(job) for job in jobs]}
+
+
+@router.get("/stats")
+def get_job_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_role(["admin"])),
+):
+    return {
+        "queue": queue_stats(db),
+        "worker": job_worker.stats(),
+        "archive_batcher": {**archive_batcher.stats(), "spool": spool_stats()},
+    }
+
+
+class RegradeRequest(BaseModel):
+    target: Literal["cefr_reading", "cefr_listening", "ielts_reading", "ielts_listening"]
+    mock_id: int  # IELTS test id for the ielts_* targets
+
+
+@router.post("/regrade", status_code=202)
+def start_regrade(
+    payload: RegradeRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_role(["admin"])),
+):
+    job_id = enqueue_regrade(db, payload.target, payload.mock_id)
+    db.commit()
+    return {"message": "Regrade queued", "job_id": job_id}
+
+
+@router.get("/{job_id}")
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_role(["admin"])),
+):
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
+
+
+@router.post("/{job_id}/retry")
+def retry_dead_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_role(["admin"])),
+):
+    if not retry_job(db, job_id):
+        raise HTTPException(status_code=409, detail="Job not found or already queued")
+    return {"message": "Job requeued", "job_id": job_id}
@@ -1,19 +1,33 @@
 ﻿from database.db import SpeakingMock, SpeakingResult, User
-from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File, Query, Request
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
-from auth.auth import verify_role, get_current_user
+from auth.auth import Principal, get_current_principal, get_current_user, verify_role
 from database.db import get_db
-from services.email_service import send_email
 from datetime import datetime, timezone
-import os
-from pathlib import Path
-from typing import List
-import zipfile
-import io
-from supabase import create_client, Client
-from services.telegram_bot import send_audio_zip_to_telegram
-import requests
-from pydantic import BaseModel
+from time import perf_counter
+import asyncio
+from typing import List, Optional
+from services.archive_jobs import RESULT_EMAIL, SPEAKING_REVIEW_ARCHIVE, enqueue_recordings_archive
+from services.job_queue import enqueue
+from services.metrics import metrics
+from services.resumable_uploads import (
+    UploadOffsetMismatch,
+    UploadSession,
+    UploadTooLarge,
+    append_chunk,
+    create_session,
+    delete_session,
+    get_session,
+)
+from services.audio_storage import get_audio_storage
+from services.speaking_storage import (
+    AudioUpload,
+    record_ingest,
+    recordings_zip_bytes,
+    upload_recordings,
+)
+from pydantic import BaseModel, Field
 from routes.dashboard_router import AttemptPayload, create_attempt_row
 
 class MobileSingleAudio(BaseModel):
@@ -24,16 +38,10 @@ class MobileSingleAudio(BaseModel):
 
 router = APIRouter(prefix="/mock/speaking", tags=["Speaking", "Mock", "CEFR"])
 
-# ===== SUPABASE CLIENT =====
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client | None = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
-BUCKET_NAME = "speaking-audios"
-
 
 # ===== GET ALL SPEAKING MOCKS =====
 @router.get("/all")
-def get_all_speaking_mocks(db: Session = Depends(get_db), user = Depends(get_current_user)):
+def get_all_speaking_mocks(db: Session = Depends(get_db), user: Principal = Depends(get_current_principal)):
     """Get all speaking mocks - authenticated users only"""
     data = db.query(SpeakingMock).all()
     return data
@@ -41,7 +49,7 @@ def get_all_speaking_mocks(db: Session = Depends(get_db), user = Depends(get_cur
 
 # ===== GET MOCK BY ID =====
 @router.get("/mock/{id}")
-def get_mock_by_id(id: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
+def get_mock_by_id(id: int, db: Session = Depends(get_db), user: Principal = Depends(get_current_principal)):
     """Get speaking mock by ID - authenticated users only"""
     mock = db.query(SpeakingMock).filter(SpeakingMock.id == id).first()
     if not mock:
@@ -113,10 +121,11 @@ async def submit_speaking_result(
     total_duration: int = Form(...),
     audios: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Submit speaking exam result with audio files to Supabase"""
-    
+    started = perf_counter()
+
     # 1. Mock mavjudligini tekshirish
     mock = db.query(SpeakingMock).filter(SpeakingMock.id == mock_id).first()
     if not mock:
@@ -132,73 +141,46 @@ async def submit_speaking_result(
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     folder_name = f"user{current_user.id}_mock{mock_id}_{timestamp}"
 
-    if supabase is None:
-        raise HTTPException(status_code=503, detail="Speaking storage is not configured")
-    
-    # 4. Supabase'ga upload qilish
-    recordings_data = {}
-    try:
-        for audio in audios:
-            if not audio.content_type or not audio.content_type.startswith("audio/"):
-                continue
-
-            safe_filename = audio.filename.replace(" ", "_") if audio.filename else "audio.webm"
-            file_path = f"{folder_name}/{safe_filename}"
-            
-            # Supabase'ga upload
-            file_content = await audio.read()
-            supabase.storage.from_(BUCKET_NAME).upload(
-                file_path,
-                file_content,
-                {"content_type": audio.content_type}
-            )
-            
-            # Public URL olish
-            public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(file_path)
-            recordings_data[safe_filename.replace('.webm', '')] = public_url
-    
-    except Exception as e:
-        print(f"Supabase upload error: {e}")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
-
-    # 5. Agar non-premium bo'lsa, ZIP yaratib Telegramga yuborish
-    if not is_premium:
-        try:
-            # ZIP memory'da yaratish
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for key, url in recordings_data.items():
-                    # URL'dan audio download qilish
-                    response = requests.get(url, timeout=15)
-                    if response.status_code == 200:
-                        zf.writestr(f"{key}.webm", response.content)
-            
-            zip_buffer.seek(0)
-            
-            caption = (
-                f"ğŸ“± Non-premium Submission\n"
-                f"ğŸ‘¤ User ID: {current_user.id}\n"
-                f"ğŸ“ Mock ID: {mock_id}\n"
-                f"â° Time: {timestamp}"
-            )
-            send_audio_zip_to_telegram(zip_buffer, caption=caption)
-        
-        except Exception as e:
-            print(f"Telegram send error: {e}")
-        
-        # Non-premium'lar uchun Supabase'dagi audiolari o'chirish
-        try:
-            for key in recordings_data.keys():
-                file_path = f"{folder_name}/{key}.webm"
-                supabase.storage.from_(BUCKET_NAME).remove([file_path])
-        except Exception as e:
-            print(f"Supabase delete error: {e}")
-        
-        recordings_data = {"status": "sent_to_telegram"}
+    # 4. Audio fayllarni o'qish
+    uploads = []
+    for audio in audios:
+        if not audio.content_type or not audio.content_type.startswith("audio/"):
+            continue
+
+        safe_filename = audio.filename.replace(" ", "_") if audio.filename else "audio.webm"
+        # Fayl spool'da qoladi, storage va ZIP'ga bo'laklab o'qiladi
+        uploads.append(AudioUpload.from_upload_file(safe_filename.replace('.webm', ''), safe_filename, audio))
+    record_ingest(uploads)
+
+    failed_uploads = {}
+    archive_zip = None
+    if is_premium:
+        # 5a. Premium - storage'ga parallel upload, URL'larni saqlash
+        storage = get_audio_storage()
+        outcomes = await upload_recordings(storage, folder_name, uploads)
+        audio_urls = {outcome.key: outcome.url for outcome in outcomes if outcome.ok}
+        failed_uploads = {outcome.key: outcome.error for outcome in outcomes if not outcome.ok}
+        if uploads and not audio_urls:
+            raise HTTPException(status_code=502, detail={"message": "Upload failed", "failed_uploads": failed_uploads})
+        recordings_data = {
+            "storage": storage.name,
+            "folder": folder_name,
+            "audios": audio_urls,
+            "paths": {outcome.key: outcome.path for outcome in outcomes if outcome.ok},
+        }
 
     else:
-        # Premium - Supabase URL'larni saqla
-        recordings_data = {"folder": folder_name, "audios": recordings_data}
+        # 5b. Non-premium - Supabase'siz, o'qilgan baytlardan ZIP yasab Telegramga yuborish
+        caption = (
+            f"ğŸ“± Non-premium Submission\n"
+            f"ğŸ‘¤ User ID: {current_user.id}\n"
+            f"ğŸ“ Mock ID: {mock_id}\n"
+            f"â° Time: {timestamp}"
+        )
+        # Faqat ZIP shu yerda yasaladi; Telegramga yuborish background job
+        archive_zip = await asyncio.to_thread(recordings_zip_bytes, uploads) if uploads else None
+
+        recordings_data = {"status": "sent_to_telegram"}
 
     # 6. DB ga yozish
     result = SpeakingResult(
@@ -208,8 +190,7 @@ async def submit_speaking_result(
         total_duration=total_duration
     )
     db.add(result)
-    db.commit()
-    db.refresh(result)
+    db.flush()
 
     create_attempt_row(
         db=db,
@@ -224,13 +205,20 @@ async def submit_speaking_result(
             attempt_meta={"result_id": result.id, "storage_type": "telegram_archive"},
             clear_progress=True,
         ),
+        commit=False,
     )
+    if archive_zip is not None:
+        # Natija bilan bitta tranzaksiyada; yuborish va qayta urinish job worker'da
+        enqueue_recordings_archive(db, archive_zip, caption, f"speaking-submission-archive:{result.id}")
+    db.commit()
 
+    metrics.observe("speaking.submit_ms", (perf_counter() - started) * 1000)
     return {
         "message": "Submitted successfully",
         "result_id": result.id,
         "is_premium": is_premium,
-        "storage_type": "supabase" if is_premium else "telegram_archive"
+        "storage_type": recordings_data.get("storage", "telegram_archive"),
+        "failed_uploads": failed_uploads,
     }
 
 from pydantic import BaseModel
@@ -251,10 +239,11 @@ class MobileSubmitRequest(BaseModel):
 async def submit_speaking_result_mobile(
     request: MobileSubmitRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Submit speaking exam result from mobile app with base64 encoded audio files"""
-    
+    started = perf_counter()
+
     mock_id = request.mock_id
     total_duration = request.total_duration
     audios = request.audios
@@ -274,92 +263,53 @@ async def submit_speaking_result_mobile(
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     folder_name = f"user{current_user.id}_mock{mock_id}_{timestamp}"
 
-    if supabase is None:
-        raise HTTPException(status_code=503, detail="Speaking storage is not configured")
-    
-    # 4. Supabase'ga upload qilish (base64 dan)
-    recordings_data = {}
-    try:
-        for audio_data in audios:
-            try:
-                # Base64 decode
-                audio_bytes = base64.b64decode(audio_data.base64_audio)
-                
-                safe_filename = f"{audio_data.question_id}.m4a"
-                file_path = f"{folder_name}/{safe_filename}"
-                
-                # Supabase'ga upload
-                supabase.storage.from_(BUCKET_NAME).upload(
-                    file_path,
-                    audio_bytes,
-                    {"content_type": "audio/mp4"}
-                )
-                
-                # Public URL olish
-                public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(file_path)
-                recordings_data[audio_data.question_id] = public_url
-                
-                print(f"âœ… Uploaded: {safe_filename}")
-            
-            except Exception as audio_err:
-                print(f"âŒ Error uploading {audio_data.question_id}: {audio_err}")
-                # Continue with other files
-                continue
-    
-    except Exception as e:
-        print(f"Supabase upload error: {e}")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
-
-    # 5. Agar non-premium bo'lsa, ZIP yaratib Telegramga yuborish
-    if not is_premium:
+    # 4. Base64 decode
+    uploads = []
+    failed_uploads = {}
+    for audio_data in audios:
         try:
-            # ZIP memory'da yaratish
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                total_files = len(recordings_data)
-                print(f"ğŸ“¦ ZIP creatingda {total_files} fayl bor")
-                
-                for idx, (key, url) in enumerate(recordings_data.items(), 1):
-                    try:
-                        print(f"â¬‡ï¸  Downloading file {idx}/{total_files}: {key}")
-                        # URL'dan audio download qilish
-                        response = requests.get(url, timeout=30)
-                        if response.status_code == 200:
-                            zf.writestr(f"{key}.m4a", response.content)
-                            print(f"âœ… Added to ZIP: {key}.m4a")
-                        else:
-                            print(f"âš ï¸  {key}: HTTP {response.status_code}")
-                    except requests.exceptions.Timeout:
-                        print(f"âŒ Timeout for {key}")
-                    except Exception as download_err:
-                        print(f"âŒ Error downloading {key}: {download_err}")
-            
-            zip_buffer.seek(0)
-            
-            caption = (
-                f"ğŸ“± Mobile {'Premium user' if is_premium else 'Non-premium'} Submission\n"
-                f"ğŸ‘¤ User ID: {current_user.id}\n"
-                f"ğŸ“ Mock ID: {mock_id}\n"
-                f"â° Time: {timestamp}"
-            )
-            send_audio_zip_to_telegram(zip_buffer, caption=caption)
-        
-        except Exception as e:
-            print(f"Telegram send error: {e}")
-        
-        # Non-premium'lar uchun Supabase'dagi audiolari o'chirish
-        try:
-            for key in recordings_data.keys():
-                file_path = f"{folder_name}/{key}.m4a"
-                supabase.storage.from_(BUCKET_NAME).remove([file_path])
-        except Exception as e:
-            print(f"Supabase delete error: {e}")
-        
-        recordings_data = {"status": "sent_to_telegram"}
+            audio_bytes = base64.b64decode(audio_data.base64_audio)
+        except Exception:
+            failed_uploads[audio_data.question_id] = "invalid base64"
+            continue
+        uploads.append(
+            AudioUpload.from_bytes(audio_data.question_id, f"{audio_data.question_id}.m4a", audio_bytes, "audio/mp4")
+        )
+    if audios and not uploads:
+        # Client xatosi: storage yoki Telegramga hech narsa yuborilmaydi
+        raise HTTPException(status_code=400, detail={"message": "Invalid audio data", "failed_uploads": failed_uploads})
+    record_ingest(uploads)
+
+    archive_zip = None
+    if is_premium:
+        # 5a. Premium - storage'ga parallel upload, URL'larni saqlash
+        storage = get_audio_storage()
+        outcomes = await upload_recordings(storage, folder_name, uploads)
+        audio_urls = {outcome.key: outcome.url for outcome in outcomes if outcome.ok}
+        failed_uploads.update({outcome.key: outcome.error for outcome in outcomes if not outcome.ok})
+        if audios and not audio_urls:
+            raise HTTPException(status_code=502, detail={"message": "Upload failed", "failed_uploads": failed_uploads})
+        recordings_data = {
+            "storage": storage.name,
+            "folder": folder_name,
+            "audios": audio_urls,
+            "paths": {outcome.key: outcome.path for outcome in outcomes if outcome.ok},
+        }
+        files_uploaded = len(audio_urls)
 
     else:
-        # Premium - Supabase URL'larni saqla
-        recordings_data = {"folder": folder_name, "audios": recordings_data}
+        # 5b. Non-premium - Supabase'siz, o'qilgan baytlardan ZIP yasab Telegramga yuborish
+        caption = (
+            f"ğŸ“± Mobile {'Premium user' if is_premium else 'Non-premium'} Submission\n"
+            f"ğŸ‘¤ User ID: {current_user.id}\n"
+            f"ğŸ“ Mock ID: {mock_id}\n"
+            f"â° Time: {timestamp}"
+        )
+        # Faqat ZIP shu yerda yasaladi; Telegramga yuborish background job
+        archive_zip = await asyncio.to_thread(recordings_zip_bytes, uploads) if uploads else None
+
+        recordings_data = {"status": "sent_to_telegram"}
+        files_uploaded = len(uploads)
 
     # 6. DB ga yozish
     result = SpeakingResult(
@@ -369,8 +319,7 @@ async def submit_speaking_result_mobile(
         total_duration=total_duration
     )
     db.add(result)
-    db.commit()
-    db.refresh(result)
+    db.flush()
 
     create_attempt_row(
         db=db,
@@ -385,41 +334,90 @@ async def submit_speaking_result_mobile(
             attempt_meta={"result_id": result.id, "storage_type": "telegram_archive"},
             clear_progress=True,
         ),
+        commit=False,
     )
+    if archive_zip is not None:
+        # Natija bilan bitta tranzaksiyada; yuborish va qayta urinish job worker'da
+        enqueue_recordings_archive(db, archive_zip, caption, f"speaking-submission-archive:{result.id}")
+    db.commit()
 
+    metrics.observe("speaking.submit_ms", (perf_counter() - started) * 1000)
     return {
         "message": "Submitted successfully from mobile",
         "result_id": result.id,
         "is_premium": is_premium,
-        "storage_type": "supabase" if is_premium else "telegram_archive",
-        "files_uploaded": len(recordings_data)
+        "storage_type": recordings_data.get("storage", "telegram_archive"),
+        "files_uploaded": files_uploaded,
+        "failed_uploads": failed_uploads,
     }
     
     
+# ===== RESULT LISTS (KEYSET PAGINATION) =====
+def _encode_cursor(result: SpeakingResult) -> str:
+    return base64.urlsafe_b64encode(f"{result.created_at.isoformat()}|{result.id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, result_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(result_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _result_page(query, limit: int, cursor: Optional[str]) -> dict:
+    """Newest first; `next_cursor` is None on the last page."""
+    if cursor:
+        query = query.filter(tuple_(SpeakingResult.created_at, SpeakingResult.id) < _decode_cursor(cursor))
+    rows = query.order_by(SpeakingResult.created_at.desc(), SpeakingResult.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    return {
+        "results": [
+            {
+                "id": r.id,
+                "user_id": r.user_id,
+                "mock_id": r.mock_id,
+                "recordings": r.recordings,
+                "evaluation": r.evaluation,
+                "total_duration": r.total_duration,
+                "created_at": r.created_at,
+            }
+            for r in page
+        ],
+        "next_cursor": _encode_cursor(page[-1]) if len(rows) > limit else None,
+    }
+
+
 # ===== GET ALL RESULTS (ADMIN ONLY) =====
 @router.get("/results")
 def get_all_results(
+    mock_id: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     user = Depends(verify_role(['admin']))
 ):
-    """Get all speaking results"""
-    results = db.query(SpeakingResult).all()
-    return results
+    """Get speaking results, newest first; pass `next_cursor` back as `cursor` for the next page"""
+    query = db.query(SpeakingResult)
+    if mock_id is not None:
+        query = query.filter(SpeakingResult.mock_id == mock_id)
+    return _result_page(query, limit, cursor)
 
 
 # ===== GET RESULTS BY USER =====
 @router.get("/results/user/{user_id}")
 def get_user_results(
     user_id: int,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get results by user ID (user can only see their own)"""
     if current_user.id != user_id and current_user.role != 'admin':
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized.")
-    
-    results = db.query(SpeakingResult).filter(SpeakingResult.user_id == user_id).all()
-    return results
+
+    return _result_page(db.query(SpeakingResult).filter(SpeakingResult.user_id == user_id), limit, cursor)
 
 
 # ===== GET RESULT BY ID =====
@@ -440,6 +438,42 @@ def get_result_by_id(
     
     return {"result": result}
 
+def _open_result(db: Session, user_id: int, mock_id: int) -> Optional[SpeakingResult]:
+    return db.query(SpeakingResult).filter(
+        SpeakingResult.user_id == user_id,
+        SpeakingResult.mock_id == mock_id,
+        SpeakingResult.evaluation == None
+    ).first()
+
+
+def answer_folder(db: Session, user_id: int, mock_id: int) -> str:
+    """Storage folder of the user's open result for the mock; a new attempt gets its own, so reviewing one never touches another."""
+    result = _open_result(db, user_id, mock_id)
+    folder = (result.recordings or {}).get("folder") if result else None
+    return folder or f"user{user_id}_mock{mock_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+
+
+def attach_answer_recording(
+    db: Session, user_id: int, mock_id: int, question_id: str, url: str, path: str, folder: str, storage_name: str
+) -> SpeakingResult:
+    """Add one uploaded answer to the user's open (unevaluated) result for the mock."""
+    result = _open_result(db, user_id, mock_id)
+
+    if not result:
+        result = SpeakingResult(user_id=user_id, mock_id=mock_id, recordings={}, total_duration=0)
+        db.add(result)
+
+    # JSON columns only notice reassignment, not in-place mutation.
+    recordings = dict(result.recordings or {})
+    recordings["storage"] = storage_name
+    recordings["folder"] = folder
+    recordings["audios"] = {**(recordings.get("audios") or {}), question_id: url}
+    recordings["paths"] = {**(recordings.get("paths") or {}), question_id: path}
+    result.recordings = recordings
+    db.commit()
+    return result
+
+
 @router.post("/upload-answer")
 async def upload_single_answer(
     data: MobileSingleAudio,
@@ -452,7 +486,7 @@ async def upload_single_answer(
         raise HTTPException(status_code=404, detail="Mock not found")
 
     # 2. Folder (bitta exam session uchun)
-    folder = f"user{current_user.id}_mock{data.mock_id}"
+    folder = answer_folder(db, current_user.id, data.mock_id)
 
     # 3. Base64 decode
     try:
@@ -460,36 +494,18 @@ async def upload_single_answer(
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid base64")
 
-    filename = f"{data.question_id}.m4a"
-    file_path = f"{folder}/{filename}"
-
-    # 4. Supabase upload
-    supabase.storage.from_(BUCKET_NAME).upload(
-        file_path,
-        audio_bytes,
-        {"content_type": "audio/mp4"}
-    )
-
-    public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(file_path)
+    # 4. Storage upload
+    storage = get_audio_storage()
+    upload = AudioUpload.from_bytes(data.question_id, f"{data.question_id}.m4a", audio_bytes, "audio/mp4")
+    (outcome,) = await upload_recordings(storage, folder, [upload])
+    if not outcome.ok:
+        raise HTTPException(status_code=502, detail=f"Upload failed: {outcome.error}")
+    public_url = outcome.url
 
     # 5. DB da vaqtincha saqlaymiz (MUHIM)
-    result = db.query(SpeakingResult).filter(
-        SpeakingResult.user_id == current_user.id,
-        SpeakingResult.mock_id == data.mock_id,
-        SpeakingResult.evaluation == None
-    ).first()
-
-    if not result:
-        result = SpeakingResult(
-            user_id=current_user.id,
-            mock_id=data.mock_id,
-            recordings={"audios": {}},
-            total_duration=0
-        )
-        db.add(result)
-
-    result.recordings["audios"][data.question_id] = public_url
-    db.commit()
+    attach_answer_recording(
+        db, current_user.id, data.mock_id, data.question_id, public_url, outcome.path, folder, storage.name
+    )
 
     return {
         "status": "ok",
@@ -497,6 +513,97 @@ async def upload_single_answer(
         "url": public_url
     }
 
+# ===== RESUMABLE BINARY UPLOAD (MOBILE) =====
+AUDIO_EXTENSIONS = {"audio/mp4": ".m4a", "audio/m4a": ".m4a", "audio/aac": ".aac", "audio/webm": ".webm", "audio/mpeg": ".mp3", "audio/wav": ".wav"}
+
+
+class AnswerUploadCreate(BaseModel):
+    mock_id: int
+    question_id: str = Field(min_length=1, max_length=50, pattern=r"^[A-Za-z0-9_.-]+$")
+    content_type: str = "audio/mp4"
+    total_size: Optional[int] = Field(default=None, ge=1)
+
+
+def _owned_upload_session(upload_id: str, current_user: Principal) -> UploadSession:
+    session = get_session(upload_id)
+    if session is None or session.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/uploads", status_code=201)
+def create_answer_upload(
+    data: AnswerUploadCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Open a resumable upload; send bytes with PUT /uploads/{id}?offset=N, then POST /uploads/{id}/finalize."""
+    if data.content_type not in AUDIO_EXTENSIONS:
+        raise HTTPException(status_code=415, detail="Unsupported audio content type")
+    if not db.query(SpeakingMock.id).filter(SpeakingMock.id == data.mock_id).first():
+        raise HTTPException(status_code=404, detail="Mock not found")
+    try:
+        session = create_session(current_user.id, data.mock_id, data.question_id, data.content_type, data.total_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return session.to_dict()
+
+
+@router.get("/uploads/{upload_id}")
+def get_answer_upload(upload_id: str, current_user: Principal = Depends(get_current_principal)):
+    """Current offset, for resuming after a dropped connection."""
+    return _owned_upload_session(upload_id, current_user).to_dict()
+
+
+@router.put("/uploads/{upload_id}")
+async def put_answer_upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Raw application/octet-stream body, appended at `offset`."""
+    session = _owned_upload_session(upload_id, current_user)
+    try:
+        new_offset = await append_chunk(session, offset, request.stream())
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail={"message": "Offset mismatch", "offset": e.expected})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"upload_id": upload_id, "offset": new_offset, "complete": session.complete}
+
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_answer_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    session = _owned_upload_session(upload_id, current_user)
+    if not session.complete or session.offset == 0:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Upload incomplete", "offset": session.offset, "total_size": session.total_size},
+        )
+
+    storage = get_audio_storage()
+
+    folder = answer_folder(db, current_user.id, session.mock_id)
+    filename = f"{session.question_id}{AUDIO_EXTENSIONS[session.content_type]}"
+    with open(session.data_path, "rb") as staged:
+        upload = AudioUpload(session.question_id, filename, staged, session.content_type, session.offset, in_memory=False)
+        (outcome,) = await upload_recordings(storage, folder, [upload])
+    if not outcome.ok:
+        # The staged file is kept, so finalize can simply be retried.
+        raise HTTPException(status_code=502, detail=f"Upload failed: {outcome.error}")
+
+    attach_answer_recording(
+        db, current_user.id, session.mock_id, session.question_id, outcome.url, outcome.path, folder, storage.name
+    )
+    delete_session(session)
+    return {"status": "ok", "question_id": session.question_id, "url": outcome.url}
+
+
 class FinishExamRequest(BaseModel):
     mock_id: int
     total_duration: int
@@ -537,59 +644,29 @@ def check_result(
 
     result_user = db.query(User).filter(User.id == result.user_id).first()
 
-    # ===== 1. ZIP qilib Telegramga yuborish =====
-    if result.recordings and "audios" in result.recordings:
-        try:
-            zip_buffer = io.BytesIO()
-
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-                total_files = len(result.recordings["audios"])
-                print(f"ğŸ“¦ ZIP creatingda {total_files} fayl bor")
-                
-                for idx, (key, url) in enumerate(result.recordings["audios"].items(), 1):
-                    try:
-                        print(f"â¬‡ï¸  Downloading file {idx}/{total_files}: {key}")
-                        r = requests.get(url, timeout=30)
-                        if r.status_code == 200:
-                            zf.writestr(f"{key}.webm", r.content)
-                            print(f"âœ… Added to ZIP: {key}.webm")
-                        else:
-                            print(f"âš ï¸  {key}: HTTP {r.status_code}")
-                    except requests.exceptions.Timeout:
-                        print(f"âŒ Timeout for {key} (URL: {url[:50]}...)")
-                    except Exception as download_err:
-                        print(f"âŒ Error downloading {key}: {download_err}")
-
-            zip_buffer.seek(0)
-
-            caption = (
-                f"âœ… Speaking Checked\n"
-                f"ğŸ‘¤ User ID: {result.user_id}\n"
-                f"ğŸ“ Mock ID: {result.mock_id}\n"
-                f"ğŸ† Band: {evaluation.get('band')}\n"
-                f"ğŸ“Š Total: {evaluation.get('scores', {}).get('total')}/40"
-            )
-
-            send_audio_zip_to_telegram(zip_buffer, caption)
-
-        except Exception as e:
-            print("Telegram ZIP error:", e)
-
-    # ===== 2. SUPABASE'DAN FOLDER + FILE'LARNI Oâ€˜CHIRISH =====
-    folder_name = result.recordings.get("folder") if result.recordings else None
-
-    if folder_name:
-        try:
-            files = supabase.storage.from_(BUCKET_NAME).list(folder_name)
-            paths = [f"{folder_name}/{f['name']}" for f in files]
-
-            if paths:
-                supabase.storage.from_(BUCKET_NAME).remove(paths)
-
-        except Exception as e:
-            print("Supabase delete error:", e)
-
-
+    # ===== 1-2. ZIP -> Telegram, keyin storage folderini o'chirish (background job) =====
+    recordings = result.recordings or {}
+    if recordings.get("audios") or recordings.get("folder"):
+        caption = (
+            f"âœ… Speaking Checked\n"
+            f"ğŸ‘¤ User ID: {result.user_id}\n"
+            f"ğŸ“ Mock ID: {result.mock_id}\n"
+            f"ğŸ† Band: {evaluation.get('band')}\n"
+            f"ğŸ“Š Total: {evaluation.get('scores', {}).get('total')}/40"
+        )
+        enqueue(
+            db,
+            SPEAKING_REVIEW_ARCHIVE,
+            {
+                "audios": recordings.get("audios") or {},
+                "folder": recordings.get("folder"),
+                "paths": recordings.get("paths") or {},
+                # Results from before the storage switch have no backend recorded.
+                "storage": recordings.get("storage", "supabase"),
+                "caption": caption,
+            },
+            idempotency_key=f"speaking-review-archive:{result.id}",
+        )
 
     # ===== 4. EVALUATION SAQLASH =====
     result.evaluation = {
@@ -642,14 +719,16 @@ def check_result(
         </html>
         """
 
-        try:
-            send_email(
-                result_user.email,
-                f"ğŸ¤ Speaking Mock #{result.mock_id} â€“ Evaluation Result",
-                email_html
-            )
-        except Exception as e:
-            print("Email send error:", e)
+        enqueue(
+            db,
+            RESULT_EMAIL,
+            {
+                "to": result_user.email,
+                "subject": f"ğŸ¤ Speaking Mock #{result.mock_id} â€“ Evaluation Result",
+                "html": email_html,
+            },
+            idempotency_key=f"speaking-result-email:{result.id}",
+        )
     # ===== 3. RECORDINGS NI DB'DAN TOZALASH =====
     db.delete(result)
 
@@ -672,20 +751,20 @@ def get_mock_statistics(
     user = Depends(verify_role(['admin']))
 ):
     """Get statistics for a specific mock"""
-    results = db.query(SpeakingResult).filter(SpeakingResult.mock_id == mock_id).all()
-    
-    if not results:
+    evaluated_filter = SpeakingResult.evaluation.isnot(None)
+    total_score = func.coalesce(SpeakingResult.evaluation[("scores", "total")].as_float(), 0)
+    total_submissions, evaluated, avg_score = db.query(
+        func.count(SpeakingResult.id),
+        func.count(SpeakingResult.id).filter(evaluated_filter),
+        func.avg(total_score).filter(evaluated_filter),
+    ).filter(SpeakingResult.mock_id == mock_id).one()
+
+    if not total_submissions:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No results found.")
-    
-    total_submissions = len(results)
-    evaluated = len([r for r in results if r.evaluation is not None])
+
     pending = total_submissions - evaluated
-    
-    avg_score = 0
-    if evaluated > 0:
-        scores = [r.evaluation.get("scores", {}).get("total", 0) for r in results if r.evaluation]
-        avg_score = sum(scores) / len(scores) if scores else 0
-    
+    avg_score = float(avg_score or 0)
+
     return {
         "mock_id": mock_id,
         "total_submissions": total_submissions,
@@ -1,9 +1,12 @@
+from datetime import datetime, timedelta
+
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from auth.auth import verify_role
 from database.db import User, get_db
-from services.request_monitor import get_traffic_snapshot
+from services.audit_log_writer import audit_log_writer
+from services.request_monitor import get_traffic_snapshot, rebuild_rollups
 
 router = APIRouter(prefix="/dashboard/admin/traffic", tags=["traffic-monitor"])
 
@@ -16,3 +19,18 @@ def get_admin_traffic_snapshot(
     current_user: User = Depends(verify_role(["admin"])),
 ):
     return get_traffic_snapshot(db=db, hours=hours, limit=limit)
+
+
+@router.get("/writer")
+def get_audit_writer_stats(current_user: User = Depends(verify_role(["admin"]))):
+    return audit_log_writer.stats()
+
+
+@router.post("/rollups/rebuild")
+def rebuild_traffic_rollups(
+    hours: int = Query(default=24, ge=1, le=24 * 90),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(verify_role(["admin"])),
+):
+    rows = rebuild_rollups(db, since=datetime.utcnow() - timedelta(hours=hours))
+    return {"rebuilt_hours": hours, "rows_scanned": rows}
@@ -1,26 +1,64 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from services.tts_service import TTS
-from io import BytesIO
-import zipfile
-from auth.auth import get_current_user
-from database.db import User
+from services.metrics import metrics
+from services.tts_engines import engine_stats, get_engine
+from services.tts_service import TTS_DEFAULT_LANG, synthesize_many
+from services.zip_stream import ZipStream
+from time import perf_counter
+from typing import Optional
+import os
 
 router = APIRouter(prefix="/tts", tags=["TTS"])
 
+TTS_MAX_KEYS = int(os.getenv("TTS_MAX_KEYS", "100"))
+TTS_MAX_TOTAL_CHARS = int(os.getenv("TTS_MAX_TOTAL_CHARS", "20000"))
+
+
+def _entry_name(key: str, extension: str) -> str:
+    # Keys become file names inside the archive; keep them flat.
+    return f"{key.replace('/', '_').replace(chr(92), '_')}{extension}"
+
+
+@router.get("/engines")
+def engines():
+    return engine_stats()
+
+
 @router.post("/audio")
-def audio(data: dict):
-    zip_buffer = BytesIO()
+async def audio(
+    data: dict,
+    engine: Optional[str] = Query(default=None, description="gtts or espeak; defaults to TTS_ENGINE"),
+    lang: str = Query(default=TTS_DEFAULT_LANG, max_length=10),
+):
+    try:
+        tts_engine = get_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    with zipfile.ZipFile(zip_buffer, "w") as zipf:
-        for key, text in data.items():
-            audio_fp = TTS(text)
-            zipf.writestr(f"{key}.mp3", audio_fp.getvalue())
+    texts = {str(key): str(text) for key, text in data.items()}
+    if len(texts) > TTS_MAX_KEYS:
+        raise HTTPException(status_code=413, detail=f"At most {TTS_MAX_KEYS} texts per request")
+    total_chars = sum(len(text) for text in texts.values())
+    if total_chars > TTS_MAX_TOTAL_CHARS:
+        raise HTTPException(status_code=413, detail=f"At most {TTS_MAX_TOTAL_CHARS} characters per request")
 
-    zip_buffer.seek(0)
+    async def archive():
+        # Each entry goes out as soon as it is synthesized (cache hits first);
+        # only the entry being written is held in memory.
+        started = perf_counter()
+        zip_stream = ZipStream()
+        async for key, audio_bytes in synthesize_many(tts_engine, texts, lang):
+            chunk = zip_stream.add(_entry_name(key, tts_engine.extension), audio_bytes)
+            if zip_stream.entries == 1:
+                metrics.observe(f"tts.{tts_engine.name}.first_entry_ms", (perf_counter() - started) * 1000)
+            yield chunk
+        yield zip_stream.close()
+        metrics.observe(f"tts.{tts_engine.name}.request_ms", (perf_counter() - started) * 1000)
 
+    # A synthesis failure after the first byte can only abort the response;
+    # the client then sees an archive without a central directory.
     return StreamingResponse(
-        zip_buffer,
+        archive(),
         media_type="application/zip",
         headers={"Content-Disposition": "attachment; filename=audios.zip"}
     )
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from database.db import get_db, User
 from sqlalchemy.orm import Session
-from auth.auth import verify_role, get_current_user, verify_password, hash_password
+from auth.auth import verify_role, get_current_user, verify_password, hash_password, invalidate_user_auth
 from schemas.userSchema import promoteData, udpateUser, passwordChange, premium
 from datetime import datetime, timedelta
 from sqlalchemy import or_
@@ -64,6 +64,7 @@ def promote_user(data:promoteData,db:Session = Depends(get_db), user = Depends(v
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
         found_user.role = "admin"
         db.commit()
+        invalidate_user_auth(found_user.id)
         db.refresh(found_user)
         return {"message":"User promoted."}
     except HTTPException:
@@ -80,6 +81,7 @@ def demote_user(data:promoteData, db: Session = Depends(get_db), user = Depends(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
         found_user.role = "user"
         db.commit()
+        invalidate_user_auth(found_user.id)
         db.refresh(found_user)
         return {"message":"User demoted."}
     except HTTPException:
@@ -97,6 +99,7 @@ def update_user(data: udpateUser, current_user: User = Depends(get_current_user)
         user.username = data.username
         user.email = data.email
         db.commit()
+        invalidate_user_auth(user.id)
         db.refresh(user)
         return {"message": "User updated."}
     except HTTPException:
@@ -115,6 +118,7 @@ def change_password(data: passwordChange, db: Session = Depends(get_db), current
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Old password is incorrect.")
         user.password = hash_password(data.new_password)
         db.commit()
+        invalidate_user_auth(user.id)
         db.refresh(user)
         return {"message": "Password updated successfully."}
     except HTTPException:
@@ -136,6 +140,7 @@ def func(data:premium, user = Depends(verify_role(['admin'])), db: Session = Dep
             user_found.premium_duration = now + timedelta(days=30)
         
         db.commit()
+        invalidate_user_auth(user_found.id)
         db.refresh(user_found)
 
         return {
@@ -156,6 +161,7 @@ def remove_premium(data: premium, user = Depends(verify_role(['admin'])), db: Se
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
         user_found.premium_duration = None
         db.commit()
+        invalidate_user_auth(user_found.id)
         db.refresh(user_found)
         return {
             "message": "Premium removed successfully.",
@@ -182,6 +188,7 @@ def grant_ramadan_premium_for_all(user = Depends(verify_role(['admin'])), db: Se
             .update({User.premium_duration: RAMADAN_PREMIUM_UNTIL}, synchronize_session=False)
         )
         db.commit()
+        invalidate_user_auth()
         return {
             "message": "Ramadan premium granted.",
             "premium_until": RAMADAN_PREMIUM_UNTIL,
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -13,7 +13,9 @@ class IeltsSectionInput(BaseModel):
     instructions: Optional[str] = ""
     duration_minutes: int = Field(default=30, ge=1, le=180)
     content: Dict[str, Any] = Field(default_factory=dict)
-    answer_key: List[str] = Field(default_factory=list)
+    # Strings ("a | b" for alternatives), lists of alternatives or
+    # {"accept": [...], "points": n, "match": "set"}; see services/scoring.py.
+    answer_key: List[Union[str, List[str], Dict[str, Any]]] = Field(default_factory=list)
     order_index: int = Field(default=1, ge=1, le=50)
 
 
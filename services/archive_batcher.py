@@ -0,0 +1,332 @@
+"""
+Batched, compressed delivery of the Telegram submission archive.
+
+Submit routes hand their rendered document to `archive_document()`. By
+default (ARCHIVE_BATCH_WINDOW_SECONDS=0) every document is its own durable
+job in the `background_jobs` table. With a window set, the document is
+instead written to a spool directory on local disk, one subdirectory per
+channel, and the request moves on. A flusher thread ships each channel's spool once per
+window as a single deflate-compressed ZIP with an index.html, and removes the
+spooled files only after Telegram accepted the bundle. Documents left behind
+by a failed upload or a restart go out with the next flush.
+
+The spool is only as durable as the disk under it: enable batching only where
+that directory survives restarts and redeploys (not on ephemeral pods), and
+keep it outside anything served publicly.
+
+    python -m services.archive_batcher flush    # ship everything spooled now
+    python -m services.archive_batcher stats
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from services.archive_jobs import TELEGRAM_DOCUMENT
+from services.archive_render import BundleEntry, render_bundle_index
+from services.job_queue import enqueue
+from services.metrics import metrics
+from services.telegram_bot import send_document_to_telegram
+
+ARCHIVE_BATCH_WINDOW_SECONDS = float(os.getenv("ARCHIVE_BATCH_WINDOW_SECONDS", "0"))
+# Spooled documents hold usernames, emails and answers; never put this under a static mount.
+ARCHIVE_SPOOL_DIR = Path(
+    os.getenv("ARCHIVE_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "mockstream-archive-spool"))
+)
+ARCHIVE_BATCH_MAX_FILES = int(os.getenv("ARCHIVE_BATCH_MAX_FILES", "500"))
+# Uncompressed; keeps a bundle well under Telegram's 50 MB bot upload limit.
+ARCHIVE_BATCH_MAX_BYTES = int(os.getenv("ARCHIVE_BATCH_MAX_BYTES", str(40 * 1024 * 1024)))
+ARCHIVE_BUNDLE_MEMORY_BYTES = int(os.getenv("ARCHIVE_BUNDLE_MEMORY_BYTES", str(4 * 1024 * 1024)))
+DEFAULT_CHANNEL = "default"
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", value).strip(".") or "_"
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@dataclass
+class SpooledDocument:
+    doc_path: Path
+    meta_path: Path
+    filename: str
+    caption: str
+    chat_id: str | None
+    spooled_at: float
+    size: int
+
+
+def spool_document(
+    chat_id: str | None,
+    entry_id: str,
+    filename: str,
+    content: bytes,
+    caption: str,
+    mime_type: str = "text/html",
+) -> Path:
+    """`entry_id` names the spool entry; spooling the same id again replaces it."""
+    directory = ARCHIVE_SPOOL_DIR / _safe_name(chat_id or DEFAULT_CHANNEL)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = _safe_name(entry_id)
+    _atomic_write(directory / f"{stem}.doc", content)
+    # The metadata goes last: a document without it is not picked up yet.
+    meta = {
+        "filename": filename,
+        "caption": caption,
+        "chat_id": chat_id,
+        "mime_type": mime_type,
+        "spooled_at": time.time(),
+    }
+    _atomic_write(directory / f"{stem}.json", json.dumps(meta).encode("utf-8"))
+    metrics.incr("archive.spooled")
+    return directory
+
+
+def archive_document(
+    db: Session,
+    *,
+    chat_id: str | None,
+    filename: str,
+    content: bytes,
+    caption: str,
+    idempotency_key: str,
+    mime_type: str = "text/html",
+) -> None:
+    """Archive one submission document; sent in the next batch, or queued on its own when batching is off."""
+    if ARCHIVE_BATCH_WINDOW_SECONDS <= 0:
+        enqueue(
+            db,
+            TELEGRAM_DOCUMENT,
+            {
+                "content": content.decode("utf-8"),
+                "filename": filename,
+                "caption": caption,
+                "mime_type": mime_type,
+                "chat_id": chat_id,
+            },
+            idempotency_key=idempotency_key,
+        )
+        return
+    spool_document(chat_id, idempotency_key, filename, content, caption, mime_type)
+
+
+def pending_documents(directory: Path) -> list[SpooledDocument]:
+    documents = []
+    for meta_path in directory.glob("*.json"):
+        doc_path = meta_path.with_suffix(".doc")
+        try:
+            meta = json.loads(meta_path.read_text())
+            size = doc_path.stat().st_size
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Archive spool: skipping {meta_path.name}: {e}")
+            continue
+        documents.append(
+            SpooledDocument(
+                doc_path=doc_path,
+                meta_path=meta_path,
+                filename=meta.get("filename") or doc_path.name,
+                caption=meta.get("caption", ""),
+                chat_id=meta.get("chat_id"),
+                spooled_at=float(meta.get("spooled_at") or 0),
+                size=size,
+            )
+        )
+    documents.sort(key=lambda document: document.spooled_at)
+    return documents
+
+
+def _next_batch(documents: list[SpooledDocument]) -> list[SpooledDocument]:
+    batch, size = [], 0
+    for document in documents:
+        if batch and (len(batch) >= ARCHIVE_BATCH_MAX_FILES or size + document.size > ARCHIVE_BATCH_MAX_BYTES):
+            break
+        batch.append(document)
+        size += document.size
+    return batch
+
+
+def _label(timestamp: float) -> str:
+    return datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def send_bundle(channel: str, batch: list[SpooledDocument]) -> bool:
+    first, last = _label(batch[0].spooled_at), _label(batch[-1].spooled_at)
+    names: dict[str, int] = {}
+    entries = []
+    for document in batch:
+        # Two documents may share a display name; keep both.
+        count = names.get(document.filename, 0)
+        names[document.filename] = count + 1
+        root, ext = os.path.splitext(document.filename)
+        entries.append(BundleEntry(document.filename if not count else f"{root}_{count}{ext}", document.caption, _label(document.spooled_at)))
+
+    raw_bytes = sum(document.size for document in batch)
+    with tempfile.SpooledTemporaryFile(max_size=ARCHIVE_BUNDLE_MEMORY_BYTES) as bundle:
+        with zipfile.ZipFile(bundle, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(
+                "index.html",
+                render_bundle_index(
+                    f"Submission Archive: {channel}",
+                    [("Documents", len(batch)), ("First", first), ("Last", last)],
+                    entries,
+                ),
+            )
+            for document, entry in zip(batch, entries):
+                zf.write(document.doc_path, entry.filename)
+        compressed_bytes = bundle.tell()
+        bundle.seek(0)
+        sent = send_document_to_telegram(
+            file_buffer=bundle,
+            filename=f"archive_{channel}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip",
+            caption=f"🗂 {len(batch)} submissions\n⏰ {first} – {last}",
+            mime_type="application/zip",
+            chat_id=batch[0].chat_id,
+        )
+    if sent:
+        metrics.incr("archive.bundles")
+        metrics.incr("archive.documents", len(batch))
+        metrics.observe("archive.bundle_raw_bytes", raw_bytes)
+        metrics.observe("archive.bundle_compressed_bytes", compressed_bytes)
+    return sent
+
+
+def flush_channel(directory: Path) -> int:
+    """Send everything spooled for one channel; returns the number of documents sent."""
+    with open(directory / ".lock", "a") as lock:
+        try:
+            # Every worker process on the host runs a flusher; one of them does the work.
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+        try:
+            documents = pending_documents(directory)
+            sent = 0
+            while documents:
+                batch = _next_batch(documents)
+                if not send_bundle(directory.name, batch):
+                    metrics.incr("archive.bundle_failures")
+                    break  # stays spooled for the next window
+                for document in batch:
+                    for path in (document.meta_path, document.doc_path):
+                        try:
+                            path.unlink()
+                        except FileNotFoundError:
+                            pass
+                sent += len(batch)
+                documents = documents[len(batch):]
+            return sent
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def spool_stats() -> dict[str, Any]:
+    """Per-channel spool counts; keyed by channel id, so admin-only."""
+    channels = {}
+    if ARCHIVE_SPOOL_DIR.is_dir():
+        for directory in sorted(path for path in ARCHIVE_SPOOL_DIR.iterdir() if path.is_dir()):
+            documents = pending_documents(directory)
+            channels[directory.name] = {
+                "documents": len(documents),
+                "bytes": sum(document.size for document in documents),
+                "oldest_spooled_at": documents[0].spooled_at if documents else None,
+            }
+    return channels
+
+
+class ArchiveBatcher:
+    """Flushes every channel in the spool once per window on a background thread."""
+
+    def __init__(self, *, window: float = ARCHIVE_BATCH_WINDOW_SECONDS):
+        self.window = max(1.0, window)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.documents_sent = 0
+        self.last_flush_at: float | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="archive-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        # No final flush: whatever is spooled survives the restart.
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def flush(self) -> int:
+        sent = 0
+        if ARCHIVE_SPOOL_DIR.is_dir():
+            for directory in ARCHIVE_SPOOL_DIR.iterdir():
+                if not directory.is_dir():
+                    continue
+                try:
+                    sent += flush_channel(directory)
+                except Exception as e:
+                    print(f"Archive batcher error ({directory.name}): {e}")
+        self.documents_sent += sent
+        self.last_flush_at = time.time()
+        return sent
+
+    def run_forever(self) -> None:
+        while not self._stop.wait(self.window):
+            self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        # Totals only: channel ids stay off the public health route (see spool_stats()).
+        channels = spool_stats().values()
+        oldest = [channel["oldest_spooled_at"] for channel in channels if channel["oldest_spooled_at"]]
+        return {
+            "enabled": ARCHIVE_BATCH_WINDOW_SECONDS > 0,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "window_seconds": self.window,
+            "documents_sent": self.documents_sent,
+            "last_flush_at": self.last_flush_at,
+            "spooled_documents": sum(channel["documents"] for channel in channels),
+            "spooled_bytes": sum(channel["bytes"] for channel in channels),
+            "oldest_spooled_at": min(oldest) if oldest else None,
+        }
+
+
+archive_batcher = ArchiveBatcher()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "flush":
+        print(f"Sent {archive_batcher.flush()} documents")
+    elif command == "stats":
+        print(json.dumps(spool_stats(), indent=2))
+    else:
+        print("usage: python -m services.archive_batcher [flush|stats]")
+        sys.exit(2)
@@ -0,0 +1,127 @@
+"""Job handlers for the Telegram archives and result emails sent after submissions."""
+
+from __future__ import annotations
+
+import base64
+import io
+import posixpath
+import tempfile
+import zipfile
+from typing import Any
+
+import httpx
+from sqlalchemy.orm import Session
+
+from services.email_service import send_email
+from services.job_queue import enqueue, job_handler
+from services.audio_storage import get_audio_storage
+from services.speaking_storage import ARCHIVE_SPOOL_MAX_BYTES, SPEAKING_STREAM_CHUNK_BYTES
+from services.telegram_bot import send_audio_zip_to_telegram, send_document_to_telegram
+
+TELEGRAM_DOCUMENT = "telegram_document"
+RESULT_EMAIL = "result_email"
+SPEAKING_REVIEW_ARCHIVE = "speaking_review_archive"
+
+
+@job_handler(TELEGRAM_DOCUMENT)
+def send_telegram_document(payload: dict[str, Any]) -> None:
+    # Binary documents (speaking ZIPs) travel base64-encoded in the JSON payload.
+    if "content_b64" in payload:
+        content = base64.b64decode(payload["content_b64"])
+    else:
+        content = payload["content"].encode("utf-8")
+    sent = send_document_to_telegram(
+        file_buffer=io.BytesIO(content),
+        filename=payload["filename"],
+        caption=payload.get("caption", ""),
+        mime_type=payload.get("mime_type", "text/html"),
+        chat_id=payload.get("chat_id"),
+    )
+    if not sent:
+        raise RuntimeError("Telegram sendDocument failed")
+
+
+def enqueue_recordings_archive(db: Session, archive: bytes, caption: str, idempotency_key: str) -> int | None:
+    """Queue a non-premium speaking ZIP in the caller's transaction."""
+    return enqueue(
+        db,
+        TELEGRAM_DOCUMENT,
+        {
+            "content_b64": base64.b64encode(archive).decode("ascii"),
+            "filename": "speaking_audios.zip",
+            "caption": caption,
+            "mime_type": "application/zip",
+        },
+        idempotency_key=idempotency_key,
+    )
+
+
+@job_handler(RESULT_EMAIL)
+def send_result_email(payload: dict[str, Any]) -> None:
+    ok, detail = send_email(payload["to"], payload["subject"], payload["html"])
+    if not ok:
+        raise RuntimeError(f"Email send failed: {detail}")
+
+
+def _stream_url(url: str):
+    with httpx.stream("GET", url, timeout=30) as response:
+        if response.status_code == 404:
+            raise FileNotFoundError(url)
+        response.raise_for_status()
+        yield from response.iter_bytes(SPEAKING_STREAM_CHUNK_BYTES)
+
+
+@job_handler(SPEAKING_REVIEW_ARCHIVE)
+def archive_reviewed_speaking(payload: dict[str, Any]) -> None:
+    """
+    Read the premium recordings of a reviewed result from storage, post them
+    to the archive channel as one ZIP, then delete them. Only the result's own
+    recordings are touched, never the rest of its folder, and they are only
+    removed after Telegram accepted the archive, so a dead job still leaves
+    the audio in storage.
+    """
+    storage = get_audio_storage(payload.get("storage"))
+    folder_name = payload.get("folder")
+    audios = payload.get("audios") or {}
+    if payload.get("paths"):
+        paths = list(payload["paths"].values())
+    elif folder_name:
+        # Results from before paths were recorded; mobile answers used to share
+        # one folder per user and mock, so keep to the files this result owns.
+        paths = [
+            path
+            for path in storage.list(folder_name)
+            if posixpath.basename(path) in audios or posixpath.splitext(posixpath.basename(path))[0] in audios
+        ]
+    else:
+        paths = []
+    if paths:
+        sources = [(posixpath.basename(path), storage.stream(path)) for path in paths]
+    else:
+        # Older results only kept the public URLs.
+        sources = [(f"{key}.webm", _stream_url(url)) for key, url in audios.items()]
+
+    if sources:
+        with tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_MAX_BYTES) as archive:
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+                for name, chunks in sources:
+                    # The streams are lazy; pull the first chunk before adding an entry.
+                    try:
+                        first = next(chunks, b"")
+                    except FileNotFoundError:
+                        print(f"Speaking archive: {name} is gone from storage, skipping")
+                        continue
+                    with zf.open(name, "w") as entry:
+                        entry.write(first)
+                        for chunk in chunks:
+                            entry.write(chunk)
+            archive.seek(0)
+            if not send_audio_zip_to_telegram(archive, payload.get("caption", "")):
+                raise RuntimeError("Telegram sendDocument failed")
+
+    if paths:
+        try:
+            storage.delete(paths)
+        except Exception as e:
+            # The archive already went out; a stale folder is not worth a resend.
+            print(f"Storage delete error: {e}")
@@ -0,0 +1,295 @@
+"""
+HTML documents for the Telegram submission archive.
+
+Templates are compiled once at import: the literal text (including the shared
+stylesheet) is pre-encoded to UTF-8 and only `$field` values are escaped per
+render. A document is written piece by piece into one bytearray, so a
+submission costs one buffer plus the escaped field values instead of a chain
+of intermediate f-strings.
+
+    python -m benchmarks.archive_render_bench    # render time and allocations
+"""
+
+from __future__ import annotations
+
+from html import escape
+from string import Template
+from typing import Any, Iterable, Mapping, NamedTuple, Sequence
+
+
+class HtmlTemplate:
+    """`$name` / `${name}` fields are HTML-escaped; `$$` is a literal dollar sign."""
+
+    def __init__(self, source: str):
+        pieces: list[bytes | str] = []
+        literal = ""
+        pos = 0
+        for match in Template.pattern.finditer(source):
+            literal += source[pos:match.start()]
+            pos = match.end()
+            if match.group("escaped") is not None:
+                literal += "$"
+                continue
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                raise ValueError(f"Invalid placeholder at offset {match.start()}")
+            if literal:
+                pieces.append(literal.encode("utf-8"))
+                literal = ""
+            pieces.append(name)
+        literal += source[pos:]
+        if literal:
+            pieces.append(literal.encode("utf-8"))
+        self._pieces = tuple(pieces)
+
+    @classmethod
+    def _from_pieces(cls, pieces: Sequence[bytes | str]) -> HtmlTemplate:
+        template = cls.__new__(cls)
+        merged: list[bytes | str] = []
+        for piece in pieces:
+            if isinstance(piece, bytes) and merged and isinstance(merged[-1], bytes):
+                merged[-1] += piece
+            else:
+                merged.append(piece)
+        template._pieces = tuple(merged)
+        return template
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        return tuple(piece for piece in self._pieces if isinstance(piece, str))
+
+    def bind(self, **fixed: Any) -> HtmlTemplate:
+        """A copy with some fields rendered ahead of time, e.g. one card variant per status."""
+        return self._from_pieces(
+            [_escaped(fixed[piece]) if isinstance(piece, str) and piece in fixed else piece for piece in self._pieces]
+        )
+
+    def render_into(self, out: bytearray, fields: Mapping[str, Any]) -> None:
+        for piece in self._pieces:
+            if piece.__class__ is bytes:
+                out += piece
+            else:
+                out += _escaped(fields[piece])
+
+
+def _escaped(value: Any) -> bytes:
+    if value is None:
+        return b""
+    return escape(value if isinstance(value, str) else str(value)).encode("utf-8")
+
+
+# One stylesheet for every archive document; writing only adds its task blocks and theme.
+SHARED_STYLE = """
+    :root {
+      --bg: #f4f7fb; --card:#fff; --ink:#102238; --muted:#5c6b80; --line:#d7e0ec;
+      --primary:#0f766e; --primary2:#0891b2; --ok:#1f9d55; --bad:#cc3344;
+    }
+    * { box-sizing:border-box; }
+    body { margin:0; padding:28px; background:linear-gradient(180deg,#edf7f9,var(--bg)); color:var(--ink); font-family:Segoe UI,Arial,sans-serif; }
+    .wrap { max-width:1100px; margin:0 auto; background:var(--card); border:1px solid var(--line); border-radius:18px; overflow:hidden; box-shadow:0 14px 34px rgba(16,34,56,.12); }
+    .hero { padding:24px 28px; background:linear-gradient(120deg,var(--primary),var(--primary2)); color:#fff; }
+    .hero h1 { margin:0 0 8px; font-size:30px; }
+    .meta { display:grid; grid-template-columns:repeat(3,minmax(180px,1fr)); gap:8px 16px; font-size:14px; }
+    .summary { padding:16px 28px; border-bottom:1px solid var(--line); display:flex; gap:16px; flex-wrap:wrap; }
+    .chip { background:#eef6ff; border:1px solid #cfe0ff; color:#123a78; border-radius:999px; padding:6px 12px; font-size:13px; font-weight:700; }
+    .body { padding:20px 28px 28px; }
+    .qa-grid { display:grid; grid-template-columns:1fr; gap:12px; }
+    .qa-card { border:1px solid var(--line); border-radius:12px; overflow:hidden; background:#fff; }
+    .qa-card.ok { border-left:6px solid var(--ok); }
+    .qa-card.bad { border-left:6px solid var(--bad); }
+    .qa-head { display:flex; gap:8px; align-items:center; padding:10px 12px; background:#f8fbff; border-bottom:1px solid var(--line); }
+    .qno { font-weight:800; color:#0a4f8a; }
+    .sec { font-size:12px; font-weight:700; color:#19436b; background:#e8f1ff; border-radius:999px; padding:4px 8px; }
+    .st { margin-left:auto; font-size:12px; font-weight:700; color:#4a5b70; }
+    .qa-body { padding:12px; }
+    .label { font-size:11px; text-transform:uppercase; color:#375273; font-weight:700; letter-spacing:.04em; margin-bottom:6px; }
+    .prompt { margin:0 0 10px; white-space:pre-wrap; color:#1f3653; }
+    .row { font-size:14px; margin:3px 0; }
+    @media (max-width:820px) { body { padding:14px; } .meta { grid-template-columns:1fr 1fr; } }"""
+
+WRITING_STYLE = """
+    :root { --primary:#0d6efd; --primary2:#4f46e5; }
+    body { background:linear-gradient(180deg,#eef3fa 0%,var(--bg) 100%); line-height:1.45; }
+    .wrap { max-width:980px; }
+    .meta { margin-top:8px; }
+    .meta b { opacity:.85; font-weight:600; }
+    .body { padding:24px 28px 28px; }
+    .task { border:1px solid var(--line); border-radius:14px; padding:16px; margin-bottom:16px; background:#fff; }
+    .task h2 { margin:0 0 10px; font-size:22px; }
+    .task .label { font-size:12px; color:#0b4db6; background:#e8f0ff; display:inline-block; padding:5px 9px; border-radius:999px; margin-bottom:10px; }
+    .task .prompt { padding:11px 12px; border-radius:10px; border:1px solid #dbe7ff; background:#f4f8ff; color:#1e3554; }
+    .answer { margin:0; padding:12px; border-radius:10px; background:#f7fafc; border:1px solid var(--line); white-space:pre-wrap; word-break:break-word; font-size:14px; }
+    .footer { margin-top:8px; font-size:12px; color:var(--muted); text-align:right; }"""
+
+
+def _style(css: str) -> str:
+    # The stylesheet becomes template literal text, so a stray "$" must not read as a field.
+    return css.replace("$", "$$")
+
+
+_HEAD = """<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8" />
+  <title>$title</title>
+  <style>{style}
+  </style>
+</head>
+<body>
+  <div class="wrap">
+    <div class="hero">
+      <h1>$heading</h1>
+      <div class="meta">"""
+
+QA_HEAD = HtmlTemplate(_HEAD.format(style=_style(SHARED_STYLE)))
+WRITING_HEAD = HtmlTemplate(_HEAD.format(style=_style(SHARED_STYLE + WRITING_STYLE)))
+META_ROW = HtmlTemplate("""
+        <div><b>$label:</b> $value</div>""")
+QA_SUMMARY_OPEN = HtmlTemplate("""
+      </div>
+    </div>
+    <div class="summary">""")
+CHIP = HtmlTemplate("""
+      <span class="chip">$text</span>""")
+QA_BODY_OPEN = HtmlTemplate("""
+    </div>
+    <div class="body">
+      <div class="qa-grid">""")
+QA_CARD = HtmlTemplate("""
+<div class="qa-card $status_class">
+  <div class="qa-head">
+    <span class="qno">Q$number</span>
+    <span class="sec">$section</span>
+    <span class="st">$status_text</span>
+  </div>
+  <div class="qa-body">
+    <div class="label">Question</div>
+    <p class="prompt">$prompt</p>
+    <div class="row"><b>User:</b> $user_answer</div>
+    <div class="row"><b>Correct:</b> $correct_answer</div>
+  </div>
+</div>""")
+QA_CARD_OK = QA_CARD.bind(status_class="ok", status_text="Correct")
+QA_CARD_BAD = QA_CARD.bind(status_class="bad", status_text="Incorrect")
+QA_TAIL = HtmlTemplate("""
+      </div>
+    </div>
+  </div>
+</body>
+</html>""")
+WRITING_BODY_OPEN = HtmlTemplate("""
+      </div>
+    </div>
+    <div class="body">""")
+WRITING_TASK = HtmlTemplate("""
+      <section class="task">
+        <h2>$heading</h2>
+        <div class="label">Question Prompt</div>
+        <p class="prompt">$prompt</p>
+        <div class="label">User Answer</div>
+        <pre class="answer">$answer</pre>
+      </section>""")
+WRITING_TAIL = HtmlTemplate("""
+      <div class="footer">Generated by Mockstream Telegram Archive</div>
+    </div>
+  </div>
+</body>
+</html>""")
+
+BUNDLE_ENTRY = HtmlTemplate("""
+<div class="qa-card">
+  <div class="qa-head">
+    <span class="qno">$number</span>
+    <a class="sec" href="$filename">$filename</a>
+    <span class="st">$spooled_at</span>
+  </div>
+  <div class="qa-body"><p class="prompt">$caption</p></div>
+</div>""")
+
+_NO_FIELDS: Mapping[str, Any] = {}
+
+
+class QaCard(NamedTuple):
+    number: int
+    section: str
+    prompt: Any
+    user_answer: Any
+    correct_answer: Any
+    is_correct: bool
+
+
+class WritingTask(NamedTuple):
+    heading: str
+    prompt: str
+    answer: str
+
+
+class BundleEntry(NamedTuple):
+    filename: str
+    caption: str
+    spooled_at: str
+
+
+def _render_meta(out: bytearray, meta: Iterable[tuple[str, Any]]) -> None:
+    for label, value in meta:
+        META_ROW.render_into(out, {"label": label, "value": value})
+
+
+def render_qa_archive(
+    title: str,
+    heading: str,
+    meta: Iterable[tuple[str, Any]],
+    chips: Iterable[str],
+    cards: Iterable[QaCard],
+) -> bytes:
+    """Reading/listening archive: meta rows, score chips and one card per question."""
+    out = bytearray()
+    QA_HEAD.render_into(out, {"title": title, "heading": heading})
+    _render_meta(out, meta)
+    QA_SUMMARY_OPEN.render_into(out, _NO_FIELDS)
+    for text in chips:
+        CHIP.render_into(out, {"text": text})
+    QA_BODY_OPEN.render_into(out, _NO_FIELDS)
+    for card in cards:
+        (QA_CARD_OK if card.is_correct else QA_CARD_BAD).render_into(
+            out,
+            {
+                "number": card.number,
+                "section": card.section,
+                "prompt": card.prompt or "-",
+                "user_answer": card.user_answer,
+                "correct_answer": card.correct_answer,
+            },
+        )
+    QA_TAIL.render_into(out, _NO_FIELDS)
+    return bytes(out)
+
+
+def render_writing_archive(meta: Iterable[tuple[str, Any]], tasks: Iterable[WritingTask]) -> bytes:
+    out = bytearray()
+    WRITING_HEAD.render_into(out, {"title": "CEFR Writing Submission", "heading": "CEFR Writing Archive"})
+    _render_meta(out, meta)
+    WRITING_BODY_OPEN.render_into(out, _NO_FIELDS)
+    for task in tasks:
+        WRITING_TASK.render_into(
+            out, {"heading": task.heading, "prompt": task.prompt or "Task prompt not found", "answer": task.answer}
+        )
+    WRITING_TAIL.render_into(out, _NO_FIELDS)
+    return bytes(out)
+
+
+def render_bundle_index(heading: str, meta: Iterable[tuple[str, Any]], entries: Iterable[BundleEntry]) -> bytes:
+    """index.html of a batched archive bundle: one card per document, linking to it inside the ZIP."""
+    entries = list(entries)
+    out = bytearray()
+    QA_HEAD.render_into(out, {"title": heading, "heading": heading})
+    _render_meta(out, meta)
+    QA_SUMMARY_OPEN.render_into(out, _NO_FIELDS)
+    CHIP.render_into(out, {"text": f"{len(entries)} documents"})
+    QA_BODY_OPEN.render_into(out, _NO_FIELDS)
+    for number, entry in enumerate(entries, 1):
+        BUNDLE_ENTRY.render_into(
+            out, {"number": number, "filename": entry.filename, "spooled_at": entry.spooled_at, "caption": entry.caption}
+        )
+    QA_TAIL.render_into(out, _NO_FIELDS)
+    return bytes(out)
@@ -0,0 +1,254 @@
+"""
+Object storage for speaking recordings.
+
+Two backends share one interface:
+
+- `SupabaseAudioStorage`: the `speaking-audios` bucket, streamed over the
+  storage REST API.
+- `LocalAudioStorage`: files under `uploads/`, served by the app's `/uploads`
+  static mount. Needs no credentials, so speaking submissions can be
+  exercised and load-tested offline.
+
+AUDIO_STORAGE_BACKEND picks one ("supabase" or "local", default "supabase").
+There is no fallback: `check_audio_storage()` runs at startup and refuses
+to start with Supabase selected but not configured, so recordings never
+land on local disk by accident.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import quote
+
+import httpx
+from supabase import Client, create_client
+
+from services.startup_report import startup_report
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+BUCKET_NAME = "speaking-audios"
+
+AUDIO_STORAGE_BACKENDS = ("supabase", "local")
+# SPEAKING_STORAGE_BACKEND is the older name, still read when the new one is unset.
+AUDIO_STORAGE_BACKEND = (
+    os.getenv("AUDIO_STORAGE_BACKEND") or os.getenv("SPEAKING_STORAGE_BACKEND") or "supabase"
+).strip().lower()
+SPEAKING_LOCAL_STORAGE_DIR = Path(os.getenv("SPEAKING_LOCAL_STORAGE_DIR", f"uploads/{BUCKET_NAME}"))
+# Where the static mount serves SPEAKING_LOCAL_STORAGE_DIR; may be absolute.
+SPEAKING_LOCAL_STORAGE_URL = os.getenv("SPEAKING_LOCAL_STORAGE_URL", f"/uploads/{BUCKET_NAME}").rstrip("/")
+STORAGE_TIMEOUT = float(os.getenv("SPEAKING_UPLOAD_TIMEOUT", "20"))
+STREAM_CHUNK_BYTES = int(os.getenv("SPEAKING_STREAM_CHUNK_BYTES", str(256 * 1024)))
+
+
+class AudioStorage(ABC):
+    """Paths are bucket-relative, e.g. "user7_mock3/q1.webm"."""
+
+    name = "base"
+
+    @abstractmethod
+    def put(self, path: str, chunks: Iterable[bytes], size: int, content_type: str) -> str:
+        """Store (or overwrite) an object from a chunk iterator and return its public URL."""
+
+    @abstractmethod
+    def stream(self, path: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        """Yield the object's bytes; raises FileNotFoundError if it does not exist."""
+
+    def get(self, path: str) -> bytes:
+        return b"".join(self.stream(path))
+
+    @abstractmethod
+    def list(self, folder: str) -> list[str]:
+        """Paths of the objects directly inside `folder`."""
+
+    @abstractmethod
+    def delete(self, paths: list[str]) -> None:
+        ...
+
+    @abstractmethod
+    def public_url(self, path: str) -> str:
+        ...
+
+    @abstractmethod
+    def presigned_url(self, path: str, expires_in: int = 3600) -> str:
+        ...
+
+
+_supabase: Client | None = None
+
+
+def get_supabase() -> Client | None:
+    """Created on first use so workers that never touch speaking storage skip the client setup."""
+    global _supabase
+    if _supabase is None and SUPABASE_URL and SUPABASE_KEY:
+        with startup_report.measure("client.supabase"):
+            _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
+
+
+class SupabaseAudioStorage(AudioStorage):
+    name = "supabase"
+
+    def __init__(self, bucket: str = BUCKET_NAME):
+        self.bucket = bucket
+        self._http: httpx.Client | None = None
+
+    @property
+    def client(self) -> Client:
+        client = get_supabase()
+        if client is None:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY are not set")
+        return client
+
+    @property
+    def http(self) -> httpx.Client:
+        if self._http is None:
+            self._http = httpx.Client(timeout=httpx.Timeout(STORAGE_TIMEOUT, connect=5.0))
+        return self._http
+
+    def _object_url(self, path: str) -> str:
+        return f"{SUPABASE_URL}/storage/v1/object/{self.bucket}/{quote(path)}"
+
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY or ""}
+
+    def put(self, path: str, chunks: Iterable[bytes], size: int, content_type: str) -> str:
+        # The storage SDK wants the whole body as bytes, so the object is
+        # POSTed to the REST endpoint from the chunk iterator instead.
+        response = self.http.post(
+            self._object_url(path),
+            content=chunks,
+            headers={
+                **self._headers(),
+                "Content-Type": content_type,
+                "Content-Length": str(size),
+                # upsert keeps retries idempotent when a timed-out attempt actually landed.
+                "x-upsert": "true",
+            },
+        )
+        response.raise_for_status()
+        return self.public_url(path)
+
+    def stream(self, path: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        with self.http.stream("GET", self._object_url(path), headers=self._headers()) as response:
+            if response.status_code in (400, 404):
+                # Storage answers 400 "Object not found" for missing keys.
+                raise FileNotFoundError(path)
+            response.raise_for_status()
+            yield from response.iter_bytes(chunk_size)
+
+    def list(self, folder: str) -> list[str]:
+        return [f"{folder}/{item['name']}" for item in self.client.storage.from_(self.bucket).list(folder)]
+
+    def delete(self, paths: list[str]) -> None:
+        if paths:
+            self.client.storage.from_(self.bucket).remove(paths)
+
+    def public_url(self, path: str) -> str:
+        return self.client.storage.from_(self.bucket).get_public_url(path)
+
+    def presigned_url(self, path: str, expires_in: int = 3600) -> str:
+        signed = self.client.storage.from_(self.bucket).create_signed_url(path, expires_in)
+        return signed.get("signedURL") or signed["signedUrl"]
+
+
+class LocalAudioStorage(AudioStorage):
+    """
+    Objects are plain files, so the static mount serves them with FileResponse
+    (zero-copy when the ASGI server supports the pathsend extension) and
+    nginx can serve the same directory directly.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Path = SPEAKING_LOCAL_STORAGE_DIR, base_url: str = SPEAKING_LOCAL_STORAGE_URL):
+        self.root = root
+        self.base_url = base_url
+
+    def _resolve(self, path: str) -> Path:
+        root = self.root.resolve()
+        target = (root / path).resolve()
+        if target == root or root not in target.parents:
+            raise ValueError(f"Path escapes storage root: {path!r}")
+        return target
+
+    def put(self, path: str, chunks: Iterable[bytes], size: int, content_type: str) -> str:
+        target = self._resolve(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a sibling temp file and rename, so readers never see a
+        # partial object and a retry racing a timed-out attempt is harmless.
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return self.public_url(path)
+
+    def stream(self, path: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        with open(self._resolve(path), "rb") as fh:
+            while chunk := fh.read(chunk_size):
+                yield chunk
+
+    def list(self, folder: str) -> list[str]:
+        try:
+            entries = sorted(self._resolve(folder).iterdir())
+        except FileNotFoundError:
+            return []
+        return [f"{folder}/{entry.name}" for entry in entries if entry.is_file() and not entry.name.startswith(".")]
+
+    def delete(self, paths: list[str]) -> None:
+        folders = set()
+        for path in paths:
+            target = self._resolve(path)
+            target.unlink(missing_ok=True)
+            folders.add(target.parent)
+        for folder in folders:
+            try:
+                folder.rmdir()
+            except OSError:
+                pass
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{quote(path)}"
+
+    def presigned_url(self, path: str, expires_in: int = 3600) -> str:
+        # The static mount does no auth, like the public Supabase bucket.
+        return self.public_url(path)
+
+
+_storages: dict[str, AudioStorage] = {}
+
+
+def check_audio_storage(backend: str = AUDIO_STORAGE_BACKEND) -> None:
+    """Raise if the configured backend is unknown or missing its credentials."""
+    if backend not in AUDIO_STORAGE_BACKENDS:
+        raise ValueError(f"AUDIO_STORAGE_BACKEND must be one of {', '.join(AUDIO_STORAGE_BACKENDS)}, not {backend!r}")
+    if backend == "supabase" and not (SUPABASE_URL and SUPABASE_KEY):
+        raise ValueError(
+            "AUDIO_STORAGE_BACKEND=supabase needs SUPABASE_URL and SUPABASE_KEY; "
+            "set them, or set AUDIO_STORAGE_BACKEND=local to keep recordings on disk"
+        )
+
+
+def get_audio_storage(backend: str | None = None) -> AudioStorage:
+    """The configured backend, or a specific one (e.g. the backend recorded on an older result)."""
+    backend = backend or AUDIO_STORAGE_BACKEND
+    storage = _storages.get(backend)
+    if storage is None:
+        if backend == "supabase":
+            storage = SupabaseAudioStorage()
+        elif backend == "local":
+            storage = LocalAudioStorage()
+        else:
+            raise ValueError(f"Unknown audio storage backend {backend!r}")
+        _storages[backend] = storage
+    return storage
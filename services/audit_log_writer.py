@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database.db import RequestAuditLog, SessionLocal
+from services.request_monitor import aggregate_rollup_counts, apply_rollup_counts
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "200"))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "2.0"))
+AUDIT_LOG_OVERFLOW_POLICY = os.getenv("AUDIT_LOG_OVERFLOW_POLICY", "drop_newest").strip().lower()
+AUDIT_LOG_BLOCK_TIMEOUT = float(os.getenv("AUDIT_LOG_BLOCK_TIMEOUT", "0.05"))
+
+
+class AuditLogWriter:
+    """
+    Bounded in-process queue of audit rows with a background flusher thread.
+
+    Rows are inserted in multi-row batches once `batch_size` rows are waiting
+    or `flush_interval` seconds have passed, whichever comes first. When the
+    queue is full the overflow policy decides what happens:
+
+    - drop_newest: the incoming row is discarded
+    - drop_oldest: the oldest queued row is discarded to make room
+    - block: the caller waits up to `block_timeout` seconds, then the row is discarded
+
+    Async callers use `asubmit()`, which does that wait on a worker thread
+    instead of the event loop.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        *,
+        max_queue: int = AUDIT_LOG_QUEUE_SIZE,
+        batch_size: int = AUDIT_LOG_BATCH_SIZE,
+        flush_interval: float = AUDIT_LOG_FLUSH_INTERVAL,
+        overflow_policy: str = AUDIT_LOG_OVERFLOW_POLICY,
+        block_timeout: float = AUDIT_LOG_BLOCK_TIMEOUT,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit log overflow policy: {overflow_policy}")
+        self.session_factory = session_factory
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.05, flush_interval)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = max(0.0, block_timeout)
+
+        self._queue: deque[dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.last_flush_at: float | None = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, row: dict[str, Any], *, wait: bool = True) -> bool | None:
+        """Returns None instead of waiting when the queue is full under `block` and `wait` is false."""
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.overflow_policy == "block" and not self._stopping:
+                    if not wait:
+                        return None
+                    self._not_full.wait_for(
+                        lambda: len(self._queue) < self.max_queue or self._stopping,
+                        timeout=self.block_timeout,
+                    )
+                    if len(self._queue) >= self.max_queue:
+                        self.dropped += 1
+                        return False
+                else:
+                    self.dropped += 1
+                    return False
+
+            self._queue.append(row)
+            self.queued += 1
+            if len(self._queue) >= self.batch_size:
+                self._not_empty.notify()
+            return True
+
+    async def asubmit(self, row: dict[str, Any]) -> bool:
+        accepted = self.submit(row, wait=False)
+        if accepted is None:
+            accepted = await asyncio.to_thread(self.submit, row)
+        return accepted
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "pending": len(self._queue),
+                "queued": self.queued,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "failed_batches": self.failed_batches,
+                "last_flush_at": self.last_flush_at,
+                "max_queue": self.max_queue,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+                "overflow_policy": self.overflow_policy,
+            }
+
+    def _take_batch(self) -> list[dict[str, Any]]:
+        with self._lock:
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(timeout=remaining)
+            count = min(len(self._queue), self.batch_size)
+            batch = [self._queue.popleft() for _ in range(count)]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self.flush_batch(batch)
+            with self._lock:
+                if self._stopping and not self._queue:
+                    return
+
+    def flush_batch(self, batch: list[dict[str, Any]]) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(insert(RequestAuditLog), batch)
+            apply_rollup_counts(db, aggregate_rollup_counts(batch))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Audit log flush error: {e}")
+            with self._lock:
+                self.failed_batches += 1
+                self.dropped += len(batch)
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self.flushed += len(batch)
+            self.last_flush_at = time.time()
+
+
+audit_log_writer = AuditLogWriter()
@@ -0,0 +1,285 @@
+"""
+Partition maintenance for request_audit_logs.
+
+The table is range-partitioned on created_at into daily or weekly
+partitions named `request_audit_logs_pYYYYMMDD` (the partition start date).
+A default partition catches rows that fall outside every range so inserts
+never fail. When a partition is later created for a range that already has
+rows in the default partition, those rows are moved into it (see
+`create_partition()`).
+
+Run daily from cron (or any scheduler):
+
+    python -m services.audit_partitions maintain
+
+which creates upcoming partitions and archives/drops expired ones. The app
+lifespan only creates partitions whose range is empty in the default
+partition, and skips the work when another worker holds the lock; moving
+stranded rows locks the whole table, so that is left to `maintain`.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.db import Base, RequestAuditLog, SessionLocal, engine
+
+PARENT_TABLE = RequestAuditLog.__tablename__
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+LEGACY_TABLE = f"{PARENT_TABLE}_legacy"
+PARTITION_NAME_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{8}})$")
+# pg_advisory_xact_lock key serialising partition DDL across workers and cron.
+PARTITION_LOCK_ID = 7420114
+
+AUDIT_LOG_PARTITION_INTERVAL = os.getenv("AUDIT_LOG_PARTITION_INTERVAL", "day").strip().lower()
+AUDIT_LOG_PARTITIONS_AHEAD = int(os.getenv("AUDIT_LOG_PARTITIONS_AHEAD", "7"))
+AUDIT_LOG_RETENTION_DAYS = int(os.getenv("AUDIT_LOG_RETENTION_DAYS", "30"))
+AUDIT_LOG_ARCHIVE_DIR = os.getenv("AUDIT_LOG_ARCHIVE_DIR", "archives/request_audit_logs")
+AUDIT_LOG_ARCHIVE_ENABLED = os.getenv("AUDIT_LOG_ARCHIVE_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _interval_days() -> int:
+    return 7 if AUDIT_LOG_PARTITION_INTERVAL == "week" else 1
+
+
+def partition_start(day: date) -> date:
+    if _interval_days() == 7:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def partition_name(start: date) -> str:
+    return f"{PARENT_TABLE}_p{start.strftime('%Y%m%d')}"
+
+
+def is_partitioned(db: Session) -> bool:
+    row = db.execute(
+        text(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = current_schema()"
+        ),
+        {"name": PARENT_TABLE},
+    ).first()
+    return bool(row and row[0] == "p")
+
+
+def list_partitions(db: Session) -> list[dict[str, Any]]:
+    rows = db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": PARENT_TABLE},
+    ).all()
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_NAME_RE.match(name)
+        if not match:
+            continue
+        start = datetime.strptime(match.group(1), "%Y%m%d").date()
+        partitions.append({"name": name, "start": start})
+    partitions.sort(key=lambda item: item["start"])
+    for idx, item in enumerate(partitions):
+        # Bounds come from the naming scheme; an interval change only affects new partitions.
+        next_start = partitions[idx + 1]["start"] if idx + 1 < len(partitions) else None
+        item["end"] = next_start or item["start"] + timedelta(days=_interval_days())
+    return partitions
+
+
+def create_partition(db: Session, start: date, end: date, *, repair_default: bool = True) -> str | None:
+    """
+    Postgres refuses to create a partition while the default partition holds
+    rows for its range. With `repair_default` those rows are moved over: the
+    default is detached, the partition created, the rows copied through the
+    parent and deleted from the default, and the default re-attached, all in
+    the caller's transaction. Inserts wait on the parent's lock for the
+    duration. Without it the partition is not created and None is returned.
+    """
+    name = partition_name(start)
+    bounds = {"start": datetime.combine(start, datetime.min.time()), "end": datetime.combine(end, datetime.min.time())}
+    create = (
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{PARENT_TABLE}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    in_range = "created_at >= :start AND created_at < :end"
+    stranded = db.execute(
+        text(f'SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range} LIMIT 1'), bounds
+    ).first()
+    if not stranded:
+        db.execute(text(create))
+        return name
+    if not repair_default:
+        print(f"Audit partition {name}: rows for its range are in {DEFAULT_PARTITION}; run `python -m services.audit_partitions maintain`")
+        return None
+
+    columns = ", ".join(f'"{column.name}"' for column in RequestAuditLog.__table__.columns)
+    db.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"'))
+    db.execute(text(create))
+    moved = db.execute(
+        text(f'INSERT INTO "{PARENT_TABLE}" ({columns}) SELECT {columns} FROM "{DEFAULT_PARTITION}" WHERE {in_range}'),
+        bounds,
+    ).rowcount
+    db.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range}'), bounds)
+    db.execute(text(f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT'))
+    print(f"Audit partition {name}: moved {moved} rows out of {DEFAULT_PARTITION}")
+    return name
+
+
+def _lock(db: Session, *, wait: bool) -> bool:
+    if not wait:
+        return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID}).scalar())
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID})
+    return True
+
+
+def ensure_partitions(
+    db: Session, *, ahead_days: int = AUDIT_LOG_PARTITIONS_AHEAD, repair_default: bool = True, wait: bool = True
+) -> list[str]:
+    """Create the default partition and every partition from today to `ahead_days` out."""
+    if not is_partitioned(db):
+        print(f"{PARENT_TABLE} is not partitioned; run `python -m services.audit_partitions convert` first")
+        return []
+    if not _lock(db, wait=wait):
+        db.rollback()
+        return []
+
+    db.execute(text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT'))
+    existing = {item["name"] for item in list_partitions(db)}
+    created = []
+    step = timedelta(days=_interval_days())
+    start = partition_start(datetime.utcnow().date())
+    last = datetime.utcnow().date() + timedelta(days=ahead_days)
+    while start <= last:
+        if partition_name(start) not in existing:
+            name = create_partition(db, start, start + step, repair_default=repair_default)
+            if name:
+                created.append(name)
+        start += step
+    db.commit()
+    return created
+
+
+def _archive_partition(db: Session, name: str, archive_dir: Path) -> Path:
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    target = archive_dir / f"{name}.csv.gz"
+    connection = db.connection().connection
+    with connection.cursor() as cursor, gzip.open(target, "wb") as fh:
+        cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH CSV HEADER', fh)
+    return target
+
+
+def apply_retention(
+    db: Session,
+    *,
+    retention_days: int = AUDIT_LOG_RETENTION_DAYS,
+    archive: bool = AUDIT_LOG_ARCHIVE_ENABLED,
+    archive_dir: str | Path = AUDIT_LOG_ARCHIVE_DIR,
+) -> list[dict[str, Any]]:
+    """Archive (optional) and drop every partition that ends before the retention cutoff."""
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    removed = []
+    for item in list_partitions(db):
+        if item["end"] > cutoff:
+            continue
+        _lock(db, wait=True)
+        archived_to = None
+        if archive:
+            archived_to = str(_archive_partition(db, item["name"], Path(archive_dir)))
+        db.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{item["name"]}"'))
+        db.execute(text(f'DROP TABLE "{item["name"]}"'))
+        db.commit()
+        removed.append({"partition": item["name"], "archived_to": archived_to})
+    return removed
+
+
+def ensure_partitions_on_startup() -> None:
+    db = SessionLocal()
+    try:
+        # Other workers starting at the same time skip; nobody blocks inserts here.
+        ensure_partitions(db, repair_default=False, wait=False)
+    except Exception as e:
+        db.rollback()
+        print(f"Audit partition startup error: {e}")
+    finally:
+        db.close()
+
+
+def maintain(db: Session) -> dict[str, Any]:
+    created = ensure_partitions(db)
+    removed = apply_retention(db)
+    return {"created": created, "removed": removed}
+
+
+def convert_to_partitioned(db: Session, *, copy_days: int = AUDIT_LOG_RETENTION_DAYS) -> dict[str, Any]:
+    """
+    One-off migration for databases created before partitioning: the old table
+    is renamed to request_audit_logs_legacy, the partitioned table is created
+    and the last `copy_days` days are copied over. The legacy table is left in
+    place so it can be archived or dropped by hand.
+    """
+    if is_partitioned(db):
+        return {"converted": False, "reason": "already partitioned"}
+
+    db.execute(text(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{LEGACY_TABLE}"'))
+    db.execute(text(f'ALTER TABLE "{LEGACY_TABLE}" RENAME CONSTRAINT "{PARENT_TABLE}_pkey" TO "{LEGACY_TABLE}_pkey"'))
+    for index in RequestAuditLog.__table__.indexes:
+        db.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+    db.commit()
+
+    Base.metadata.create_all(bind=engine, tables=[RequestAuditLog.__table__])
+    ensure_partitions(db)
+    earliest = datetime.utcnow().date() - timedelta(days=copy_days)
+    start = partition_start(earliest)
+    step = timedelta(days=_interval_days())
+    _lock(db, wait=True)
+    while start < partition_start(datetime.utcnow().date()):
+        # Inserts since ensure_partitions() may already have landed in the default.
+        create_partition(db, start, start + step)
+        start += step
+
+    columns = ", ".join(f'"{column.name}"' for column in RequestAuditLog.__table__.columns)
+    copied = db.execute(
+        text(
+            f'INSERT INTO "{PARENT_TABLE}" ({columns}) '
+            f'SELECT {columns} FROM "{LEGACY_TABLE}" WHERE created_at >= :since'
+        ),
+        {"since": datetime.combine(earliest, datetime.min.time())},
+    ).rowcount
+    db.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+            f'COALESCE((SELECT MAX(id) FROM "{PARENT_TABLE}"), 1))'
+        )
+    )
+    db.commit()
+    return {"converted": True, "rows_copied": copied, "legacy_table": LEGACY_TABLE}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "maintain"
+    session = SessionLocal()
+    try:
+        if command == "maintain":
+            print(maintain(session))
+        elif command == "ensure":
+            print({"created": ensure_partitions(session)})
+        elif command == "retention":
+            print({"removed": apply_retention(session)})
+        elif command == "convert":
+            print(convert_to_partitioned(session))
+        else:
+            print("usage: python -m services.audit_partitions [maintain|ensure|retention|convert]")
+            sys.exit(2)
+    finally:
+        session.close()
@@ -0,0 +1,328 @@
+"""
+Durable background jobs stored in the background_jobs table.
+
+Request handlers call `enqueue()` inside their own transaction, so a job
+exists exactly when the row it describes was committed. Workers claim due
+jobs with SELECT ... FOR UPDATE SKIP LOCKED, run the registered handler
+outside the transaction and either finish the job, schedule a retry with
+exponential backoff or, after `max_attempts`, move it to the dead-letter
+state (`status = "dead"`) where an admin can inspect and retry it.
+
+Run a dedicated worker process with:
+
+    python -m services.job_queue work
+
+or let each app process run one in a thread (JOB_WORKER_IN_PROCESS=true).
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database.db import BackgroundJob, SessionLocal
+from services.metrics import metrics
+
+JOB_STATUSES = ("pending", "running", "done", "dead")
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "6"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "15"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "1800"))
+JOB_LOCK_TIMEOUT_SECONDS = int(os.getenv("JOB_LOCK_TIMEOUT_SECONDS", "600"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2.0"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "10"))
+JOB_WORKER_IN_PROCESS = os.getenv("JOB_WORKER_IN_PROCESS", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+# Modules whose import registers handlers via @job_handler.
+HANDLER_MODULES = ("services.archive_jobs", "services.regrade")
+
+_handlers: dict[str, Callable[[dict[str, Any]], None]] = {}
+# The job a handler is running for, so it can report progress.
+_current = threading.local()
+
+
+def job_handler(kind: str):
+    def register(fn: Callable[[dict[str, Any]], None]):
+        _handlers[kind] = fn
+        return fn
+
+    return register
+
+
+def load_handlers() -> None:
+    for module_name in HANDLER_MODULES:
+        importlib.import_module(module_name)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict[str, Any],
+    *,
+    idempotency_key: str | None = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    delay_seconds: float = 0,
+) -> int | None:
+    """
+    Add a job to the caller's transaction; the caller commits. Returns the
+    job id, or None when a job with the same idempotency key already exists.
+    """
+    stmt = pg_insert(BackgroundJob).values(
+        kind=kind,
+        payload=payload,
+        idempotency_key=idempotency_key,
+        status="pending",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+        created_at=datetime.utcnow(),
+    )
+    if idempotency_key:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["idempotency_key"])
+    job_id = db.execute(stmt.returning(BackgroundJob.id)).scalar()
+    metrics.incr("jobs.enqueued")
+    return job_id
+
+
+def report_progress(progress: dict[str, Any]) -> None:
+    """Record progress for the job the calling handler runs; a no-op outside a job."""
+    job_id = getattr(_current, "job_id", None)
+    if job_id is None:
+        return
+    # Own session: the handler may be in the middle of its own transaction.
+    db = SessionLocal()
+    try:
+        # Doubles as a heartbeat so a long job is not released as stale mid-run.
+        db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(progress=progress, locked_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    # Jitter spreads out jobs that failed together during one outage.
+    return delay * random.uniform(0.8, 1.2)
+
+
+def release_stale_jobs(db: Session) -> int:
+    """Return jobs whose worker died mid-run to the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS)
+    result = db.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.status == "running", BackgroundJob.locked_at < cutoff)
+        .values(status="pending", locked_by=None, locked_at=None)
+    )
+    db.commit()
+    return result.rowcount or 0
+
+
+def claim_job(db: Session, worker_id: str) -> tuple[int, str, dict[str, Any]] | None:
+    """Lock the next due job; the caller runs it straight away.
+
+    One job per claim so locked_at is the time the job actually started. A
+    claimed batch would leave the later jobs waiting behind the earlier ones
+    under the same locked_at, and release_stale_jobs could hand them to
+    another worker before they ever ran.
+    """
+    now = datetime.utcnow()
+    job = (
+        db.query(BackgroundJob)
+        .filter(BackgroundJob.status == "pending", BackgroundJob.run_after <= now)
+        .order_by(BackgroundJob.run_after, BackgroundJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.commit()
+        return None
+    job.status = "running"
+    job.locked_by = worker_id
+    job.locked_at = now
+    job.attempts += 1
+    claimed = (job.id, job.kind, job.payload or {})
+    db.commit()
+    return claimed
+
+
+def run_job(db: Session, job_id: int, kind: str, payload: dict[str, Any]) -> bool:
+    started = time.perf_counter()
+    error = None
+    handler = _handlers.get(kind)
+    if handler is None:
+        error = f"No handler registered for job kind {kind!r}"
+    else:
+        _current.job_id = job_id
+        try:
+            handler(payload)
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+        finally:
+            _current.job_id = None
+    metrics.observe(f"jobs.{kind}.run_ms", (time.perf_counter() - started) * 1000)
+
+    job = db.get(BackgroundJob, job_id)
+    if job is None:
+        return error is None
+    job.locked_by = None
+    job.locked_at = None
+    if error is None:
+        job.status = "done"
+        job.last_error = None
+        job.finished_at = datetime.utcnow()
+        metrics.incr("jobs.done")
+    elif job.attempts >= job.max_attempts:
+        job.status = "dead"
+        job.last_error = error[:4000]
+        job.finished_at = datetime.utcnow()
+        metrics.incr("jobs.dead")
+        print(f"Job {job_id} ({kind}) moved to dead letter after {job.attempts} attempts: {error}")
+    else:
+        job.status = "pending"
+        job.last_error = error[:4000]
+        job.run_after = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+        metrics.incr("jobs.retried")
+    db.commit()
+    return error is None
+
+
+def retry_job(db: Session, job_id: int) -> bool:
+    """Put a dead (or finished) job back in the queue with a fresh attempt budget."""
+    job = db.get(BackgroundJob, job_id)
+    if job is None or job.status in ("pending", "running"):
+        return False
+    job.status = "pending"
+    job.attempts = 0
+    job.run_after = datetime.utcnow()
+    job.finished_at = None
+    db.commit()
+    return True
+
+
+def queue_stats(db: Session) -> dict[str, Any]:
+    counts = dict(db.query(BackgroundJob.status, func.count()).group_by(BackgroundJob.status).all())
+    oldest_pending = (
+        db.query(func.min(BackgroundJob.run_after)).filter(BackgroundJob.status == "pending").scalar()
+    )
+    return {
+        "counts": {status: counts.get(status, 0) for status in JOB_STATUSES},
+        "oldest_pending_run_after": oldest_pending,
+    }
+
+
+class JobWorker:
+    """Polls for due jobs and runs them one at a time on a background thread."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        *,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        batch_size: int = JOB_BATCH_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = max(0.1, poll_interval)
+        self.batch_size = max(1, batch_size)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.processed = 0
+        self.failed = 0
+        self.last_poll_at: float | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        load_handlers()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="job-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            release_stale_jobs(db)
+            ran = 0
+            while ran < self.batch_size and not self._stop.is_set():
+                claimed = claim_job(db, self.worker_id)
+                if claimed is None:
+                    break
+                ran += 1
+                if run_job(db, *claimed):
+                    self.processed += 1
+                else:
+                    self.failed += 1
+            return ran
+        except Exception as e:
+            db.rollback()
+            print(f"Job worker error: {e}")
+            return 0
+        finally:
+            self.last_poll_at = time.time()
+            db.close()
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            # A full batch means more work is probably waiting; poll again at once.
+            if self.run_once() < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "worker_id": self.worker_id,
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_poll_at": self.last_poll_at,
+        }
+
+
+job_worker = JobWorker()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "work"
+    if command == "work":
+        load_handlers()
+        print(f"Job worker {job_worker.worker_id} started")
+        try:
+            job_worker.run_forever()
+        except KeyboardInterrupt:
+            pass
+    elif command == "stats":
+        session = SessionLocal()
+        try:
+            print(queue_stats(session))
+        finally:
+            session.close()
+    elif command == "retry" and len(sys.argv) > 2:
+        session = SessionLocal()
+        try:
+            print({"requeued": retry_job(session, int(sys.argv[2]))})
+        finally:
+            session.close()
+    else:
+        print("usage: python -m services.job_queue [work|stats|retry <job_id>]")
+        sys.exit(2)
@@ -0,0 +1,74 @@
+"""Small in-process metrics primitives for the /health/* endpoints."""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Any
+
+DEFAULT_LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Cumulative-free bucket histogram: each observation lands in exactly one bucket."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            labels = [f"le_{bound:g}" for bound in self.buckets] + ["inf"]
+            return {
+                "count": self.count,
+                "sum": round(self.total, 3),
+                "avg": round(self.total / self.count, 3) if self.count else 0,
+                "max": round(self.max, 3),
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._histograms: dict[str, Histogram] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def histogram(self, name: str, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS_MS) -> Histogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            return histogram
+
+    def observe(self, name: str, value: float) -> None:
+        self.histogram(name).observe(value)
+
+    def snapshot(self, prefix: str = "") -> dict[str, Any]:
+        with self._lock:
+            counters = {name: value for name, value in self._counters.items() if name.startswith(prefix)}
+            histograms = {name: hist for name, hist in self._histograms.items() if name.startswith(prefix)}
+        return {
+            "counters": counters,
+            "histograms": {name: hist.snapshot() for name, hist in histograms.items()},
+        }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from database.db import ListeningMock, ListeningMockAnswer, ReadingMockAnswer, ReadingMockQuestion
+from services.scoring import CompiledKey, compile_listening_key, compile_reading_key
+
+# Without Redis this is how stale another process's copy may get after an admin edit.
+MOCK_CONTENT_CACHE_TTL = float(os.getenv("MOCK_CONTENT_CACHE_TTL", "10"))
+MOCK_CONTENT_CACHE_SIZE = int(os.getenv("MOCK_CONTENT_CACHE_SIZE", "256"))
+MOCK_CONTENT_CACHE_REDIS = os.getenv("MOCK_CONTENT_CACHE_REDIS", "false").strip().lower() in {"1", "true", "yes", "on"}
+# Payloads are immutable per version, so they only expire to reclaim memory.
+MOCK_CONTENT_REDIS_TTL = int(os.getenv("MOCK_CONTENT_REDIS_TTL", str(24 * 3600)))
+REDIS_KEY_PREFIX = "mock-content:"
+
+CEFR_READING = "cefr_reading"
+CEFR_LISTENING = "cefr_listening"
+
+READING_ANSWER_COLUMNS = ("part1", "part2", "part3", "part4", "part5")
+LISTENING_ANSWER_COLUMNS = ("part_1", "part_2", "part_3", "part_4", "part_5", "part_6")
+
+
+@dataclass(frozen=True)
+class MockContent:
+    """What a submit needs from a mock: its title, answer key and archive prompts."""
+
+    kind: str
+    mock_id: int
+    version: int
+    title: str | None
+    answers: dict[str, list[Any]]  # answer-row columns as stored
+    prompts: list[str]  # archive prompt per question number, in order
+    key: CompiledKey = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        row = SimpleNamespace(**self.answers)
+        key = compile_reading_key(row) if self.kind == CEFR_READING else compile_listening_key(row)
+        object.__setattr__(self, "key", key)
+
+    def prompt(self, number: int) -> str:
+        return self.prompts[number - 1] if 0 < number <= len(self.prompts) else f"Question {number}"
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"title": self.title, "answers": self.answers, "prompts": self.prompts}, default=str
+        )
+
+    @classmethod
+    def from_json(cls, kind: str, mock_id: int, version: int, raw: str) -> MockContent:
+        fields = json.loads(raw)
+        return cls(kind, mock_id, version, fields["title"], fields["answers"], fields["prompts"])
+
+
+def _reading_prompts(question: ReadingMockQuestion, key: CompiledKey) -> list[str]:
+    part1_text = (question.part1 or {}).get("text", "")
+    part2_statements = (question.part2 or {}).get("statements", []) or []
+    part3_paragraphs = (question.part3 or {}).get("paragraphs", []) or []
+    part4_mc = (question.part4 or {}).get("multipleChoice", []) or []
+    part4_tf = (question.part4 or {}).get("trueFalse", []) or []
+    part5_mc = (question.part5 or {}).get("multipleChoice", []) or []
+
+    def prompt_for(part, idx):
+        if part == "part1":
+            return f"Gap {idx + 1} from Part 1 text: {part1_text}"
+        if part == "part2":
+            return part2_statements[idx] if idx < len(part2_statements) else f"Part 2 statement {idx + 1}"
+        if part == "part3":
+            return part3_paragraphs[idx] if idx < len(part3_paragraphs) else f"Part 3 paragraph {idx + 1}"
+        if part == "part4MC":
+            mc_q = part4_mc[idx] if idx < len(part4_mc) else {}
+            return mc_q.get("question") if isinstance(mc_q, dict) else f"Part 4 MC question {idx + 1}"
+        if part == "part4TF":
+            tf_q = part4_tf[idx] if idx < len(part4_tf) else {}
+            return tf_q.get("statement") if isinstance(tf_q, dict) else f"Part 4 TF statement {idx + 1}"
+        if part == "part5Mini":
+            return f"Gap {idx + 1} from Part 5 mini text"
+        mc_q = part5_mc[idx] if idx < len(part5_mc) else {}
+        return mc_q.get("question") if isinstance(mc_q, dict) else f"Part 5 MC question {idx + 1}"
+
+    return [str(prompt_for(slot.part, slot.index) or "-") for slot in key.slots]
+
+
+def _listening_prompts(mock: ListeningMock) -> list[str]:
+    part_data = mock.data or {}
+    prompts = []
+
+    for idx, options in enumerate(part_data.get("part_1", []) or []):
+        if isinstance(options, list):
+            opts = ", ".join([f"{chr(65 + i)}. {str(opt)}" for i, opt in enumerate(options)])
+            prompts.append(f"Part 1 - Question {idx + 1}: {opts}")
+        else:
+            prompts.append(f"Part 1 - Question {idx + 1}")
+
+    for idx, item in enumerate(part_data.get("part_2", []) or []):
+        if isinstance(item, dict):
+            prompt_text = f"{item.get('label', '').strip()} {item.get('before', '').strip()} ____ {item.get('after', '').strip()}".strip()
+            prompts.append(f"Part 2 - Question {idx + 1}: {prompt_text}")
+        else:
+            prompts.append(f"Part 2 - Question {idx + 1}")
+
+    for idx, speaker in enumerate((part_data.get("part_3", {}) or {}).get("speakers", []) or []):
+        prompts.append(f"Part 3 - Speaker {idx + 1}: {speaker}")
+
+    for idx, q in enumerate((part_data.get("part_4", {}) or {}).get("questions", []) or []):
+        if isinstance(q, dict):
+            prompts.append(f"Part 4 - Map label {idx + 1}: {q.get('place', '')}")
+        else:
+            prompts.append(f"Part 4 - Question {idx + 1}")
+
+    for extract in part_data.get("part_5", []) or []:
+        extract_name = extract.get("name", "Extract") if isinstance(extract, dict) else "Extract"
+        qs = extract.get("questions", []) if isinstance(extract, dict) else []
+        for q in qs:
+            if isinstance(q, dict):
+                prompts.append(f"Part 5 - {extract_name}: {q.get('text', '')}")
+            else:
+                prompts.append(f"Part 5 - {extract_name}")
+
+    for idx, q in enumerate((part_data.get("part_6", {}) or {}).get("questions", []) or []):
+        if isinstance(q, dict):
+            prompt_text = q.get("text") or q.get("question") or q.get("before") or f"Question {idx + 1}"
+        else:
+            prompt_text = str(q)
+        prompts.append(f"Part 6 - Question {idx + 1}: {prompt_text}")
+
+    return prompts
+
+
+class MockContentNotFound(LookupError):
+    """Carries the submit route's 404 message."""
+
+
+def _columns(row, names: tuple[str, ...]) -> dict[str, list[Any]]:
+    return {name: list(getattr(row, name) or []) for name in names}
+
+
+def load_reading(db: Session, mock_id: int, version: int) -> MockContent:
+    row = (
+        db.query(ReadingMockQuestion, ReadingMockAnswer)
+        .outerjoin(ReadingMockAnswer, ReadingMockAnswer.question_id == ReadingMockQuestion.id)
+        .filter(ReadingMockQuestion.id == mock_id)
+        .first()
+    )
+    if row is None:
+        raise MockContentNotFound("Question not found.")
+    question, answer = row
+    if answer is None:
+        raise MockContentNotFound("Answers not found.")
+    answers = _columns(answer, READING_ANSWER_COLUMNS)
+    key = compile_reading_key(SimpleNamespace(**answers))
+    return MockContent(CEFR_READING, mock_id, version, question.title, answers, _reading_prompts(question, key))
+
+
+def load_listening(db: Session, mock_id: int, version: int) -> MockContent:
+    row = (
+        db.query(ListeningMock, ListeningMockAnswer)
+        .outerjoin(ListeningMockAnswer, ListeningMockAnswer.mock_id == ListeningMock.id)
+        .filter(ListeningMock.id == mock_id)
+        .first()
+    )
+    if row is None:
+        raise MockContentNotFound("Listening mock not found")
+    mock, answer = row
+    if answer is None:
+        raise MockContentNotFound("Listening answers not found")
+    answers = _columns(answer, LISTENING_ANSWER_COLUMNS)
+    return MockContent(CEFR_LISTENING, mock_id, version, mock.title, answers, _listening_prompts(mock))
+
+
+LOADERS: dict[str, Callable[[Session, int, int], MockContent]] = {
+    CEFR_READING: load_reading,
+    CEFR_LISTENING: load_listening,
+}
+
+
+class MockContentCache:
+    """
+    Answer keys and archive prompts of CEFR mocks, keyed by (kind, mock id, version).
+
+    A local LRU sits in front of an optional Redis tier. The admin routes that
+    edit or delete a mock or its answers call `invalidate()`, which bumps the
+    version, so a submit served from cache never touches the mock tables.
+    With Redis enabled every lookup GETs the current version before using a
+    local entry, so other processes stop serving the old key immediately.
+    Without Redis they only see the edit once their local entry expires
+    (MOCK_CONTENT_CACHE_TTL).
+    """
+
+    def __init__(self, *, ttl: float = MOCK_CONTENT_CACHE_TTL, max_size: int = MOCK_CONTENT_CACHE_SIZE, use_redis: bool = MOCK_CONTENT_CACHE_REDIS):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self.use_redis = use_redis
+        self._entries: OrderedDict[tuple[str, int], tuple[float, MockContent]] = OrderedDict()
+        self._versions: dict[tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _redis(self):
+        if not self.use_redis:
+            return None
+        from redis_client import get_redis
+
+        return get_redis()
+
+    def _version_key(self, kind: str, mock_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}{kind}:{mock_id}:version"
+
+    def _content_key(self, kind: str, mock_id: int, version: int) -> str:
+        return f"{REDIS_KEY_PREFIX}{kind}:{mock_id}:v{version}"
+
+    def _current_version(self, kind: str, mock_id: int) -> int:
+        try:
+            return int(self._redis().get(self._version_key(kind, mock_id)) or 0)
+        except Exception as e:
+            print(f"Mock content cache redis error: {e}")
+            return -1  # matches no cached version, so the row is reloaded
+
+    def _store_local(self, content: MockContent, generation: int) -> None:
+        cache_key = (content.kind, content.mock_id)
+        with self._lock:
+            # An invalidation that raced the load wins.
+            if self._versions.get(cache_key, 0) != generation:
+                return
+            self._entries[cache_key] = (time.monotonic() + self.ttl, content)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, db: Session, kind: str, mock_id: int) -> MockContent:
+        """Raises MockContentNotFound when the mock or its answers are missing; misses are not cached."""
+        cache_key = (kind, mock_id)
+        client = self._redis()
+        version = self._current_version(kind, mock_id) if client is not None else 0
+        if version < 0:
+            client = None  # Redis is down: fall back to the local TTL
+        now = time.monotonic()
+        with self._lock:
+            generation = self._versions.get(cache_key, 0)
+            entry = self._entries.get(cache_key)
+            fresh = entry and (entry[1].version == version if client is not None else entry[0] > now)
+            if fresh:
+                self._entries.move_to_end(cache_key)
+                self.local_hits += 1
+                return entry[1]
+
+        if client is None:
+            version = generation
+        else:
+            try:
+                raw = client.get(self._content_key(kind, mock_id, version))
+            except Exception as e:
+                print(f"Mock content cache redis error: {e}")
+                raw = None
+            if raw:
+                content = MockContent.from_json(kind, mock_id, version, raw)
+                self._store_local(content, generation)
+                with self._lock:
+                    self.redis_hits += 1
+                return content
+
+        with self._lock:
+            self.misses += 1
+        content = LOADERS[kind](db, mock_id, version)
+        self._store_local(content, generation)
+        if client is not None:
+            try:
+                client.set(self._content_key(kind, mock_id, version), content.to_json(), ex=MOCK_CONTENT_REDIS_TTL)
+            except Exception as e:
+                print(f"Mock content cache redis error: {e}")
+        return content
+
+    def invalidate(self, kind: str, mock_id: int) -> None:
+        """Call after the admin change is committed, so a reload cannot see the old rows."""
+        cache_key = (kind, mock_id)
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            self._versions[cache_key] = self._versions.get(cache_key, 0) + 1
+            self.invalidations += 1
+        client = self._redis()
+        if client is not None:
+            try:
+                client.incr(self._version_key(kind, mock_id))
+            except Exception as e:
+                print(f"Mock content cache redis error: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.local_hits + self.redis_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0,
+                "invalidations": self.invalidations,
+                "ttl_seconds": self.ttl,
+                "redis_enabled": self.use_redis,
+            }
+
+
+mock_content_cache = MockContentCache()
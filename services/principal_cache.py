@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from database.db import User
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "2048"))
+PRINCIPAL_CACHE_REDIS = os.getenv("PRINCIPAL_CACHE_REDIS", "false").strip().lower() in {"1", "true", "yes", "on"}
+REDIS_KEY_PREFIX = "principal:"
+
+# The password hash is never cached; routes that need it query the user row.
+CACHED_FIELDS = ("id", "username", "email", "role", "google_avatar", "premium_duration")
+
+
+def _serialize(user: User) -> dict[str, Any]:
+    return {field: getattr(user, field) for field in CACHED_FIELDS}
+
+
+def _to_json(fields: dict[str, Any]) -> str:
+    return json.dumps(
+        {key: value.isoformat() if isinstance(value, datetime) else value for key, value in fields.items()}
+    )
+
+
+def _from_json(raw: str) -> dict[str, Any]:
+    fields = json.loads(raw)
+    if fields.get("premium_duration"):
+        fields["premium_duration"] = datetime.fromisoformat(fields["premium_duration"])
+    return fields
+
+
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated users keyed by user id.
+
+    Entries live in Redis when it is enabled, otherwise in a local LRU. The
+    two are not layered: a local copy would keep serving a role or premium
+    change made in another process until it expired, while a Redis DELETE
+    reaches every process at once. Hits are rebuilt as
+    detached User instances and merged into the request session without a
+    SELECT, so route code keeps working with a normal ORM object.
+    """
+
+    def __init__(self, *, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE, use_redis: bool = PRINCIPAL_CACHE_REDIS):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self.use_redis = use_redis
+        self._entries: OrderedDict[int, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _redis(self):
+        if not self.use_redis:
+            return None
+        from redis_client import get_redis
+
+        return get_redis()
+
+    def _get_fields(self, user_id: int) -> dict[str, Any] | None:
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = client.get(f"{REDIS_KEY_PREFIX}{user_id}")
+            except Exception as e:
+                print(f"Principal cache redis error: {e}")
+                raw = None
+            if raw:
+                with self._lock:
+                    self.redis_hits += 1
+                return _from_json(raw)
+        else:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self.local_hits += 1
+                    return entry[1]
+                if entry:
+                    del self._entries[user_id]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store_local(self, user_id: int, fields: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, fields)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def store(self, user: User) -> None:
+        fields = _serialize(user)
+        client = self._redis()
+        if client is None:
+            self._store_local(user.id, fields)
+            return
+        try:
+            client.set(f"{REDIS_KEY_PREFIX}{user.id}", _to_json(fields), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            print(f"Principal cache redis error: {e}")
+
+    def get_user(self, db: Session, user_id: int) -> User | None:
+        fields = self._get_fields(user_id)
+        if fields is None:
+            user = db.query(User).filter(User.id == user_id).first()
+            if user:
+                self.store(user)
+            return user
+
+        user = User(**fields)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+        client = self._redis()
+        if client is not None:
+            try:
+                client.delete(f"{REDIS_KEY_PREFIX}{user_id}")
+            except Exception as e:
+                print(f"Principal cache redis error: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        client = self._redis()
+        if client is not None:
+            try:
+                keys = list(client.scan_iter(match=f"{REDIS_KEY_PREFIX}*", count=500))
+                if keys:
+                    client.delete(*keys)
+            except Exception as e:
+                print(f"Principal cache redis error: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.local_hits + self.redis_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0,
+                "invalidations": self.invalidations,
+                "ttl_seconds": self.ttl,
+                "redis_enabled": self.use_redis,
+            }
+
+
+principal_cache = PrincipalCache()
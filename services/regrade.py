@@ -0,0 +1,233 @@
+"""
+Bulk regrading of stored submissions after an answer key is edited.
+
+An admin enqueues a job (POST /dashboard/admin/jobs/regrade). The handler
+compiles the current key once, streams the affected rows in id-ordered chunks
+of REGRADE_CHUNK_SIZE, grades each chunk column-wise with `grade_batch()` and
+writes the new scores back with one executemany UPDATE per chunk. Progress
+and throughput are recorded on the job row while it runs.
+
+    python -m services.regrade cefr_reading 12    # run inline, without the queue
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from datetime import datetime
+from time import perf_counter
+from typing import Any
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from database.db import (
+    IeltsSection,
+    IeltsSubmission,
+    ListeningMockAnswer,
+    MockAttempt,
+    ReadingMockAnswer,
+    SessionLocal,
+)
+from routes.dashboard_router import normalize_score_75
+from services.job_queue import enqueue, job_handler, report_progress
+from services.metrics import metrics
+from services.scoring import (
+    READING_MAX_SCORE,
+    compile_ielts_key,
+    compile_listening_key,
+    compile_reading_key,
+    grade_batch,
+    score_to_band,
+)
+
+REGRADE = "regrade_submissions"
+REGRADE_TARGETS = ("cefr_reading", "cefr_listening", "ielts_reading", "ielts_listening")
+REGRADE_CHUNK_SIZE = int(os.getenv("REGRADE_CHUNK_SIZE", "2000"))
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+class RegradeProgress:
+    def __init__(self, target: str, mock_id: int):
+        self.target = target
+        self.mock_id = mock_id
+        self.started = perf_counter()
+        self.processed = 0
+        self.updated = 0
+        self._last_report = 0.0
+
+    def advance(self, processed: int, updated: int) -> None:
+        self.processed += processed
+        self.updated += updated
+        metrics.incr("regrade.rows", processed)
+        if perf_counter() - self._last_report >= PROGRESS_INTERVAL_SECONDS:
+            self._last_report = perf_counter()
+            report_progress(self.snapshot())
+
+    def snapshot(self, done: bool = False) -> dict[str, Any]:
+        elapsed = perf_counter() - self.started
+        return {
+            "target": self.target,
+            "mock_id": self.mock_id,
+            "processed": self.processed,
+            "updated": self.updated,
+            "elapsed_s": round(elapsed, 2),
+            "rows_per_s": round(self.processed / elapsed) if elapsed > 0 else None,
+            "done": done,
+        }
+
+
+def _chunks(db: Session, columns: tuple, filters: list, id_column):
+    """Keyset-paginated reads, so memory stays at one chunk however many rows match."""
+    last_id = 0
+    while True:
+        rows = (
+            db.query(*columns)
+            .filter(*filters, id_column > last_id)
+            .order_by(id_column)
+            .limit(REGRADE_CHUNK_SIZE)
+            .all()
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def regrade_cefr(db: Session, exam_type: str, mock_id: int, progress: RegradeProgress) -> None:
+    reading = exam_type == "cefr_reading"
+    if reading:
+        answer_row = db.query(ReadingMockAnswer).filter(ReadingMockAnswer.question_id == mock_id).first()
+    else:
+        answer_row = db.query(ListeningMockAnswer).filter(ListeningMockAnswer.mock_id == mock_id).first()
+    if answer_row is None:
+        raise ValueError(f"No answer key for {exam_type} mock {mock_id}")
+    key = compile_reading_key(answer_row) if reading else compile_listening_key(answer_row)
+    max_score = READING_MAX_SCORE if reading else key.max_score
+    part_totals = key.part_totals()
+
+    filters = [MockAttempt.exam_type == exam_type, MockAttempt.mock_id == str(mock_id)]
+    for rows in _chunks(db, (MockAttempt.id, MockAttempt.attempt_meta), filters, MockAttempt.id):
+        # Attempts from before answers were stored cannot be regraded.
+        gradable = [row for row in rows if isinstance((row.attempt_meta or {}).get("answers"), dict)]
+        batch = grade_batch(key, [row.attempt_meta["answers"] for row in gradable])
+        now = datetime.utcnow()
+        params = []
+        for i, row in enumerate(gradable):
+            score = batch.scores[i]
+            percent = round((score / max_score) * 100) if max_score else 0
+            counts = {part: batch.parts[part][i] for part in key.parts}
+            if reading:
+                meta = {**row.attempt_meta, **counts, "total": score}
+            else:
+                part_scores = {part: {"correct": counts[part], "total": part_totals[part]} for part in key.parts}
+                meta = {**row.attempt_meta, "partScores": part_scores}
+            params.append(
+                {
+                    "id": row.id,
+                    "score": score,
+                    "max_score": max_score,
+                    "score_percent": percent,
+                    "score_75": normalize_score_75(score, max_score, percent, None),
+                    "attempt_meta": meta,
+                    "updated_at": now,
+                }
+            )
+        if params:
+            db.execute(update(MockAttempt), params)
+            db.commit()
+        progress.advance(len(rows), len(params))
+
+
+def regrade_ielts(db: Session, module: str, test_id: int, progress: RegradeProgress) -> None:
+    section = db.query(IeltsSection).filter(IeltsSection.test_id == test_id, IeltsSection.module == module).first()
+    if section is None or not section.answer_key:
+        raise ValueError(f"No {module} answer key for IELTS test {test_id}")
+    key = compile_ielts_key(section.answer_key)
+    max_score = key.max_score
+    band_by_score = {score: score_to_band(score, max_score) for score in range(max_score + 1)}
+
+    filters = [IeltsSubmission.test_id == test_id, IeltsSubmission.module == module]
+    columns = (IeltsSubmission.id, IeltsSubmission.answers, IeltsSubmission.feedback)
+    for rows in _chunks(db, columns, filters, IeltsSubmission.id):
+        batch = grade_batch(key, [{"answers": row.answers or []} for row in rows], with_mismatches=True)
+        graded = {}
+        for i, row in enumerate(rows):
+            score = batch.scores[i]
+            feedback = {
+                **(row.feedback or {}),
+                "mismatches": batch.mismatches[i],
+                "accuracy": round((score / max_score) * 100, 2) if max_score else 0,
+            }
+            graded[row.id] = {"id": row.id, "score": score, "max_score": max_score, "band": band_by_score[score], "feedback": feedback}
+        db.execute(update(IeltsSubmission), list(graded.values()))
+
+        # Dashboard attempts carry the submission id since it was added to attempt_meta.
+        attempts = (
+            db.query(MockAttempt.id, MockAttempt.attempt_meta)
+            .filter(
+                MockAttempt.exam_type == f"ielts_{module}",
+                MockAttempt.mock_id == str(test_id),
+                MockAttempt.attempt_meta["submission_id"].as_integer().in_(list(graded)),
+            )
+            .all()
+        )
+        now = datetime.utcnow()
+        attempt_params = []
+        for attempt in attempts:
+            result = graded[attempt.attempt_meta["submission_id"]]
+            attempt_params.append(
+                {
+                    "id": attempt.id,
+                    "score": result["score"],
+                    "max_score": max_score,
+                    "score_75": normalize_score_75(result["score"], max_score, None, None),
+                    "band": result["band"],
+                    "attempt_meta": {**result["feedback"], "submission_id": result["id"]},
+                    "updated_at": now,
+                }
+            )
+        if attempt_params:
+            db.execute(update(MockAttempt), attempt_params)
+        db.commit()
+        progress.advance(len(rows), len(rows))
+
+
+def run_regrade(db: Session, target: str, mock_id: int) -> dict[str, Any]:
+    if target not in REGRADE_TARGETS:
+        raise ValueError(f"Unknown regrade target {target!r}")
+    progress = RegradeProgress(target, mock_id)
+    if target.startswith("cefr_"):
+        regrade_cefr(db, target, mock_id, progress)
+    else:
+        regrade_ielts(db, target.removeprefix("ielts_"), mock_id, progress)
+    summary = progress.snapshot(done=True)
+    report_progress(summary)
+    metrics.observe("regrade.run_ms", summary["elapsed_s"] * 1000)
+    print(f"Regrade finished: {summary}")
+    return summary
+
+
+def enqueue_regrade(db: Session, target: str, mock_id: int) -> int | None:
+    # A failed regrade usually means a missing key; retrying would not help.
+    return enqueue(db, REGRADE, {"target": target, "mock_id": mock_id}, max_attempts=1)
+
+
+@job_handler(REGRADE)
+def regrade_submissions(payload: dict[str, Any]) -> None:
+    db = SessionLocal()
+    try:
+        run_regrade(db, payload["target"], int(payload["mock_id"]))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in REGRADE_TARGETS:
+        print(f"usage: python -m services.regrade [{'|'.join(REGRADE_TARGETS)}] <mock_id>")
+        sys.exit(2)
+    session = SessionLocal()
+    try:
+        run_regrade(session, sys.argv[1], int(sys.argv[2]))
+    finally:
+        session.close()
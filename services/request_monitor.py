@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Iterable
 from urllib.parse import urlparse
 
-from sqlalchemy import desc, func
+from sqlalchemy import case, desc, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from database.db import RequestAuditLog
+from database.db import RequestAuditLog, RequestAuditRollup
 
 EXCLUDED_PATH_PREFIXES = (
     "/dashboard/admin/traffic",
@@ -15,6 +17,20 @@ EXCLUDED_PATH_PREFIXES = (
     "/openapi.json",
 )
 
+# Rollup dimensions: "total", "error" and "suspicious" are plain counters stored
+# under an empty value, the rest count requests per distinct value.
+ROLLUP_VALUE_DIMENSIONS = {
+    "path": "path",
+    "ip": "client_ip",
+    "origin": "origin",
+    "host": "host",
+    "user_agent": "user_agent",
+}
+ROLLUP_VALUE_MAX_LENGTH = 512
+ROLLUP_UPSERT_CHUNK = 2000
+# pg_advisory_xact_lock key: writers share it, rebuild_rollups takes it exclusively.
+ROLLUP_LOCK_ID = 7420116
+
 
 def extract_client_ip(headers: dict[str, str], fallback_ip: str | None) -> tuple[str | None, str | None]:
     forwarded_for = headers.get("x-forwarded-for")
@@ -60,8 +76,7 @@ def build_risk_flags(headers: dict[str, str], host: str | None, origin: str | No
     return flags
 
 
-def create_audit_log(
-    db: Session,
+def build_audit_log_row(
     *,
     method: str,
     path: str,
@@ -76,70 +91,165 @@ def create_audit_log(
     user_agent: str | None,
     scheme: str | None,
     request_headers: dict[str, Any],
-) -> None:
-    log = RequestAuditLog(
-        method=method,
-        path=path,
-        query_string=query_string or None,
-        full_url=full_url,
-        status_code=status_code,
-        client_ip=client_ip,
-        forwarded_for=forwarded_for,
-        host=host,
-        origin=normalize_origin(origin),
-        referer=referer,
-        user_agent=user_agent,
-        scheme=scheme,
-        request_headers=request_headers,
-        risk_flags=build_risk_flags(request_headers, host, origin, referer),
-    )
-    db.add(log)
+) -> dict[str, Any]:
+    return {
+        "method": method,
+        "path": path,
+        "query_string": query_string or None,
+        "full_url": full_url,
+        "status_code": status_code,
+        "client_ip": client_ip,
+        "forwarded_for": forwarded_for,
+        "host": host,
+        "origin": normalize_origin(origin),
+        "referer": referer,
+        "user_agent": user_agent,
+        "scheme": scheme,
+        "request_headers": request_headers,
+        "risk_flags": build_risk_flags(request_headers, host, origin, referer),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def create_audit_log(db: Session, **fields: Any) -> None:
+    row = build_audit_log_row(**fields)
+    db.add(RequestAuditLog(**row))
+    apply_rollup_counts(db, aggregate_rollup_counts([row]))
+    db.commit()
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def status_class(status_code: int | None) -> str:
+    if not status_code:
+        return "unknown"
+    return f"{status_code // 100}xx"
+
+
+def aggregate_rollup_counts(rows: Iterable[dict[str, Any]]) -> Counter:
+    counts: Counter = Counter()
+    for row in rows:
+        bucket = hour_bucket(row.get("created_at") or datetime.utcnow())
+        counts[(bucket, "total", "")] += 1
+        counts[(bucket, "status_class", status_class(row.get("status_code")))] += 1
+        if (row.get("status_code") or 0) >= 400:
+            counts[(bucket, "error", "")] += 1
+        if row.get("risk_flags"):
+            counts[(bucket, "suspicious", "")] += 1
+        for dimension, field in ROLLUP_VALUE_DIMENSIONS.items():
+            value = row.get(field)
+            if value:
+                counts[(bucket, dimension, str(value)[:ROLLUP_VALUE_MAX_LENGTH])] += 1
+    return counts
+
+
+def apply_rollup_counts(db: Session, counts: Counter) -> None:
+    """Add counts to the hourly rollups. The caller owns the transaction."""
+    if not counts:
+        return
+    # Held to commit, so a rebuild never runs between this batch's upsert and its commit.
+    db.execute(text("SELECT pg_advisory_xact_lock_shared(:id)"), {"id": ROLLUP_LOCK_ID})
+    # Sorted keys keep lock order stable between concurrent writers.
+    values = [
+        {"bucket_start": bucket, "dimension": dimension, "value": value, "count": count}
+        for (bucket, dimension, value), count in sorted(counts.items(), key=lambda item: item[0])
+    ]
+    for offset in range(0, len(values), ROLLUP_UPSERT_CHUNK):
+        stmt = pg_insert(RequestAuditRollup).values(values[offset:offset + ROLLUP_UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RequestAuditRollup.bucket_start, RequestAuditRollup.dimension, RequestAuditRollup.value],
+            set_={"count": RequestAuditRollup.count + stmt.excluded.count},
+        )
+        db.execute(stmt)
+
+
+def rebuild_rollups(db: Session, *, since: datetime, batch_size: int = 5000) -> int:
+    """
+    Recompute rollups from raw audit rows for every hour starting at `since`.
+
+    Runs as one transaction under the exclusive rollup lock. Flushes that
+    committed before it are in both the deleted rollups and the scanned raw
+    rows; flushes that arrive meanwhile wait and are added on top afterwards.
+    The audit writer is stalled for the duration.
+    """
+    since = hour_bucket(since)
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ROLLUP_LOCK_ID})
+    db.query(RequestAuditRollup).filter(RequestAuditRollup.bucket_start >= since).delete(synchronize_session=False)
+
+    columns = [
+        RequestAuditLog.created_at,
+        RequestAuditLog.status_code,
+        RequestAuditLog.risk_flags,
+        *(getattr(RequestAuditLog, field) for field in ROLLUP_VALUE_DIMENSIONS.values()),
+    ]
+    rows_seen = 0
+    counts: Counter = Counter()
+    query = db.query(*columns).filter(RequestAuditLog.created_at >= since).yield_per(batch_size)
+    for row in query:
+        counts.update(aggregate_rollup_counts([row._asdict()]))
+        rows_seen += 1
+        if rows_seen % batch_size == 0:
+            apply_rollup_counts(db, counts)
+            counts = Counter()
+    apply_rollup_counts(db, counts)
     db.commit()
+    return rows_seen
 
 
 def _top_group(
     db: Session,
-    column: Any,
+    dimension: str,
     *,
     since: datetime,
     limit: int,
-    exclude_null: bool = True,
 ) -> list[dict[str, Any]]:
-    query = (
-        db.query(column.label("value"), func.count(RequestAuditLog.id).label("count"))
-        .filter(RequestAuditLog.created_at >= since)
+    total = func.sum(RequestAuditRollup.count).label("count")
+    rows = (
+        db.query(RequestAuditRollup.value.label("value"), total)
+        .filter(RequestAuditRollup.dimension == dimension, RequestAuditRollup.bucket_start >= since)
+        .group_by(RequestAuditRollup.value)
+        .order_by(desc("count"))
+        .limit(limit)
+        .all()
     )
-    if exclude_null:
-        query = query.filter(column.isnot(None)).filter(column != "")
-    rows = query.group_by(column).order_by(desc("count")).limit(limit).all()
-    return [{"value": value, "count": count} for value, count in rows]
+    return [{"value": value, "count": int(count)} for value, count in rows]
 
 
 def get_traffic_snapshot(db: Session, *, hours: int = 24, limit: int = 20) -> dict[str, Any]:
     safe_hours = max(1, min(hours, 168))
     safe_limit = max(5, min(limit, 100))
-    since = datetime.utcnow() - timedelta(hours=safe_hours)
+    # The window covers the current partial hour plus the previous full hours,
+    # so it lines up with rollup buckets.
+    since = hour_bucket(datetime.utcnow()) - timedelta(hours=safe_hours - 1)
 
-    total_requests = db.query(func.count(RequestAuditLog.id)).filter(RequestAuditLog.created_at >= since).scalar() or 0
-    unique_ips = (
-        db.query(func.count(func.distinct(RequestAuditLog.client_ip)))
-        .filter(RequestAuditLog.created_at >= since)
-        .scalar()
-        or 0
-    )
-    unique_origins = (
-        db.query(func.count(func.distinct(RequestAuditLog.origin)))
-        .filter(RequestAuditLog.created_at >= since, RequestAuditLog.origin.isnot(None), RequestAuditLog.origin != "")
-        .scalar()
-        or 0
-    )
-    suspicious_rows = (
-        db.query(RequestAuditLog.risk_flags)
-        .filter(RequestAuditLog.created_at >= since)
+    counter_rows = (
+        db.query(RequestAuditRollup.dimension, func.sum(RequestAuditRollup.count))
+        .filter(
+            RequestAuditRollup.bucket_start >= since,
+            RequestAuditRollup.dimension.in_(("total", "error", "suspicious")),
+        )
+        .group_by(RequestAuditRollup.dimension)
         .all()
     )
-    suspicious_requests = sum(1 for (risk_flags,) in suspicious_rows if risk_flags)
+    counters = {dimension: int(count or 0) for dimension, count in counter_rows}
 
+    distinct_rows = (
+        db.query(
+            func.count(func.distinct(case((RequestAuditRollup.dimension == "ip", RequestAuditRollup.value)))),
+            func.count(func.distinct(case((RequestAuditRollup.dimension == "origin", RequestAuditRollup.value)))),
+        )
+        .filter(
+            RequestAuditRollup.bucket_start >= since,
+            RequestAuditRollup.dimension.in_(("ip", "origin")),
+        )
+        .one()
+    )
+    unique_ips, unique_origins = distinct_rows
+
+    # Filtering on created_at lets Postgres prune request_audit_logs down to
+    # the partitions that overlap the window.
     recent_rows = (
         db.query(RequestAuditLog)
         .filter(RequestAuditLog.created_at >= since)
@@ -148,27 +258,22 @@ def get_traffic_snapshot(db: Session, *, hours: int = 24, limit: int = 20) -> di
         .all()
     )
 
-    blocked_like = (
-        db.query(func.count(RequestAuditLog.id))
-        .filter(RequestAuditLog.created_at >= since, RequestAuditLog.status_code >= 400)
-        .scalar()
-        or 0
-    )
-
     return {
         "window_hours": safe_hours,
+        "window_start": since,
         "summary": {
-            "total_requests": total_requests,
-            "unique_ips": unique_ips,
-            "unique_origins": unique_origins,
-            "suspicious_requests": suspicious_requests,
-            "error_responses": blocked_like,
+            "total_requests": counters.get("total", 0),
+            "unique_ips": unique_ips or 0,
+            "unique_origins": unique_origins or 0,
+            "suspicious_requests": counters.get("suspicious", 0),
+            "error_responses": counters.get("error", 0),
         },
-        "top_paths": _top_group(db, RequestAuditLog.path, since=since, limit=10),
-        "top_ips": _top_group(db, RequestAuditLog.client_ip, since=since, limit=10),
-        "top_origins": _top_group(db, RequestAuditLog.origin, since=since, limit=10),
-        "top_hosts": _top_group(db, RequestAuditLog.host, since=since, limit=10),
-        "top_user_agents": _top_group(db, RequestAuditLog.user_agent, since=since, limit=8),
+        "status_classes": _top_group(db, "status_class", since=since, limit=10),
+        "top_paths": _top_group(db, "path", since=since, limit=10),
+        "top_ips": _top_group(db, "ip", since=since, limit=10),
+        "top_origins": _top_group(db, "origin", since=since, limit=10),
+        "top_hosts": _top_group(db, "host", since=since, limit=10),
+        "top_user_agents": _top_group(db, "user_agent", since=since, limit=8),
         "recent_requests": [
             {
                 "id": row.id,
@@ -0,0 +1,164 @@
+"""
+Resumable binary uploads for speaking answers.
+
+A client opens a session, PUTs raw bytes at increasing offsets and finalizes.
+Chunks are appended to a staging file on local disk, so an interrupted
+upload resumes from the offset the server reports instead of starting over.
+Session metadata sits next to the data file, which lets every worker
+process on the host serve any session.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+SPEAKING_UPLOAD_STAGING_DIR = Path(
+    os.getenv("SPEAKING_UPLOAD_STAGING_DIR", os.path.join(tempfile.gettempdir(), "mockstream-speaking-uploads"))
+)
+SPEAKING_UPLOAD_MAX_BYTES = int(os.getenv("SPEAKING_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+SPEAKING_UPLOAD_SESSION_TTL = int(os.getenv("SPEAKING_UPLOAD_SESSION_TTL", str(24 * 3600)))
+# Advertised to clients as the preferred PUT size; any size is accepted.
+SPEAKING_UPLOAD_CHUNK_BYTES = int(os.getenv("SPEAKING_UPLOAD_CHUNK_BYTES", str(512 * 1024)))
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, expected: int):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    user_id: int
+    mock_id: int
+    question_id: str
+    content_type: str
+    total_size: int | None
+    created_at: float
+
+    @property
+    def data_path(self) -> Path:
+        return SPEAKING_UPLOAD_STAGING_DIR / f"{self.upload_id}.part"
+
+    @property
+    def meta_path(self) -> Path:
+        return SPEAKING_UPLOAD_STAGING_DIR / f"{self.upload_id}.json"
+
+    @property
+    def offset(self) -> int:
+        try:
+            return self.data_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def complete(self) -> bool:
+        return self.total_size is None or self.offset == self.total_size
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "mock_id": self.mock_id,
+            "question_id": self.question_id,
+            "offset": self.offset,
+            "total_size": self.total_size,
+            "chunk_size": SPEAKING_UPLOAD_CHUNK_BYTES,
+            "expires_at": self.created_at + SPEAKING_UPLOAD_SESSION_TTL,
+        }
+
+
+def create_session(user_id: int, mock_id: int, question_id: str, content_type: str, total_size: int | None) -> UploadSession:
+    if total_size is not None and total_size > SPEAKING_UPLOAD_MAX_BYTES:
+        raise UploadTooLarge(f"Upload exceeds {SPEAKING_UPLOAD_MAX_BYTES} bytes")
+    SPEAKING_UPLOAD_STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    cleanup_expired()
+    session = UploadSession(
+        upload_id=uuid.uuid4().hex,
+        user_id=user_id,
+        mock_id=mock_id,
+        question_id=question_id,
+        content_type=content_type,
+        total_size=total_size,
+        created_at=time.time(),
+    )
+    session.data_path.touch()
+    session.meta_path.write_text(json.dumps(asdict(session)))
+    return session
+
+
+def get_session(upload_id: str) -> UploadSession | None:
+    if not upload_id.isalnum():
+        return None
+    try:
+        session = UploadSession(**json.loads((SPEAKING_UPLOAD_STAGING_DIR / f"{upload_id}.json").read_text()))
+    except (FileNotFoundError, ValueError, TypeError):
+        return None
+    if session.created_at + SPEAKING_UPLOAD_SESSION_TTL < time.time():
+        delete_session(session)
+        return None
+    return session
+
+
+async def append_chunk(session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Append a request body at `offset`. The offset must equal the bytes
+    already staged; a client that lost track asks for the session again.
+    """
+    with open(session.data_path, "ab") as fh:
+        # One writer per session, even across worker processes.
+        await asyncio.to_thread(fcntl.flock, fh.fileno(), fcntl.LOCK_EX)
+        try:
+            current = os.fstat(fh.fileno()).st_size
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+            limit = session.total_size if session.total_size is not None else SPEAKING_UPLOAD_MAX_BYTES
+            written = current
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > limit:
+                    # Drop the partial chunk so the session stays resumable.
+                    fh.truncate(current)
+                    raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+                await asyncio.to_thread(fh.write, chunk)
+            fh.flush()
+            return written
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def delete_session(session: UploadSession) -> None:
+    for path in (session.data_path, session.meta_path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_expired() -> int:
+    cutoff = time.time() - SPEAKING_UPLOAD_SESSION_TTL
+    removed = 0
+    for path in SPEAKING_UPLOAD_STAGING_DIR.glob("*.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                path.with_suffix(".part").unlink(missing_ok=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
@@ -0,0 +1,308 @@
+"""
+Answer-key scoring shared by CEFR reading, CEFR listening and IELTS modules.
+
+An answer key is compiled once into slots: one per question, with its part,
+display value, point weight and the set of normalized answers it accepts.
+Grading a submission is then one pass over the slots. The compiled keys are
+cached by their content, so a submission only pays for compilation the first
+time a key (or a new version of it) is seen.
+
+Key entries can be:
+
+- a string; "colour | color" accepts either alternative,
+- a list of accepted alternatives (IELTS keys are JSON),
+- a dict {"accept": [...], "points": 2, "match": "set"}. With "set", the
+  answer is a comma-separated set of choices (e.g. "choose TWO letters") and
+  each correct choice earns its share of the points, unless more choices
+  were given than expected.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+ALTERNATIVE_SEPARATOR = "|"
+COMPILED_CACHE_SIZE = 512
+
+
+def normalize_case_insensitive(value: Any) -> str:
+    if value is None:
+        return ""
+    return str(value).strip().casefold()
+
+
+def normalize_words(value: Any) -> str:
+    """Case-insensitive and whitespace-collapsed, as IELTS has always graded."""
+    if value is None:
+        return ""
+    return " ".join(str(value).strip().casefold().split())
+
+
+@dataclass(frozen=True)
+class Slot:
+    part: str
+    index: int  # position within the part
+    number: int  # question number across the whole key
+    expected: Any
+    accepted: frozenset[str]
+    points: int = 1
+    set_match: bool = False
+
+
+@dataclass(frozen=True)
+class CompiledKey:
+    kind: str
+    fingerprint: str
+    parts: tuple[str, ...]
+    slots: tuple[Slot, ...]
+    normalize: Callable[[Any], str]
+
+    @property
+    def max_score(self) -> int:
+        return sum(slot.points for slot in self.slots)
+
+    def part_totals(self) -> dict[str, int]:
+        totals = {part: 0 for part in self.parts}
+        for slot in self.slots:
+            totals[slot.part] += slot.points
+        return totals
+
+
+@dataclass
+class SlotResult:
+    slot: Slot
+    received: Any
+    points: int
+
+    @property
+    def correct(self) -> bool:
+        return self.points == self.slot.points
+
+
+@dataclass
+class GradeResult:
+    score: int
+    max_score: int
+    parts: dict[str, dict[str, int]]
+    slots: list[SlotResult] = field(repr=False)
+
+    @property
+    def percent(self) -> int:
+        return round((self.score / self.max_score) * 100) if self.max_score else 0
+
+    def mismatches(self) -> list[dict[str, Any]]:
+        return [
+            {"question": result.slot.number, "expected": result.slot.expected, "received": result.received}
+            for result in self.slots
+            if not result.correct
+        ]
+
+
+def _alternatives(entry: Any) -> list[Any]:
+    if isinstance(entry, (list, tuple)):
+        return list(entry)
+    if isinstance(entry, str) and ALTERNATIVE_SEPARATOR in entry:
+        return entry.split(ALTERNATIVE_SEPARATOR)
+    return [entry]
+
+
+def _compile_slot(part: str, index: int, number: int, entry: Any, normalize: Callable[[Any], str]) -> Slot:
+    points = 1
+    set_match = False
+    expected = entry
+    if isinstance(entry, dict):
+        points = max(1, int(entry.get("points", 1)))
+        set_match = entry.get("match") == "set"
+        expected = entry.get("accept", "")
+    alternatives = _alternatives(expected)
+    if set_match:
+        # One accepted "alternative" per expected choice.
+        accepted = frozenset(normalize(choice) for alt in alternatives for choice in str(alt).split(","))
+    else:
+        accepted = frozenset(normalize(alt) for alt in alternatives)
+    display = expected if not isinstance(expected, list) else " / ".join(str(alt) for alt in expected)
+    return Slot(part, index, number, display, accepted, points, set_match)
+
+
+def _fingerprint(kind: str, parts: Sequence[tuple[str, Sequence[Any]]]) -> str:
+    raw = json.dumps([kind, [[name, list(entries)] for name, entries in parts]], default=str, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+_compiled: OrderedDict[str, CompiledKey] = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_key(
+    kind: str,
+    parts: Sequence[tuple[str, Sequence[Any]]],
+    normalize: Callable[[Any], str] = normalize_case_insensitive,
+) -> CompiledKey:
+    """`parts` is [(part name, key entries)] in question order."""
+    fingerprint = _fingerprint(kind, parts)
+    with _compiled_lock:
+        compiled = _compiled.get(fingerprint)
+        if compiled is not None:
+            _compiled.move_to_end(fingerprint)
+            return compiled
+
+    slots = []
+    for part, entries in parts:
+        for index, entry in enumerate(entries or []):
+            slots.append(_compile_slot(part, index, len(slots) + 1, entry, normalize))
+    compiled = CompiledKey(kind, fingerprint, tuple(name for name, _ in parts), tuple(slots), normalize)
+
+    with _compiled_lock:
+        _compiled[fingerprint] = compiled
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def _slot_points(slot: Slot, received: Any, normalize: Callable[[Any], str]) -> int:
+    if not slot.set_match:
+        return slot.points if normalize(received) in slot.accepted else 0
+    choices = {normalize(choice) for choice in str(received or "").split(",")} - {""}
+    if not choices or len(choices) > len(slot.accepted):
+        return 0
+    return slot.points * len(choices & slot.accepted) // len(slot.accepted)
+
+
+def grade(key: CompiledKey, answers: dict[str, Sequence[Any]]) -> GradeResult:
+    """`answers` maps part name to that part's answers in question order; missing answers score 0."""
+    parts = {part: {"correct": 0, "total": total} for part, total in key.part_totals().items()}
+    results = []
+    score = 0
+    for slot in key.slots:
+        submitted = answers.get(slot.part) or ()
+        received = submitted[slot.index] if slot.index < len(submitted) else ""
+        points = _slot_points(slot, received, key.normalize)
+        score += points
+        parts[slot.part]["correct"] += points
+        results.append(SlotResult(slot, received, points))
+    return GradeResult(score, key.max_score, parts, results)
+
+
+def grade_many(key: CompiledKey, submissions: Iterable[dict[str, Sequence[Any]]]) -> Iterator[GradeResult]:
+    """Grade stored submissions against one compiled key (e.g. after the key was edited)."""
+    for answers in submissions:
+        yield grade(key, answers)
+
+
+@dataclass
+class BatchGrade:
+    scores: list[int]
+    parts: dict[str, list[int]]
+    mismatches: list[list[dict[str, Any]]] | None = None
+
+
+def grade_batch(
+    key: CompiledKey, submissions: Sequence[dict[str, Sequence[Any]]], *, with_mismatches: bool = False
+) -> BatchGrade:
+    """
+    Column-wise `grade()` for bulk regrading: each slot is checked against the
+    whole batch at once, and normalization is memoized across the batch
+    because stored answers repeat heavily ("A", "True", ...). Scores match
+    `grade()` exactly.
+    """
+    count = len(submissions)
+    scores = [0] * count
+    parts = {part: [0] * count for part in key.parts}
+    mismatches = [[] for _ in range(count)] if with_mismatches else None
+    normalized: dict[Any, str] = {}
+
+    def norm(value: Any) -> str:
+        try:
+            return normalized[value]
+        except KeyError:
+            result = normalized[value] = key.normalize(value)
+            return result
+        except TypeError:  # unhashable junk in old rows
+            return key.normalize(value)
+
+    for slot in key.slots:
+        column = []
+        for answers in submissions:
+            submitted = answers.get(slot.part) or ()
+            column.append(submitted[slot.index] if slot.index < len(submitted) else "")
+        if slot.set_match:
+            earned = [_slot_points(slot, received, key.normalize) for received in column]
+        else:
+            accepted = slot.accepted
+            earned = [slot.points if norm(received) in accepted else 0 for received in column]
+        part_scores = parts[slot.part]
+        for row, points in enumerate(earned):
+            if points:
+                scores[row] += points
+                part_scores[row] += points
+            if mismatches is not None and points != slot.points:
+                mismatches[row].append({"question": slot.number, "expected": slot.expected, "received": column[row]})
+    return BatchGrade(scores, parts, mismatches)
+
+
+BAND_THRESHOLDS = (
+    (0.975, "9.0"),
+    (0.925, "8.5"),
+    (0.875, "8.0"),
+    (0.825, "7.5"),
+    (0.75, "7.0"),
+    (0.675, "6.5"),
+    (0.60, "6.0"),
+    (0.525, "5.5"),
+    (0.45, "5.0"),
+    (0.375, "4.5"),
+    (0.30, "4.0"),
+)
+
+
+def score_to_band(score: int, total: int) -> str | None:
+    """IELTS listening/reading style approximation."""
+    if total <= 0:
+        return None
+    ratio = score / total
+    for threshold, band in BAND_THRESHOLDS:
+        if ratio >= threshold:
+            return band
+    return "3.5"
+
+
+# Layouts of the stored keys.
+
+READING_PARTS = ("part1", "part2", "part3", "part4MC", "part4TF", "part5Mini", "part5MC")
+# CEFR reading is always reported out of 38 (6 + 10 + 6 + 4 + 5 + 5 + 2).
+READING_MAX_SCORE = 38
+LISTENING_PARTS = ("part1", "part2", "part3", "part4", "part5", "part6")
+
+
+def compile_reading_key(answer_row) -> CompiledKey:
+    part4 = list(answer_row.part4 or [])
+    part5 = list(answer_row.part5 or [])
+    # Legacy DB format: part4 = [4x MC, 5x TF] and part5 = [5x Mini, 2x MC].
+    return compile_key(
+        "cefr_reading",
+        [
+            ("part1", answer_row.part1 or []),
+            ("part2", answer_row.part2 or []),
+            ("part3", answer_row.part3 or []),
+            ("part4MC", part4[:4]),
+            ("part4TF", part4[4:9]),
+            ("part5Mini", part5[:5]),
+            ("part5MC", part5[5:7]),
+        ],
+    )
+
+
+def compile_listening_key(answer_row) -> CompiledKey:
+    return compile_key(
+        "cefr_listening",
+        [(part, getattr(answer_row, f"part_{part[-1]}") or []) for part in LISTENING_PARTS],
+    )
+
+
+def compile_ielts_key(answer_key: Sequence[Any]) -> CompiledKey:
+    return compile_key("ielts", [("answers", answer_key or [])], normalize_words)
@@ -0,0 +1,172 @@
+"""Speaking recordings: concurrent uploads to audio storage and ZIP archives for Telegram."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator
+
+from services.audio_storage import STREAM_CHUNK_BYTES, AudioStorage
+from services.metrics import metrics
+
+SPEAKING_UPLOAD_CONCURRENCY = int(os.getenv("SPEAKING_UPLOAD_CONCURRENCY", "4"))
+SPEAKING_UPLOAD_TIMEOUT = float(os.getenv("SPEAKING_UPLOAD_TIMEOUT", "20"))
+SPEAKING_UPLOAD_RETRIES = int(os.getenv("SPEAKING_UPLOAD_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = 0.25
+# Archives larger than this spill from memory to a temp file.
+ARCHIVE_SPOOL_MAX_BYTES = int(os.getenv("SPEAKING_ARCHIVE_SPOOL_MAX_BYTES", str(1024 * 1024)))
+# Recordings are copied to storage and into archives in chunks of this size,
+# so a request buffers at most concurrency * chunk bytes on top of its spools.
+SPEAKING_STREAM_CHUNK_BYTES = STREAM_CHUNK_BYTES
+BYTE_BUCKETS = tuple(2**power for power in range(16, 31, 2))
+
+
+@dataclass
+class AudioUpload:
+    """
+    One recording, backed by a seekable file (the request's upload spool or a
+    BytesIO). Content is only ever read in chunks.
+    """
+
+    key: str
+    filename: str
+    source: BinaryIO
+    content_type: str
+    size: int
+    in_memory: bool = True
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def from_bytes(cls, key: str, filename: str, content: bytes, content_type: str) -> "AudioUpload":
+        return cls(key, filename, io.BytesIO(content), content_type, len(content))
+
+    @classmethod
+    def from_upload_file(cls, key: str, filename: str, upload_file) -> "AudioUpload":
+        spool = upload_file.file
+        size = upload_file.size
+        if size is None:
+            spool.seek(0, os.SEEK_END)
+            size = spool.tell()
+        # Starlette spools uploads in memory up to 1 MB, then to a temp file.
+        in_memory = not getattr(spool, "_rolled", True)
+        return cls(key, filename, spool, upload_file.content_type, size, in_memory)
+
+    def chunks(self, chunk_size: int = SPEAKING_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        # Each reader tracks its own offset, so a retry can start while a
+        # timed-out attempt is still reading in another thread.
+        offset = 0
+        while True:
+            with self._lock:
+                self.source.seek(offset)
+                chunk = self.source.read(chunk_size)
+            if not chunk:
+                return
+            offset += len(chunk)
+            yield chunk
+
+
+def record_ingest(uploads: list[AudioUpload]) -> dict[str, int]:
+    """Per-request byte accounting for the speaking submit endpoints."""
+    total = sum(upload.size for upload in uploads)
+    in_memory = sum(upload.size for upload in uploads if upload.in_memory)
+    stats = {
+        "files": len(uploads),
+        "bytes": total,
+        "in_memory_bytes": in_memory,
+        "spooled_to_disk": sum(not upload.in_memory for upload in uploads),
+        # Upper bound on what streaming adds on top of the spools.
+        "stream_buffer_bytes": min(len(uploads), SPEAKING_UPLOAD_CONCURRENCY) * SPEAKING_STREAM_CHUNK_BYTES,
+    }
+    metrics.histogram("speaking.request_bytes", BYTE_BUCKETS).observe(total)
+    metrics.histogram("speaking.request_memory_bytes", BYTE_BUCKETS).observe(in_memory + stats["stream_buffer_bytes"])
+    return stats
+
+
+@dataclass
+class UploadOutcome:
+    key: str
+    path: str
+    url: str | None = None
+    error: str | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def upload_recordings(
+    storage: AudioStorage,
+    folder: str,
+    uploads: list[AudioUpload],
+    *,
+    concurrency: int = SPEAKING_UPLOAD_CONCURRENCY,
+    timeout: float = SPEAKING_UPLOAD_TIMEOUT,
+    retries: int = SPEAKING_UPLOAD_RETRIES,
+) -> list[UploadOutcome]:
+    """
+    Upload every recording with at most `concurrency` in flight. Each file is
+    retried independently, so one failing question does not fail the rest;
+    callers decide what to do with the per-question outcomes.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def upload_one(upload: AudioUpload) -> UploadOutcome:
+        outcome = UploadOutcome(key=upload.key, path=f"{folder}/{upload.filename}")
+        async with semaphore:
+            for attempt in range(1, retries + 2):
+                outcome.attempts = attempt
+                started = time.perf_counter()
+                try:
+                    # Storage backends are blocking; a timed-out thread keeps
+                    # running, but the request stops waiting for it.
+                    outcome.url = await asyncio.wait_for(
+                        asyncio.to_thread(storage.put, outcome.path, upload.chunks(), upload.size, upload.content_type),
+                        timeout=timeout,
+                    )
+                    outcome.error = None
+                    metrics.observe("speaking.upload_ms", (time.perf_counter() - started) * 1000)
+                    return outcome
+                except asyncio.TimeoutError:
+                    outcome.error = f"timed out after {timeout:g}s"
+                except Exception as e:
+                    outcome.error = str(e) or e.__class__.__name__
+                metrics.incr("speaking.upload_retries" if attempt <= retries else "speaking.upload_failures")
+                if attempt <= retries:
+                    await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        print(f"Speaking upload failed for {outcome.path}: {outcome.error}")
+        return outcome
+
+    return list(await asyncio.gather(*(upload_one(upload) for upload in uploads)))
+
+
+def build_recordings_zip(uploads: list[AudioUpload]):
+    """
+    Write the recordings straight into a ZIP. Audio codecs are already
+    compressed, so entries are stored rather than deflated. The caller closes
+    the returned file.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_MAX_BYTES)
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        for upload in uploads:
+            with zf.open(upload.filename, "w") as entry:
+                for chunk in upload.chunks():
+                    entry.write(chunk)
+    archive.seek(0)
+    return archive
+
+
+def recordings_zip_bytes(uploads: list[AudioUpload]) -> bytes:
+    """Blocking: the recordings as one ZIP, for a TELEGRAM_DOCUMENT job."""
+    started = time.perf_counter()
+    with build_recordings_zip(uploads) as archive:
+        content = archive.read()
+    metrics.observe("speaking.archive_ms", (time.perf_counter() - started) * 1000)
+    metrics.observe("speaking.archive_bytes", len(content))
+    return content
@@ -0,0 +1,47 @@
+"""Cold-start timings: module imports, client init and lifespan steps."""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Baseline is the first import of this module, which main.py does before
+# anything heavy, so total_ms approximates interpreter-to-ready time.
+_BASELINE = time.perf_counter()
+
+
+class StartupReport:
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self.ready_at: float | None = None
+
+    def record(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def mark_ready(self) -> None:
+        self.ready_at = time.perf_counter()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "timings_ms": {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()},
+            "ready_ms": round((self.ready_at - _BASELINE) * 1000, 2) if self.ready_at else None,
+        }
+
+    def log(self) -> None:
+        snapshot = self.snapshot()
+        slowest = sorted(snapshot["timings_ms"].items(), key=lambda item: item[1], reverse=True)
+        print(f"Startup ready in {snapshot['ready_ms']} ms")
+        for name, ms in slowest:
+            print(f"  {ms:>9.2f} ms  {name}")
+
+
+startup_report = StartupReport()
@@ -1,7 +1,7 @@
 # services/telegram_bot.py
 import os
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -36,12 +36,14 @@ def send_document_to_telegram(
     data = {"chat_id": target_chat_id, "caption": caption}
 
     try:
-        resp = requests.post(url, data=data, files=files, timeout=60)
+        # httpx streams file objects into the multipart body in chunks instead
+        # of assembling the whole request in memory first.
+        resp = httpx.post(url, data=data, files=files, timeout=60)
     except Exception as exc:
         print("Telegram request error:", exc)
         return False
 
-    if not resp.ok:
+    if not resp.is_success:
         print("Telegram error:", resp.text)
         return False
 
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from redis_client import get_redis
+
+USER_KEY_PREFIX = "token_version:"
+GLOBAL_KEY = "token_version:global"
+
+
+def get_token_versions(user_id: int) -> tuple[int, int] | None:
+    """Return (user version, global version), or None when Redis is unreachable."""
+    try:
+        user_version, global_version = get_redis().mget(f"{USER_KEY_PREFIX}{user_id}", GLOBAL_KEY)
+    except Exception as e:
+        print(f"Token version lookup error: {e}")
+        return None
+    return int(user_version or 0), int(global_version or 0)
+
+
+def bump_user_token_version(user_id: int) -> None:
+    try:
+        get_redis().incr(f"{USER_KEY_PREFIX}{user_id}")
+    except Exception as e:
+        print(f"Token version bump error: {e}")
+
+
+def bump_global_token_version() -> None:
+    try:
+        get_redis().incr(GLOBAL_KEY)
+    except Exception as e:
+        print(f"Token version bump error: {e}")
@@ -0,0 +1,117 @@
+"""
+Content-addressed disk cache for synthesized speech.
+
+Entries are named by a SHA-256 of what produced them, so identical prompts
+share one file no matter which request asked first. Reads refresh the file's
+mtime and eviction removes the least recently used files once the directory
+grows past TTS_CACHE_MAX_BYTES. Several worker processes can share the
+directory: writes are atomic renames and eviction tolerates files another
+process already removed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mockstream-tts-cache")))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Evict down to this fraction of the limit so eviction does not run on every write.
+EVICT_TO_RATIO = 0.9
+
+
+def cache_key(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TTSCache:
+    def __init__(self, directory: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Approximate: other processes write too, so eviction rescans the directory.
+        self._size: int | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = ".mp3") -> bytes | None:
+        path = self._path(key, suffix)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes, suffix: str = ".mp3") -> None:
+        path = self._path(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _files(self) -> list[tuple[float, int, Path]]:
+        files = []
+        for path in self.directory.glob("*/*"):
+            if path.name.startswith("."):
+                # In-flight writes.
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self) -> None:
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * EVICT_TO_RATIO
+        for _, size, path in files:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> dict[str, int | str | None]:
+        return {
+            "directory": str(self.directory),
+            "max_bytes": self.max_bytes,
+            "size_bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+tts_cache = TTSCache()
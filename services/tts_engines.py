@@ -0,0 +1,114 @@
+"""
+Speech synthesis engines behind one interface.
+
+- "gtts": Google Translate TTS (MP3). Needs network access and is rate
+  limited by Google.
+- "espeak": espeak-ng run as a subprocess (WAV). Fully offline, so prompts
+  can be pre-generated on our own hardware and /tts/audio can be load-tested
+  without external calls.
+
+TTS_ENGINE picks the default; /tts/audio also takes `?engine=`.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import shutil
+import subprocess
+from abc import ABC, abstractmethod
+from io import BytesIO
+from time import perf_counter
+
+from services.metrics import metrics
+
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts").strip().lower()
+ESPEAK_BINARY = os.getenv("ESPEAK_BINARY", "espeak-ng")
+ESPEAK_WORDS_PER_MINUTE = int(os.getenv("ESPEAK_WORDS_PER_MINUTE", "160"))
+ESPEAK_TIMEOUT = float(os.getenv("ESPEAK_TIMEOUT", "30"))
+BYTE_BUCKETS = tuple(2**power for power in range(12, 25, 2))
+
+
+class TTSEngine(ABC):
+    name = "base"
+    extension = ".bin"
+    media_type = "application/octet-stream"
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def _synthesize(self, text: str, lang: str) -> bytes:
+        ...
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        started = perf_counter()
+        try:
+            audio = self._synthesize(text, lang)
+        except Exception:
+            metrics.incr(f"tts.{self.name}.failures")
+            raise
+        metrics.observe(f"tts.{self.name}.synthesis_ms", (perf_counter() - started) * 1000)
+        metrics.histogram(f"tts.{self.name}.bytes", BYTE_BUCKETS).observe(len(audio))
+        return audio
+
+
+class GTTSEngine(TTSEngine):
+    name = "gtts"
+    extension = ".mp3"
+    media_type = "audio/mpeg"
+
+    def available(self) -> bool:
+        return importlib.util.find_spec("gtts") is not None
+
+    def _synthesize(self, text: str, lang: str) -> bytes:
+        from gtts import gTTS
+
+        mp3_fp = BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(mp3_fp)
+        return mp3_fp.getvalue()
+
+
+class EspeakEngine(TTSEngine):
+    name = "espeak"
+    extension = ".wav"
+    media_type = "audio/wav"
+
+    def __init__(self, binary: str = ESPEAK_BINARY, words_per_minute: int = ESPEAK_WORDS_PER_MINUTE):
+        self.binary = binary
+        self.words_per_minute = words_per_minute
+
+    def available(self) -> bool:
+        return shutil.which(self.binary) is not None
+
+    def _synthesize(self, text: str, lang: str) -> bytes:
+        # Text goes through stdin so prompts are never parsed as options.
+        completed = subprocess.run(
+            [self.binary, "-v", lang, "-s", str(self.words_per_minute), "--stdout", "--stdin"],
+            input=text.encode("utf-8"),
+            capture_output=True,
+            timeout=ESPEAK_TIMEOUT,
+        )
+        if completed.returncode != 0 or not completed.stdout:
+            raise RuntimeError(f"{self.binary} failed: {completed.stderr.decode(errors='replace').strip()}")
+        return completed.stdout
+
+
+ENGINES: dict[str, TTSEngine] = {engine.name: engine for engine in (GTTSEngine(), EspeakEngine())}
+
+
+def get_engine(name: str | None = None) -> TTSEngine:
+    """Raises ValueError for unknown engines and engines missing on this host."""
+    engine = ENGINES.get((name or TTS_ENGINE).strip().lower())
+    if engine is None:
+        raise ValueError(f"Unknown TTS engine {name or TTS_ENGINE!r}; choose from {', '.join(ENGINES)}")
+    if not engine.available():
+        raise ValueError(f"TTS engine {engine.name!r} is not installed on this server")
+    return engine
+
+
+def engine_stats() -> dict[str, dict]:
+    return {
+        name: {"available": engine.available(), "default": name == TTS_ENGINE, "media_type": engine.media_type}
+        for name, engine in ENGINES.items()
+    }
@@ -1,8 +1,72 @@
-from gtts import gTTS
-from io import BytesIO
-
-def TTS(text: str) -> BytesIO:
-    mp3_fp = BytesIO()
-    gTTS(text=text, lang="en").write_to_fp(mp3_fp)
-    mp3_fp.seek(0)
-    return mp3_fp
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator
+
+from services.metrics import metrics
+from services.tts_cache import cache_key, tts_cache
+from services.tts_engines import TTSEngine
+
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+TTS_DEFAULT_LANG = os.getenv("TTS_DEFAULT_LANG", "en")
+
+# Shared by all requests, so a burst of cache misses cannot open more than
+# TTS_CONCURRENCY connections to Google (or espeak processes) at once.
+_executor = ThreadPoolExecutor(max_workers=max(1, TTS_CONCURRENCY), thread_name_prefix="tts")
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _synthesize_and_store(engine: TTSEngine, key: str, text: str, lang: str) -> bytes:
+    audio = engine.synthesize(text, lang)
+    tts_cache.put(key, audio, engine.extension)
+    return audio
+
+
+def submit_synthesis(engine: TTSEngine, key: str, text: str, lang: str) -> Future:
+    """
+    Future for synthesizing `text` and storing it under `key`. A text that is
+    already being synthesized for another request shares that request's
+    future instead of synthesizing it twice.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _executor.submit(_synthesize_and_store, engine, key, text, lang)
+            _inflight[key] = future
+
+            def forget(done: Future, key: str = key) -> None:
+                with _inflight_lock:
+                    if _inflight.get(key) is done:
+                        del _inflight[key]
+
+            future.add_done_callback(forget)
+    return future
+
+
+async def synthesize(engine: TTSEngine, text: str, lang: str = TTS_DEFAULT_LANG) -> bytes:
+    """Audio bytes for `text`, from the cache when possible."""
+    key = cache_key(engine.name, lang, text)
+    # A cache read is disk I/O, so it runs in a thread. That is the default
+    # executor, not the synthesis pool, so hits never queue behind misses.
+    cached = await asyncio.to_thread(tts_cache.get, key, engine.extension)
+    if cached is not None:
+        metrics.incr("tts.cache_hits")
+        return cached
+    metrics.incr("tts.cache_misses")
+    return await asyncio.wrap_future(submit_synthesis(engine, key, text, lang))
+
+
+async def synthesize_many(
+    engine: TTSEngine, texts: dict[str, str], lang: str = TTS_DEFAULT_LANG
+) -> AsyncIterator[tuple[str, bytes]]:
+    """Yield (key, mp3 bytes) in completion order; the first failure propagates."""
+    # Futures may be shared with other requests, so they are never cancelled
+    # here; anything still running when a client goes away lands in the cache.
+    pending = {asyncio.ensure_future(synthesize(engine, text, lang)): key for key, text in texts.items()}
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            key = pending.pop(task)
+            yield key, task.result()
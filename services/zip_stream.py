@@ -0,0 +1,55 @@
+"""
+Incremental ZIP writer for streaming responses.
+
+zipfile writes to any object with `write()`. When the target cannot seek it
+falls back to data descriptors after each entry instead of patching the local
+headers, so the archive can be produced front to back: each `add()` returns
+the bytes of one complete entry and `close()` returns the central directory.
+Only the entry being written is held in memory.
+"""
+
+from __future__ import annotations
+
+import io
+import zipfile
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer that is drained after every entry."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    def __init__(self, compression: int = zipfile.ZIP_STORED):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression)
+        self.entries = 0
+        self.bytes_out = 0
+
+    def _drain(self) -> bytes:
+        data = self._sink.drain()
+        self.bytes_out += len(data)
+        return data
+
+    def add(self, name: str, data: bytes) -> bytes:
+        self._zip.writestr(name, data)
+        self.entries += 1
+        return self._drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._drain()
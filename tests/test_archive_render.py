@@ -0,0 +1,33 @@
+import unittest
+
+from services.archive_render import HtmlTemplate, QaCard, render_qa_archive
+
+
+class ArchiveRenderTests(unittest.TestCase):
+    def test_template_escapes_fields_and_keeps_literals(self):
+        template = HtmlTemplate('<p class="$cls">$$${value}</p>').bind(cls="a&b")
+        out = bytearray()
+
+        template.render_into(out, {"value": "<é>"})
+
+        self.assertEqual(template.fields, ("value",))
+        self.assertEqual(out.decode("utf-8"), '<p class="a&amp;b">$&lt;é&gt;</p>')
+
+    def test_qa_archive_renders_one_card_per_question(self):
+        cards = [
+            QaCard(1, "Part 1", "Gap <1>", "a", "a", True),
+            QaCard(2, "Part 1", None, None, "b", False),
+        ]
+
+        html = render_qa_archive("T", "Heading", [("Mock ID", 3)], ["Part 1: 1/2"], cards).decode("utf-8")
+
+        self.assertIn("<div><b>Mock ID:</b> 3</div>", html)
+        self.assertIn('<div class="qa-card ok">', html)
+        self.assertIn('<span class="st">Incorrect</span>', html)
+        self.assertIn("Gap &lt;1&gt;", html)
+        self.assertIn('<p class="prompt">-</p>', html)
+        self.assertTrue(html.endswith("</html>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import importlib.util
+import time
+import unittest
+
+HAS_REDIS = importlib.util.find_spec("redis") is not None
+
+if HAS_REDIS:
+    import redis
+    import redis.asyncio as redis_asyncio
+
+    import redis_client
+    from redis_client import RedisManager
+
+    class IdleConnection(redis.Connection):
+        """Never touches the network, so the pool can be exhausted without a server."""
+
+        def connect(self):
+            pass
+
+        def can_read(self, timeout=0):
+            return False
+
+        def disconnect(self, *args):
+            pass
+
+    class AsyncIdleConnection(redis_asyncio.Connection):
+        async def connect(self):
+            pass
+
+        async def can_read_destructive(self):
+            return False
+
+        async def disconnect(self, nowait=False):
+            pass
+
+
+@unittest.skipUnless(HAS_REDIS, "redis is not installed")
+class RedisPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.manager = RedisManager()
+        self.manager.init()
+        for pool, connection_class in ((self.manager.sync_pool, IdleConnection), (self.manager.async_pool, AsyncIdleConnection)):
+            pool.connection_class = connection_class
+            pool.max_connections = 2
+            pool.timeout = 0.2
+        self.manager.sync_pool.reset()
+
+    def test_sync_pool_waits_for_a_released_connection(self):
+        pool = self.manager.sync_pool
+        first = pool.get_connection("GET")
+        pool.get_connection("GET")
+        self.assertEqual(self.manager.stats()["sync"]["in_use"], 2)
+
+        started = time.monotonic()
+        with self.assertRaises(redis.ConnectionError):
+            pool.get_connection("GET")
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+        pool.release(first)
+        self.assertIs(pool.get_connection("GET"), first)
+
+    def test_async_pool_waits_for_a_released_connection(self):
+        pool = self.manager.async_pool
+
+        async def exhaust():
+            first = await pool.get_connection("GET")
+            await pool.get_connection("GET")
+            with self.assertRaises(redis.ConnectionError):
+                await pool.get_connection("GET")
+
+            waiter = asyncio.ensure_future(pool.get_connection("GET"))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            await pool.release(first)
+            return await waiter, first
+
+        got, first = asyncio.run(exhaust())
+        self.assertIs(got, first)
+
+    def test_pools_block_instead_of_failing(self):
+        manager = RedisManager()
+        manager.init()
+        self.assertIsInstance(manager.sync_pool, redis.BlockingConnectionPool)
+        self.assertIsInstance(manager.async_pool, redis_asyncio.BlockingConnectionPool)
+        self.assertEqual(manager.stats()["sync"]["timeout"], redis_client.REDIS_POOL_TIMEOUT)
+        self.assertEqual(manager.stats()["async"]["timeout"], redis_client.REDIS_POOL_TIMEOUT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+# Needs a scratch Postgres database: the rollups rely on ON CONFLICT upserts and advisory locks.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL is not set")
+class RollupRebuildTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+        from sqlalchemy import text
+
+        from database.db import Base, RequestAuditLog, RequestAuditRollup, engine
+
+        Base.metadata.create_all(bind=engine, tables=[RequestAuditLog.__table__, RequestAuditRollup.__table__])
+        with engine.begin() as connection:
+            connection.execute(
+                text('CREATE TABLE IF NOT EXISTS "request_audit_logs_default" PARTITION OF "request_audit_logs" DEFAULT')
+            )
+
+    def setUp(self):
+        from sqlalchemy import text
+
+        from database.db import engine
+
+        with engine.begin() as connection:
+            connection.execute(text('TRUNCATE "request_audit_logs", "request_audit_rollups"'))
+
+    def _rows(self, count):
+        from services.request_monitor import build_audit_log_row
+
+        return [
+            build_audit_log_row(
+                method="GET",
+                path=f"/mock/{i}",
+                query_string="",
+                full_url=f"http://test/mock/{i}",
+                status_code=200,
+                client_ip="10.0.0.1",
+                forwarded_for=None,
+                host="test",
+                origin=None,
+                referer=None,
+                user_agent="tests",
+                scheme="http",
+                request_headers={},
+            )
+            for i in range(count)
+        ]
+
+    def test_flush_during_rebuild_is_counted_once(self):
+        from sqlalchemy import event, func
+
+        from database.db import RequestAuditLog, RequestAuditRollup, SessionLocal
+        from services.audit_log_writer import AuditLogWriter
+        from services.request_monitor import rebuild_rollups
+
+        writer = AuditLogWriter(SessionLocal)
+        writer.flush_batch(self._rows(5))
+
+        flush = threading.Thread(target=writer.flush_batch, args=(self._rows(3),))
+        flush_blocked = []
+        db = SessionLocal()
+
+        @event.listens_for(db, "do_orm_execute")
+        def flush_before_scan(state):
+            # The rollups are already deleted and the raw rows not yet scanned:
+            # a flush committing here used to be counted twice.
+            if state.is_select and not flush.is_alive() and not flush_blocked:
+                flush.start()
+                flush.join(timeout=1.0)
+                flush_blocked.append(flush.is_alive())
+
+        try:
+            rebuild_rollups(db, since=datetime.utcnow() - timedelta(hours=1))
+        finally:
+            db.close()
+        flush.join()
+
+        check = SessionLocal()
+        try:
+            raw = check.query(func.count(RequestAuditLog.id)).scalar()
+            total = (
+                check.query(func.sum(RequestAuditRollup.count))
+                .filter(RequestAuditRollup.dimension == "total")
+                .scalar()
+            )
+        finally:
+            check.close()
+        self.assertEqual(flush_blocked, [True])
+        self.assertEqual(writer.failed_batches, 0)
+        self.assertEqual(raw, 8)
+        self.assertEqual(total, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from types import SimpleNamespace
+
+from services.scoring import compile_ielts_key, compile_reading_key, grade, grade_batch
+
+
+class ScoringTests(unittest.TestCase):
+    def test_reading_key_splits_legacy_parts_and_ignores_case(self):
+        answers = SimpleNamespace(
+            part1=["Apple"],
+            part2=["3"],
+            part3=[],
+            part4=["A", "B", "C", "D", "True", "False", "Not Given", "True", "False"],
+            part5=["x", "y", "z", "w", "v", "A", "B"],
+        )
+        key = compile_reading_key(answers)
+
+        result = grade(key, {"part1": [" apple "], "part4MC": ["a"], "part4TF": ["true"], "part5MC": ["", "b"]})
+
+        self.assertIs(compile_reading_key(answers), key)
+        self.assertEqual(result.max_score, 18)
+        self.assertEqual(result.score, 4)
+        self.assertEqual(result.parts["part4TF"], {"correct": 1, "total": 5})
+        self.assertEqual(result.mismatches()[0], {"question": 2, "expected": "3", "received": ""})
+
+    def test_ielts_alternatives_and_partial_credit(self):
+        key = compile_ielts_key(
+            ["colour | color", ["a", "b"], {"accept": ["A", "C"], "points": 2, "match": "set"}, "New York"]
+        )
+
+        self.assertEqual(grade(key, {"answers": ["Color", "B", "c, a", "new   york"]}).score, 5)
+        self.assertEqual(grade(key, {"answers": ["", "", "a", ""]}).score, 1)
+        # More choices than the question asks for earns nothing.
+        self.assertEqual(grade(key, {"answers": ["", "", "a, b, c", ""]}).score, 0)
+
+    def test_grade_batch_matches_grade(self):
+        key = compile_ielts_key(["colour | color", {"accept": ["A", "C"], "points": 2, "match": "set"}, "x"])
+        submissions = [{"answers": ["Color", "c, a"]}, {"answers": []}, {"answers": ["red", "a", "X", "extra"]}]
+
+        batch = grade_batch(key, submissions, with_mismatches=True)
+
+        for i, answers in enumerate(submissions):
+            single = grade(key, answers)
+            self.assertEqual(batch.scores[i], single.score)
+            self.assertEqual(batch.parts["answers"][i], single.parts["answers"]["correct"])
+            self.assertEqual(batch.mismatches[i], single.mismatches())
+
+
+if __name__ == "__main__":
+    unittest.main()
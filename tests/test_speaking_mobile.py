@@ -0,0 +1,75 @@
+import asyncio
+import importlib.util
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+HAS_APP_DEPS = all(importlib.util.find_spec(name) for name in ("fastapi", "sqlalchemy"))
+
+if HAS_APP_DEPS:
+    # The models only need a URL to import; these tests never open a connection.
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from fastapi import HTTPException
+
+    from auth.auth import Principal
+    from routes import speaking_router
+    from routes.speaking_router import MobileAudioData, MobileSubmitRequest
+
+
+class FakeQuery:
+    def __init__(self, row):
+        self.row = row
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return self.row
+
+
+class FakeSession:
+    def __init__(self):
+        self.added = []
+
+    def query(self, model):
+        return FakeQuery(object())
+
+    def add(self, row):
+        self.added.append(row)
+
+
+@unittest.skipUnless(HAS_APP_DEPS, "fastapi and sqlalchemy are not installed")
+class MobileSubmitTests(unittest.TestCase):
+    def _principal(self):
+        return Principal(
+            id=1,
+            email="user@test",
+            username="user",
+            role="user",
+            premium_until=datetime.utcnow() + timedelta(days=1),
+        )
+
+    def test_all_invalid_base64_is_rejected_before_storage(self):
+        request = MobileSubmitRequest(
+            mock_id=3,
+            total_duration=60,
+            audios=[
+                MobileAudioData(question_id="q1", base64_audio="a"),
+                MobileAudioData(question_id="q2", base64_audio="b"),
+            ],
+        )
+        db = FakeSession()
+
+        with mock.patch.object(speaking_router, "get_audio_storage") as get_storage:
+            with self.assertRaises(HTTPException) as raised:
+                asyncio.run(speaking_router.submit_speaking_result_mobile(request, db=db, current_user=self._principal()))
+
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(raised.exception.detail["failed_uploads"], {"q1": "invalid base64", "q2": "invalid base64"})
+        get_storage.assert_not_called()
+        self.assertEqual(db.added, [])
+
+
+if __name__ == "__main__":
+    unittest.main()